@@ -5,11 +5,15 @@ from sqlalchemy import pool
 
 from alembic import context
 # app.db dan Base ni import qiling
+from app.core.config import settings
 from app.database import Base
 
 # Alembic Config obyektini o'qing
 config = context.config
 
+# Baza manzili alembic.ini dan emas, ilova sozlamalaridan olinadi
+config.set_main_option("sqlalchemy.url", settings.DATABASE_URL.replace("%", "%%"))
+
 # Loglash konfiguratsiyasi
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
@@ -61,8 +65,14 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
+        if connection.dialect.name == "postgresql" and settings.MIGRATION_LOCK_TIMEOUT_MS:
+            # DDL qulfni kutib navbatda turmaydi (orqasidagi barcha so'rovlar ham to'xtab qolardi), tez yiqiladi
+            connection.exec_driver_sql(f"SET lock_timeout = {settings.MIGRATION_LOCK_TIMEOUT_MS}")
+            connection.commit()
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata,
+            # Har bir revisiya alohida tranzaksiyada: qulflar butun upgrade davomida ushlanmaydi
+            transaction_per_migration=True,
         )
 
         with context.begin_transaction():
@@ -0,0 +1,30 @@
+"""add version columns for optimistic concurrency
+
+Revision ID: 0b7d5e2f1a63
+Revises: f61c3a8b94d2
+Create Date: 2026-10-19 17:02:44.519306
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0b7d5e2f1a63'
+down_revision: Union[str, None] = 'f61c3a8b94d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+VERSIONED_TABLES = ('users', 'patients', 'doctor_services')
+
+
+def upgrade() -> None:
+    for table in VERSIONED_TABLES:
+        op.add_column(table, sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    for table in VERSIONED_TABLES:
+        op.drop_column(table, 'version')
@@ -0,0 +1,27 @@
+"""add version column to appointments
+
+Revision ID: 2d6e8a4c9f17
+Revises: 7b2f5c9e1d48
+Create Date: 2026-10-20 10:26:53.910248
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2d6e8a4c9f17'
+down_revision: Union[str, None] = '7b2f5c9e1d48'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Doimiy standart qiymat: jadval (va partitsiyalar) qayta yozilmaydi
+    op.add_column('appointments', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('appointments', 'version')
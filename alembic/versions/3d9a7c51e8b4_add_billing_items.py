@@ -0,0 +1,75 @@
+"""add billing items and denormalized billing totals
+
+Revision ID: 3d9a7c51e8b4
+Revises: 0b7d5e2f1a63
+Create Date: 2026-10-19 17:40:18.902415
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.migrations import batched_backfill
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3d9a7c51e8b4'
+down_revision: Union[str, None] = '0b7d5e2f1a63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # billings partitsiyalangan, shuning uchun billing_id -> billings bog'lanishi ilova darajasida
+    op.create_table('billing_items',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('clinic_id', sa.Integer(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('billing_id', sa.Integer(), nullable=False),
+    sa.Column('service_id', sa.Integer(), nullable=True),
+    sa.Column('description', sa.String(), nullable=True),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('unit_price', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('discount', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('amount', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['clinic_id'], ['clinics.id'], ),
+    sa.ForeignKeyConstraint(['service_id'], ['doctor_services.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_billing_items_id'), 'billing_items', ['id'], unique=False)
+    op.create_index(op.f('ix_billing_items_clinic_id'), 'billing_items', ['clinic_id'], unique=False)
+    op.create_index(op.f('ix_billing_items_billing_id'), 'billing_items', ['billing_id'], unique=False)
+
+    op.add_column('billings', sa.Column('subtotal', sa.Numeric(precision=10, scale=2), nullable=True))
+    op.add_column('billings', sa.Column('discount', sa.Numeric(precision=10, scale=2), server_default='0', nullable=False))
+    op.add_column('appointments', sa.Column('billed_total', sa.Numeric(precision=10, scale=2), server_default='0', nullable=False))
+    op.add_column('appointments', sa.Column('paid_total', sa.Numeric(precision=10, scale=2), server_default='0', nullable=False))
+
+    # Mavjud ma'lumotlar: eski summalar qator sifatida saqlanadi, qabul yig'indilari bir marta hisoblanadi
+    batched_backfill('billings', 'subtotal = total_amount', where='subtotal IS NULL')
+    op.execute("""
+        INSERT INTO billing_items (clinic_id, billing_id, service_id, description, quantity, unit_price, discount, amount)
+        SELECT b.clinic_id, b.id, a.service_id, s.service_name, 1, COALESCE(b.total_amount, 0), 0, COALESCE(b.total_amount, 0)
+        FROM billings b
+        LEFT JOIN appointments a ON a.id = b.appointment_id
+        LEFT JOIN doctor_services s ON s.id = a.service_id
+    """)
+    batched_backfill('appointments', """
+        billed_total = (SELECT COALESCE(SUM(b.total_amount), 0) FROM billings b WHERE b.appointment_id = appointments.id),
+        paid_total = (SELECT COALESCE(SUM(b.total_amount), 0) FROM billings b
+                      WHERE b.appointment_id = appointments.id AND b.paid)
+    """, where="""
+        EXISTS (SELECT 1 FROM billings b WHERE b.appointment_id = appointments.id AND b.total_amount IS NOT NULL)
+    """)
+
+
+def downgrade() -> None:
+    op.drop_column('appointments', 'paid_total')
+    op.drop_column('appointments', 'billed_total')
+    op.drop_column('billings', 'discount')
+    op.drop_column('billings', 'subtotal')
+    op.drop_index(op.f('ix_billing_items_billing_id'), table_name='billing_items')
+    op.drop_index(op.f('ix_billing_items_clinic_id'), table_name='billing_items')
+    op.drop_index(op.f('ix_billing_items_id'), table_name='billing_items')
+    op.drop_table('billing_items')
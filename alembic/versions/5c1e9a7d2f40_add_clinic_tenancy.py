@@ -0,0 +1,63 @@
+"""add clinic tenancy
+
+Revision ID: 5c1e9a7d2f40
+Revises: d3ff5fa9d6cc
+Create Date: 2026-10-19 10:12:41.208114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.migrations import add_foreign_key, create_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1e9a7d2f40'
+down_revision: Union[str, None] = 'd3ff5fa9d6cc'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TENANT_TABLES = ('doctors', 'doctor_services', 'patients', 'patient_histories', 'appointments', 'billings')
+
+
+def upgrade() -> None:
+    op.create_table('clinics',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_index(op.f('ix_clinics_id'), 'clinics', ['id'], unique=False)
+    op.execute("INSERT INTO clinics (id, name) VALUES (1, 'Main')")
+    op.execute("SELECT setval(pg_get_serial_sequence('clinics', 'id'), 1)")
+
+    # Mavjud yozuvlar standart filialga biriktiriladi (doimiy standart qiymat jadvalni qayta yozmaydi)
+    for table in TENANT_TABLES:
+        op.add_column(table, sa.Column('clinic_id', sa.Integer(), server_default='1', nullable=False))
+        op.alter_column(table, 'clinic_id', server_default=None)
+    op.add_column('users', sa.Column('clinic_id', sa.Integer(), nullable=True))
+    for table in TENANT_TABLES + ('users',):
+        add_foreign_key(f'{table}_clinic_id_fkey', table, 'clinics', ['clinic_id'], ['id'])
+        create_index_concurrently(f'ix_{table}_clinic_id', table, ['clinic_id'])
+
+    # Telefon endi filial ichida unikal: indeks bloklamasdan quriladi, cheklov unga biriktiriladi
+    create_index_concurrently('uq_patients_clinic_phone', 'patients', ['clinic_id', 'phone'], unique=True)
+    op.execute("ALTER TABLE patients ADD CONSTRAINT uq_patients_clinic_phone UNIQUE USING INDEX uq_patients_clinic_phone")
+    op.drop_constraint('patients_phone_key', 'patients', type_='unique')
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_patients_clinic_phone', 'patients', type_='unique')
+    op.create_unique_constraint('patients_phone_key', 'patients', ['phone'])
+
+    op.drop_index('ix_users_clinic_id', table_name='users')
+    op.drop_constraint('users_clinic_id_fkey', 'users', type_='foreignkey')
+    op.drop_column('users', 'clinic_id')
+    for table in TENANT_TABLES:
+        op.drop_index(f'ix_{table}_clinic_id', table_name=table)
+        op.drop_constraint(f'{table}_clinic_id_fkey', table, type_='foreignkey')
+        op.drop_column(table, 'clinic_id')
+    op.drop_index(op.f('ix_clinics_id'), table_name='clinics')
+    op.drop_table('clinics')
@@ -0,0 +1,41 @@
+"""add created_at/updated_at timestamps
+
+Revision ID: 6a2e8f0c4b17
+Revises: 3d9a7c51e8b4
+Create Date: 2026-10-19 18:12:37.448190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.migrations import create_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6a2e8f0c4b17'
+down_revision: Union[str, None] = '3d9a7c51e8b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ('clinics', 'users', 'doctors', 'doctor_services', 'patients', 'appointments',
+          'patient_histories', 'billings', 'billing_items')
+# /clinic/changes o'qiydigan jadvallar
+SYNC_TABLES = ('users', 'doctors', 'doctor_services', 'patients')
+
+
+def upgrade() -> None:
+    for table in TABLES:
+        op.add_column(table, sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False))
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False))
+    for table in SYNC_TABLES:
+        create_index_concurrently(f'ix_{table}_clinic_updated', table, ['clinic_id', 'updated_at', 'id'])
+
+
+def downgrade() -> None:
+    for table in SYNC_TABLES:
+        op.drop_index(f'ix_{table}_clinic_updated', table_name=table)
+    for table in TABLES:
+        op.drop_column(table, 'updated_at')
+        op.drop_column(table, 'created_at')
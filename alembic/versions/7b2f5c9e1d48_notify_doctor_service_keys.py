@@ -0,0 +1,67 @@
+"""notify changed doctor service keys
+
+Revision ID: 7b2f5c9e1d48
+Revises: e4a7c2f9b6d1
+Create Date: 2026-10-20 09:41:17.384521
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7b2f5c9e1d48'
+down_revision: Union[str, None] = 'e4a7c2f9b6d1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # doctor_services xabari o'zgargan xizmat kalitini ham olib keladi: workerlar butun filialni
+    # qayta o'qimasdan faqat shu kalitni yangilaydi (CatalogCache.patch_service)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION notify_catalog_change() RETURNS trigger AS $$
+        DECLARE
+            row_clinic_id integer;
+            payload text;
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                row_clinic_id := OLD.clinic_id;
+            ELSE
+                row_clinic_id := NEW.clinic_id;
+            END IF;
+            payload := TG_TABLE_NAME || ':' || row_clinic_id;
+            IF TG_TABLE_NAME = 'doctor_services' THEN
+                IF TG_OP = 'DELETE' THEN
+                    payload := payload || ':' || OLD.id || ':' || COALESCE(OLD.doctor_id::text, '') || ':'
+                        || COALESCE(OLD.service_type_id::text, '') || ':f';
+                ELSE
+                    payload := payload || ':' || NEW.id || ':' || COALESCE(NEW.doctor_id::text, '') || ':'
+                        || COALESCE(NEW.service_type_id::text, '') || ':'
+                        || CASE WHEN NEW.deleted_at IS NULL THEN 't' ELSE 'f' END;
+                END IF;
+            END IF;
+            PERFORM pg_notify('catalog_changes', payload);
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+
+
+def downgrade() -> None:
+    op.execute("""
+        CREATE OR REPLACE FUNCTION notify_catalog_change() RETURNS trigger AS $$
+        DECLARE
+            row_clinic_id integer;
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                row_clinic_id := OLD.clinic_id;
+            ELSE
+                row_clinic_id := NEW.clinic_id;
+            END IF;
+            PERFORM pg_notify('catalog_changes', TG_TABLE_NAME || ':' || row_clinic_id);
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
@@ -0,0 +1,74 @@
+"""partition appointments and billings by month
+
+Revision ID: 8e4b2d6a1c93
+Revises: 5c1e9a7d2f40
+Create Date: 2026-10-19 11:40:07.551820
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.partitions import TENANT_PARTITIONED_TABLES, is_partitioned, rebuild_partitioned
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e4b2d6a1c93'
+down_revision: Union[str, None] = '5c1e9a7d2f40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 3
+FOREIGN_KEYS = [
+    ('appointments_patient_id_fkey', 'appointments', 'patients', ['patient_id'], ['id']),
+    ('appointments_doctor_id_fkey', 'appointments', 'doctors', ['doctor_id'], ['id']),
+    ('appointments_service_id_fkey', 'appointments', 'doctor_services', ['service_id'], ['id']),
+    ('appointments_created_by_id_fkey', 'appointments', 'users', ['created_by_id'], ['id']),
+    ('appointments_clinic_id_fkey', 'appointments', 'clinics', ['clinic_id'], ['id']),
+    ('billings_clinic_id_fkey', 'billings', 'clinics', ['clinic_id'], ['id']),
+    ('billings_appointment_id_fkey', 'billings', 'appointments', ['appointment_id'], ['id']),
+]
+
+
+def _unpartition(table: str) -> None:
+    op.drop_index(f'ix_{table}_id', table_name=table)
+    op.drop_index(f'ix_{table}_clinic_id', table_name=table)
+    op.execute(f"ALTER TABLE {table} RENAME TO {table}_partitioned")
+    op.execute(f"ALTER INDEX {table}_pkey RENAME TO {table}_partitioned_pkey")
+    op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY NONE")
+    op.execute(f"CREATE TABLE {table} (LIKE {table}_partitioned INCLUDING DEFAULTS, PRIMARY KEY (id))")
+    op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id")
+    op.execute(f"INSERT INTO {table} SELECT * FROM {table}_partitioned")
+    op.execute(f"DROP TABLE {table}_partitioned CASCADE")
+    op.create_index(f'ix_{table}_id', table, ['id'], unique=False)
+    op.create_index(f'ix_{table}_clinic_id', table, ['clinic_id'], unique=False)
+
+
+def upgrade() -> None:
+    # Qatorli jadvalni qayta qurish butun jadvalni qulflaydi, shuning uchun u onlayn zanjirda emas:
+    # `python -m app.commands.partitions rebuild` texnik oynada bajariladi, bu revisiya esa
+    # natijani qabul qiladi. Bo'sh jadval (yangi o'rnatish) shu yerning o'zida bir zumda quriladi.
+    # appointments ning birlamchi kaliti endi sanani ham o'z ichiga oladi, billings -> appointments
+    # tashqi kaliti bazada qolmaydi: bog'lanishni CRUD yo'llari saqlaydi (create_for_appointment
+    # mavjud qabulni qulflab tekshiradi, qabul o'chirilsa billing ham o'chadi)
+    conn = op.get_bind()
+    pending = [table for table in TENANT_PARTITIONED_TABLES if not is_partitioned(conn, table)]
+    filled = [
+        table for table in pending
+        if conn.execute(sa.text(f"SELECT EXISTS (SELECT 1 FROM {table})")).scalar()
+    ]
+    if filled:
+        raise RuntimeError(
+            f"{', '.join(filled)} must be rebuilt in a maintenance window: stop writes, run "
+            "`python -m app.commands.partitions rebuild`, then run `alembic upgrade head` again"
+        )
+    for table in pending:
+        rebuild_partitioned(conn, table, months_ahead=MONTHS_AHEAD)
+
+
+def downgrade() -> None:
+    for table in TENANT_PARTITIONED_TABLES:
+        _unpartition(table)
+    for name, source, referent, local_cols, remote_cols in FOREIGN_KEYS:
+        op.create_foreign_key(name, source, referent, local_cols, remote_cols)
@@ -0,0 +1,42 @@
+"""add indexes backing list filters and sorting
+
+Revision ID: 9c4f1b3d7e25
+Revises: 6a2e8f0c4b17
+Create Date: 2026-10-19 18:47:03.266814
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from app.core.migrations import create_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c4f1b3d7e25'
+down_revision: Union[str, None] = '6a2e8f0c4b17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    create_index_concurrently('ix_doctors_clinic_specialization', 'doctors', ['clinic_id', 'specialization'])
+    create_index_concurrently('ix_doctor_services_clinic_doctor', 'doctor_services', ['clinic_id', 'doctor_id'])
+    create_index_concurrently('ix_doctor_services_clinic_price', 'doctor_services', ['clinic_id', 'price'])
+    # Partitsiyalangan jadvallarda indeks har bir partitsiyada yaratiladi
+    create_index_concurrently('ix_appointments_clinic_doctor_date', 'appointments',
+                              ['clinic_id', 'doctor_id', 'appointment_date'])
+    create_index_concurrently('ix_appointments_clinic_patient_date', 'appointments',
+                              ['clinic_id', 'patient_id', 'appointment_date'])
+    create_index_concurrently('ix_billings_clinic_payment_date', 'billings', ['clinic_id', 'payment_date'])
+    create_index_concurrently('ix_billings_unpaid', 'billings', ['clinic_id', 'payment_date'], where='paid = false')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_billings_unpaid', table_name='billings')
+    op.drop_index('ix_billings_clinic_payment_date', table_name='billings')
+    op.drop_index('ix_appointments_clinic_patient_date', table_name='appointments')
+    op.drop_index('ix_appointments_clinic_doctor_date', table_name='appointments')
+    op.drop_index('ix_doctor_services_clinic_price', table_name='doctor_services')
+    op.drop_index('ix_doctor_services_clinic_doctor', table_name='doctor_services')
+    op.drop_index('ix_doctors_clinic_specialization', table_name='doctors')
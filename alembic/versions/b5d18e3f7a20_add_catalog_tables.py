@@ -0,0 +1,110 @@
+"""add specialization and service type catalog
+
+Revision ID: b5d18e3f7a20
+Revises: 9c4f1b3d7e25
+Create Date: 2026-10-19 19:32:41.508117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.migrations import add_foreign_key, batched_backfill
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5d18e3f7a20'
+down_revision: Union[str, None] = '9c4f1b3d7e25'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def normalized(expr: str) -> str:
+    return f"regexp_replace(btrim({expr}), '\\s+', ' ', 'g')"
+
+
+CATALOG_TRIGGERS = {
+    'specializations': 'INSERT OR UPDATE OR DELETE',
+    'service_types': 'INSERT OR UPDATE OR DELETE',
+    # Narx o'zgarishi katalog keshiga ta'sir qilmaydi
+    'doctor_services': 'INSERT OR DELETE OR UPDATE OF doctor_id, service_type_id, deleted_at',
+}
+
+
+def upgrade() -> None:
+    for table, length in (('specializations', 100), ('service_types', None)):
+        op.create_table(
+            table,
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('clinic_id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(length=length), nullable=False),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+            sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+            sa.ForeignKeyConstraint(['clinic_id'], ['clinics.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index(f'ix_{table}_id', table, ['id'], unique=False)
+        op.create_index(f'uq_{table}_clinic_name', table, ['clinic_id', sa.text('lower(name)')], unique=True)
+
+    op.add_column('doctors', sa.Column('specialization_id', sa.Integer(), nullable=True))
+    op.add_column('doctor_services', sa.Column('service_type_id', sa.Integer(), nullable=True))
+    add_foreign_key('doctors_specialization_id_fkey', 'doctors', 'specializations', ['specialization_id'], ['id'])
+    add_foreign_key('doctor_services_service_type_id_fkey', 'doctor_services', 'service_types',
+                    ['service_type_id'], ['id'])
+
+    # Mavjud erkin matnlardan katalog: bo'shliqlar normallashtiriladi, registr farqi birlashtiriladi
+    for table, source, column, fk in (
+        ('specializations', 'doctors', 'specialization', 'specialization_id'),
+        ('service_types', 'doctor_services', 'service_name', 'service_type_id'),
+    ):
+        # Shu revisiyada yaratilgan (hali ishlatilmayotgan) katalog jadvaliga yoziladi
+        op.execute(f"""
+            INSERT INTO {table} (clinic_id, name)
+            SELECT DISTINCT ON (clinic_id, lower({normalized(column)})) clinic_id, {normalized(column)}
+            FROM {source}
+            WHERE {column} IS NOT NULL AND btrim({column}) <> ''
+            ORDER BY clinic_id, lower({normalized(column)}), id
+        """)  # migration-lint: ignore
+        batched_backfill(source, f"""
+            ({fk}, {column}) = (
+                SELECT c.id, c.name FROM {table} c
+                WHERE c.clinic_id = {source}.clinic_id AND lower(c.name) = lower({normalized(f'{source}.{column}')})
+            )
+        """, where=f"{fk} IS NULL AND {column} IS NOT NULL AND btrim({column}) <> ''")
+
+    # Keshni bekor qilish: har bir o'zgarishda "jadval:clinic_id" xabari (bir tranzaksiyadagi bir xillari birlashadi)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION notify_catalog_change() RETURNS trigger AS $$
+        DECLARE
+            row_clinic_id integer;
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                row_clinic_id := OLD.clinic_id;
+            ELSE
+                row_clinic_id := NEW.clinic_id;
+            END IF;
+            PERFORM pg_notify('catalog_changes', TG_TABLE_NAME || ':' || row_clinic_id);
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    for table, events in CATALOG_TRIGGERS.items():
+        op.execute(f"""
+            CREATE TRIGGER {table}_catalog_notify AFTER {events} ON {table}
+            FOR EACH ROW EXECUTE FUNCTION notify_catalog_change()
+        """)
+
+
+def downgrade() -> None:
+    for table in CATALOG_TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_catalog_notify ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS notify_catalog_change()")
+    op.drop_constraint('doctor_services_service_type_id_fkey', 'doctor_services', type_='foreignkey')
+    op.drop_column('doctor_services', 'service_type_id')
+    op.drop_constraint('doctors_specialization_id_fkey', 'doctors', type_='foreignkey')
+    op.drop_column('doctors', 'specialization_id')
+    for table in ('service_types', 'specializations'):
+        op.drop_index(f'uq_{table}_clinic_name', table_name=table)
+        op.drop_index(f'ix_{table}_id', table_name=table)
+        op.drop_table(table)
@@ -0,0 +1,41 @@
+"""add reminder deliveries and appointment date index
+
+Revision ID: c4d81b7e29fa
+Revises: a7f3c91e0b52
+Create Date: 2026-10-19 14:21:36.904417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.migrations import create_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d81b7e29fa'
+down_revision: Union[str, None] = 'a7f3c91e0b52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('reminder_deliveries',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('idempotency_key', sa.String(), nullable=False),
+    sa.Column('appointment_id', sa.Integer(), nullable=False),
+    sa.Column('channel', sa.String(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('sent_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('idempotency_key')
+    )
+    op.create_index(op.f('ix_reminder_deliveries_appointment_id'), 'reminder_deliveries', ['appointment_id'], unique=False)
+    create_index_concurrently('ix_appointments_appointment_date', 'appointments', ['appointment_date'])
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_appointments_appointment_date'), table_name='appointments')
+    op.drop_index(op.f('ix_reminder_deliveries_appointment_id'), table_name='reminder_deliveries')
+    op.drop_table('reminder_deliveries')
@@ -0,0 +1,75 @@
+"""add foreign key, covering and one-to-one indexes
+
+Revision ID: d9f3b6a2c481
+Revises: c7e2a9d4f153
+Create Date: 2026-10-19 21:08:52.731640
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from app.core.migrations import batched_backfill, create_index_concurrently, drop_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd9f3b6a2c481'
+down_revision: Union[str, None] = 'c7e2a9d4f153'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# CASCADES va bog'langan yozuvni o'chirishda filialsiz qidiriladigan tashqi kalitlar
+FOREIGN_KEYS = [
+    ('appointments', 'doctor_id'),
+    ('appointments', 'patient_id'),
+    ('appointments', 'service_id'),
+    ('appointments', 'created_by_id'),
+    ('doctor_services', 'doctor_id'),
+    ('doctor_services', 'service_type_id'),
+    ('doctors', 'specialization_id'),
+    ('patient_histories', 'patient_id'),
+    ('billings', 'appointment_id'),
+    ('billing_items', 'service_id'),
+]
+
+# (yangi qoplovchi indeks, jadval, kalit ustunlar, INCLUDE, almashtiriladigan indeks)
+COVERING = [
+    ('ix_appointments_clinic_doctor_date_covering', 'appointments', ['clinic_id', 'doctor_id', 'appointment_date'],
+     ['id', 'patient_id', 'service_id', 'deleted_at'], 'ix_appointments_clinic_doctor_date'),
+    ('ix_appointments_clinic_patient_date_covering', 'appointments', ['clinic_id', 'patient_id', 'appointment_date'],
+     ['id', 'doctor_id', 'service_id', 'deleted_at'], 'ix_appointments_clinic_patient_date'),
+    ('ix_doctor_services_clinic_doctor_covering', 'doctor_services', ['clinic_id', 'doctor_id'],
+     ['id', 'service_name', 'price', 'deleted_at'], 'ix_doctor_services_clinic_doctor'),
+    ('ix_billings_clinic_payment_date_covering', 'billings', ['clinic_id', 'payment_date'],
+     ['id', 'appointment_id', 'total_amount', 'paid', 'deleted_at'], 'ix_billings_clinic_payment_date'),
+]
+
+
+def upgrade() -> None:
+    for table, column in FOREIGN_KEYS:
+        create_index_concurrently(f'ix_{table}_{column}', table, [column])
+
+    # Bemorda bir nechta amaldagi tarix bo'lsa eng yangisi qoladi, qolganlari soft delete
+    batched_backfill('patient_histories', 'deleted_at = now()', where="""
+        deleted_at IS NULL AND EXISTS (
+            SELECT 1 FROM patient_histories newer
+            WHERE newer.patient_id = patient_histories.patient_id AND newer.deleted_at IS NULL
+              AND newer.id > patient_histories.id
+        )
+    """)
+    create_index_concurrently('uq_patient_histories_patient_live', 'patient_histories', ['patient_id'],
+                              unique=True, where='deleted_at IS NULL')
+
+    # Yangi indeks tayyor bo'lgandan keyingina eskisi o'chiriladi
+    for name, table, columns, include, replaced in COVERING:
+        create_index_concurrently(name, table, columns, include=include)
+        drop_index_concurrently(replaced, table)
+
+
+def downgrade() -> None:
+    for name, table, columns, include, replaced in reversed(COVERING):
+        op.create_index(replaced, table, columns, unique=False)
+        op.drop_index(name, table_name=table)
+    op.drop_index('uq_patient_histories_patient_live', table_name='patient_histories')
+    for table, column in reversed(FOREIGN_KEYS):
+        op.drop_index(f'ix_{table}_{column}', table_name=table)
@@ -0,0 +1,65 @@
+"""add append-only audit log partitioned by month
+
+Revision ID: e2a95f4c7d18
+Revises: c4d81b7e29fa
+Create Date: 2026-10-19 15:48:12.630291
+
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.partitions import add_months, create_month_partition, month_start
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2a95f4c7d18'
+down_revision: Union[str, None] = 'c4d81b7e29fa'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 3
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE audit_log (
+            id BIGSERIAL NOT NULL,
+            occurred_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            entity VARCHAR NOT NULL,
+            entity_id INTEGER NOT NULL,
+            action VARCHAR NOT NULL,
+            actor_id INTEGER,
+            clinic_id INTEGER,
+            changes JSON NOT NULL,
+            PRIMARY KEY (id, occurred_at)
+        ) PARTITION BY RANGE (occurred_at)
+    """)
+    op.execute("CREATE TABLE audit_log_default PARTITION OF audit_log DEFAULT")
+    conn = op.get_bind()
+    current = month_start(date.today())
+    for offset in range(MONTHS_AHEAD + 1):
+        create_month_partition(conn, 'audit_log', add_months(current, offset))
+    op.create_index('ix_audit_log_entity', 'audit_log', ['entity', 'entity_id', 'occurred_at'], unique=False)
+    op.create_index('ix_audit_log_actor', 'audit_log', ['actor_id', 'occurred_at'], unique=False)
+
+    # Jurnal faqat qo'shiladi: UPDATE/DELETE taqiqlanadi (DETACH orqali arxivlash bundan mustasno)
+    op.execute("""
+        CREATE FUNCTION audit_log_append_only() RETURNS trigger AS $$
+        BEGIN
+            RAISE EXCEPTION 'audit_log is append-only';
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER audit_log_append_only
+        BEFORE UPDATE OR DELETE ON audit_log
+        FOR EACH ROW EXECUTE FUNCTION audit_log_append_only()
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE audit_log CASCADE")
+    op.execute("DROP FUNCTION audit_log_append_only()")
@@ -0,0 +1,37 @@
+"""add unique live doctor service index
+
+Revision ID: e4a7c2f9b6d1
+Revises: d9f3b6a2c481
+Create Date: 2026-10-19 23:14:05.218374
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from app.core.migrations import batched_backfill, create_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4a7c2f9b6d1'
+down_revision: Union[str, None] = 'd9f3b6a2c481'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Doktorda bir xil turdagi bir nechta amaldagi xizmat bo'lsa eng eskisi qoladi, qolganlari soft delete
+    batched_backfill('doctor_services', 'deleted_at = now()', where="""
+        deleted_at IS NULL AND service_type_id IS NOT NULL AND EXISTS (
+            SELECT 1 FROM doctor_services older
+            WHERE older.clinic_id = doctor_services.clinic_id AND older.doctor_id = doctor_services.doctor_id
+              AND older.service_type_id = doctor_services.service_type_id AND older.deleted_at IS NULL
+              AND older.id < doctor_services.id
+        )
+    """)
+    create_index_concurrently('uq_doctor_services_clinic_doctor_type_live', 'doctor_services',
+                              ['clinic_id', 'doctor_id', 'service_type_id'], unique=True, where='deleted_at IS NULL')
+
+
+def downgrade() -> None:
+    op.drop_index('uq_doctor_services_clinic_doctor_type_live', table_name='doctor_services')
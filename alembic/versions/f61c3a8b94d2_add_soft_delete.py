@@ -0,0 +1,45 @@
+"""add deleted_at for soft delete
+
+Revision ID: f61c3a8b94d2
+Revises: e2a95f4c7d18
+Create Date: 2026-10-19 16:31:05.184722
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.migrations import create_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f61c3a8b94d2'
+down_revision: Union[str, None] = 'e2a95f4c7d18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CLINIC_TABLES = ('doctors', 'doctor_services', 'patients', 'patient_histories', 'appointments', 'billings')
+
+
+def upgrade() -> None:
+    for table in CLINIC_TABLES + ('users',):
+        op.add_column(table, sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True))
+    # Faqat "tirik" yozuvlar bo'yicha qisman indekslar
+    for table in CLINIC_TABLES:
+        create_index_concurrently(f'ix_{table}_clinic_live', table, ['clinic_id', 'id'], where='deleted_at IS NULL')
+    # O'chirilgan bemorning telefoni qayta ishlatilishi mumkin. Yangi indeks tayyor bo'lgach
+    # eski cheklov olib tashlanadi, shunda unikallik bir lahza ham tekshirilmay qolmaydi
+    create_index_concurrently('uq_patients_clinic_phone_live', 'patients', ['clinic_id', 'phone'],
+                              unique=True, where='deleted_at IS NULL')
+    op.drop_constraint('uq_patients_clinic_phone', 'patients', type_='unique')
+    op.execute("ALTER INDEX uq_patients_clinic_phone_live RENAME TO uq_patients_clinic_phone")
+
+
+def downgrade() -> None:
+    op.drop_index('uq_patients_clinic_phone', table_name='patients')
+    op.create_unique_constraint('uq_patients_clinic_phone', 'patients', ['clinic_id', 'phone'])
+    for table in CLINIC_TABLES:
+        op.drop_index(f'ix_{table}_clinic_live', table_name=table)
+    for table in CLINIC_TABLES + ('users',):
+        op.drop_column(table, 'deleted_at')
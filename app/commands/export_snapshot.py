@@ -0,0 +1,31 @@
+"""
+Analitika uchun jadvallar snapshotini Parquet yoki Arrow IPC fayllarga yozish.
+
+    python -m app.commands.export_snapshot --format parquet --output-dir snapshots/
+    python -m app.commands.export_snapshot --incremental --tables appointments billings
+"""
+import argparse
+
+from app.services.snapshot import FORMATS, SNAPSHOT_TABLES, export_snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Izchil (REPEATABLE READ) snapshot eksporti")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="parquet")
+    parser.add_argument("--output-dir", default=None)
+    parser.add_argument("--tables", nargs="+", choices=sorted(SNAPSHOT_TABLES), default=None)
+    parser.add_argument("--incremental", action="store_true", help="Oldingi snapshotdan keyingi qatorlar")
+    parser.add_argument("--batch-size", type=int, default=None)
+    args = parser.parse_args()
+
+    manifest = export_snapshot(
+        output_dir=args.output_dir, fmt=args.format, tables=args.tables,
+        incremental=args.incremental, batch_size=args.batch_size,
+    )
+    for name, state in manifest["tables"].items():
+        print(f"{name}: last_updated_at={state.get('last_updated_at')} last_id={state['last_id']} "
+              f"files={len(state['files'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+"""
+Ro'yxat endpointlaridagi filtr/saralash maydonlari indeks bilan qo'llab-quvvatlanishini tekshirish.
+Indekssiz maydon bo'lsa 1 kodi bilan chiqadi (CI da ishlatish uchun).
+
+    python -m app.commands.index_advisor
+"""
+import sys
+
+from app.crud.filters import index_advisor
+from app.crud.clinics import appointment_crud, billing_crud, doctor_crud, doctor_service_crud, patient_crud
+
+CRUDS = (doctor_crud, doctor_service_crud, patient_crud, appointment_crud, billing_crud)
+
+
+def main() -> int:
+    warnings = [warning for crud in CRUDS for warning in index_advisor(crud)]
+    for warning in warnings:
+        print(warning)
+    if not warnings:
+        print("All filterable and sortable fields are indexed")
+    return 1 if warnings else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
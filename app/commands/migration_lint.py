@@ -0,0 +1,232 @@
+"""
+Yangi Alembic revisiyalaridagi jadvalni uzoq bloklaydigan amallarni topish (CI da ishlatish uchun).
+Muammo bo'lsa 1 kodi bilan chiqadi. BASELINE gacha bo'lgan (allaqachon qo'llanilgan)
+revisiyalar tekshirilmaydi; shu revisiyada yaratilgan jadvallar ustidagi amallar bo'sh
+jadvalda bajarilgani uchun xavfsiz hisoblanadi. Ataylab qilingan amal qatoriga
+`# migration-lint: ignore` izohi qo'yiladi.
+
+    python -m app.commands.migration_lint
+    python -m app.commands.migration_lint --all
+    python -m app.commands.migration_lint alembic/versions/xxxx_add_something.py
+"""
+import argparse
+import ast
+import re
+import sys
+from pathlib import Path
+
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+
+ROOT = Path(__file__).resolve().parents[2]
+# Shu revisiyagacha hammasi production bazada qo'llanilgan
+BASELINE = "d3ff5fa9d6cc"
+IGNORE_MARKER = "migration-lint: ignore"
+
+# Ustun qo'shishda har bir qator uchun hisoblanadigan (jadvalni qayta yozadigan) standart qiymatlar
+VOLATILE_DEFAULT = re.compile(r"random\(|clock_timestamp\(|gen_random_uuid\(|uuid_generate_|nextval\(", re.I)
+
+# op.execute dagi SQL: (naqsh, xabar)
+SQL_RULES = [
+    (re.compile(r"\bCREATE\s+(UNIQUE\s+)?INDEX\s+(?!CONCURRENTLY\b)(?!.*\bON\s+ONLY\b)", re.I | re.S),
+     "CREATE INDEX without CONCURRENTLY blocks writes; use create_index_concurrently()"),
+    (re.compile(r"\bDROP\s+INDEX\s+(?!CONCURRENTLY\b)", re.I),
+     "DROP INDEX without CONCURRENTLY takes ACCESS EXCLUSIVE; use drop_index_concurrently()"),
+    (re.compile(r"\bADD\s+(CONSTRAINT\s+\w+\s+)?FOREIGN\s+KEY\b(?!.*\bNOT\s+VALID\b)", re.I | re.S),
+     "FOREIGN KEY without NOT VALID scans the table under lock; use add_foreign_key()"),
+    (re.compile(r"\bALTER\s+COLUMN\s+\w+\s+(SET\s+DATA\s+)?TYPE\b", re.I),
+     "ALTER COLUMN ... TYPE rewrites the table under ACCESS EXCLUSIVE"),
+    (re.compile(r"\bSET\s+NOT\s+NULL\b", re.I),
+     "SET NOT NULL scans the table under ACCESS EXCLUSIVE; use set_not_null()"),
+    (re.compile(r"\b(VACUUM\s+FULL|CLUSTER|LOCK\s+TABLE)\b", re.I),
+     "statement holds ACCESS EXCLUSIVE for its whole duration"),
+]
+# op.execute bilan yaratilgan jadval (masalan partitsiyalangan): u ham shu revisiyada yangi
+CREATE_TABLE = re.compile(r"\bCREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)", re.I)
+# Bitta tranzaksiyadagi katta UPDATE/DELETE/INSERT ... SELECT: (naqsh, jadval guruhi)
+DATA_RULE = re.compile(r"^\s*(UPDATE\s+(\w+)|DELETE\s+FROM\s+(\w+)|INSERT\s+INTO\s+(\w+)\b.*\bSELECT\b)", re.I | re.S)
+
+
+def _call_name(node: ast.Call):
+    # op.create_index(...) -> "create_index"
+    func = node.func
+    if isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) and func.value.id == "op":
+        return func.attr
+    return None
+
+
+def _keyword(node: ast.Call, name: str):
+    for keyword in node.keywords:
+        if keyword.arg == name:
+            return keyword.value
+    return None
+
+
+def _argument(node: ast.Call, position: int, name: str):
+    value = _keyword(node, name)
+    if value is None and len(node.args) > position:
+        value = node.args[position]
+    return value
+
+
+def _string(node):
+    """
+    Satr literal yoki f-string (o'rniga qo'yiladigan qismlar `x` bilan); aks holda None.
+    """
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.JoinedStr):
+        return "".join(part.value if isinstance(part, ast.Constant) else "x" for part in node.values)
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr == "text" and node.args:
+        return _string(node.args[0])
+    return None
+
+
+def _is_true(node) -> bool:
+    return isinstance(node, ast.Constant) and node.value is True
+
+
+def _column_problems(column) -> list:
+    if not isinstance(column, ast.Call):
+        return []
+    problems = []
+    default = _keyword(column, "server_default")
+    default_sql = ast.unparse(default) if default is not None else ""
+    nullable = _keyword(column, "nullable")
+    if isinstance(nullable, ast.Constant) and nullable.value is False and default is None:
+        problems.append("add_column NOT NULL without server_default fails on existing rows or needs a rewrite; "
+                        "add it nullable, backfill with batched_backfill(), then set_not_null()")
+    if VOLATILE_DEFAULT.search(default_sql):
+        problems.append("add_column with a volatile server_default rewrites the whole table")
+    if any(isinstance(arg, ast.Call) and ast.unparse(arg.func).endswith("ForeignKey") for arg in column.args):
+        problems.append("add_column with an inline ForeignKey validates it under lock; use add_foreign_key()")
+    return problems
+
+
+def _call_problems(node: ast.Call, name: str, new_tables: set) -> list:
+    if name == "create_index":
+        table = _string(_argument(node, 1, "table_name"))
+        if table in new_tables or _is_true(_keyword(node, "postgresql_concurrently")):
+            return []
+        return ["create_index blocks writes for the whole build; use create_index_concurrently()"]
+    if name == "drop_index":
+        if _is_true(_keyword(node, "postgresql_concurrently")):
+            return []
+        return ["drop_index takes ACCESS EXCLUSIVE; use drop_index_concurrently()"]
+    if name == "create_foreign_key":
+        if _string(_argument(node, 1, "source_table")) in new_tables:
+            return []
+        return ["create_foreign_key validates all rows under lock; use add_foreign_key() (NOT VALID + VALIDATE)"]
+    if name in ("create_unique_constraint", "create_primary_key", "create_check_constraint"):
+        if _string(_argument(node, 1, "table_name")) in new_tables:
+            return []
+        return [f"{name} on an existing table scans/builds under ACCESS EXCLUSIVE; "
+                "build the index concurrently first (or add the check NOT VALID)"]
+    if name == "add_column":
+        if _string(_argument(node, 0, "table_name")) in new_tables:
+            return []
+        return _column_problems(_argument(node, 1, "column"))
+    if name == "alter_column":
+        if _string(_argument(node, 0, "table_name")) in new_tables:
+            return []
+        problems = []
+        nullable = _keyword(node, "nullable")
+        if isinstance(nullable, ast.Constant) and nullable.value is False:
+            problems.append("alter_column(nullable=False) scans the table under ACCESS EXCLUSIVE; use set_not_null()")
+        if _keyword(node, "type_") is not None:
+            problems.append("alter_column(type_=...) may rewrite the table under ACCESS EXCLUSIVE")
+        return problems
+    if name == "execute":
+        sql = _string(_argument(node, 0, "sqltext"))
+        if sql is None:
+            return []
+        problems = [message for pattern, message in SQL_RULES if pattern.search(sql)]
+        data = DATA_RULE.search(sql)
+        if data is not None and not {table for table in data.groups()[1:] if table} & new_tables:
+            problems.append("unbatched data change in the migration transaction; use batched_backfill()")
+        return problems
+    return []
+
+
+def _called_functions(functions: dict, start: str) -> set:
+    # start va undan (bevosita yoki bilvosita) chaqiriladigan modul funksiyalari
+    found, pending = set(), [start]
+    while pending:
+        name = pending.pop()
+        if name in found or name not in functions:
+            continue
+        found.add(name)
+        pending.extend(node.func.id for node in ast.walk(functions[name])
+                       if isinstance(node, ast.Call) and isinstance(node.func, ast.Name))
+    return found
+
+
+def lint_source(source: str, path: str = "<revision>") -> list:
+    """
+    Revisiya faylidagi muammolar: ["path:qator: xabar", ...].
+    """
+    tree = ast.parse(source)
+    lines = source.splitlines()
+    calls = [(node, _call_name(node)) for node in ast.walk(tree) if isinstance(node, ast.Call)]
+    # downgrade() va faqat undan chaqiriladigan yordamchilar tekshirilmaydi: orqaga qaytarish
+    # favqulodda holatda, qo'lda bajariladi
+    functions = {node.name: node for node in tree.body if isinstance(node, ast.FunctionDef)}
+    skipped = set()
+    if "downgrade" in functions:
+        used = _called_functions(functions, "upgrade")
+        for name in _called_functions(functions, "downgrade") - used:
+            skipped |= {id(node) for node in ast.walk(functions[name])}
+    new_tables = {
+        _string(_argument(node, 0, "table_name"))
+        for node, name in calls if name == "create_table" and id(node) not in skipped
+    }
+    # Faqat oddiy satrlardan: f-string dagi nom (`x`) aniq jadvalni bildirmaydi
+    new_tables |= {
+        table
+        for node, name in calls if name == "execute" and id(node) not in skipped
+        and isinstance(_argument(node, 0, "sqltext"), ast.Constant)
+        for table in CREATE_TABLE.findall(_string(_argument(node, 0, "sqltext")) or "")
+    }
+    problems = []
+    for node, name in sorted(calls, key=lambda item: item[0].lineno):
+        if name is None or id(node) in skipped:
+            continue
+        if any(IGNORE_MARKER in line for line in lines[node.lineno - 1:node.end_lineno]):
+            continue
+        for message in _call_problems(node, name, new_tables):
+            problems.append(f"{path}:{node.lineno}: {message}")
+    return problems
+
+
+def revision_paths(include_all: bool = False) -> list:
+    script = ScriptDirectory.from_config(Config(str(ROOT / "alembic.ini")))
+    revisions = {revision.revision: revision for revision in script.walk_revisions()}
+    applied = set()
+    pending = [] if include_all else [BASELINE]
+    while pending:
+        current = revisions.get(pending.pop())
+        if current is None or current.revision in applied:
+            continue
+        applied.add(current.revision)
+        down = current.down_revision
+        pending.extend((down,) if isinstance(down, str) else down or ())
+    return sorted(revision.path for key, revision in revisions.items() if key not in applied)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Migratsiyalardagi bloklovchi amallarni topish")
+    parser.add_argument("paths", nargs="*", help="Tekshiriladigan revisiya fayllari (standart: BASELINE dan keyingilar)")
+    parser.add_argument("--all", action="store_true", help="Barcha revisiyalarni tekshirish")
+    args = parser.parse_args()
+
+    paths = args.paths or revision_paths(args.all)
+    problems = [problem for path in paths for problem in lint_source(Path(path).read_text(), str(path))]
+    for problem in problems:
+        print(problem)
+    if not problems:
+        print(f"{len(paths)} revision(s) checked, no blocking operations found")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+"""
+Outbox hodisalarini bajaruvchi worker.
+
+    python -m app.commands.outbox_worker
+
+Handlerlar OUTBOX_HANDLER_MODULES dan yuklanadi; eski hodisalarni purge_outbox tozalaydi.
+"""
+import logging
+import time
+
+from app.core import outbox
+from app.core.config import settings
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+def report_unhandled():
+    with SessionLocal() as db:
+        db.info["use_primary"] = True
+        for topic, count in outbox.unhandled_topics(db).items():
+            logger.warning("Outbox topic %s has no handler, %s event(s) left pending", topic, count)
+
+
+def run(poll_interval: float = None):
+    outbox.load_handlers()
+    report_unhandled()
+    poll_interval = poll_interval or settings.OUTBOX_POLL_INTERVAL_SECONDS
+    while True:
+        try:
+            processed = outbox.drain(SessionLocal)
+        except Exception:
+            logger.exception("Outbox drain failed")
+            processed = 0
+        if not processed:
+            time.sleep(poll_interval)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    run()
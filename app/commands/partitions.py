@@ -0,0 +1,91 @@
+"""
+Partitsiyalarni boshqarish buyrug'i.
+
+    python -m app.commands.partitions create --months-ahead 3
+    python -m app.commands.partitions archive --older-than-months 24 --output-dir archive/
+    python -m app.commands.partitions rebuild --months-ahead 3
+
+`rebuild` appointments/billings ni oy va filial bo'yicha bo'lingan jadvallarga qayta quradi.
+Jadvallar butunlay qayta yoziladi (ACCESS EXCLUSIVE), shuning uchun bu onlayn migratsiyalar
+zanjirida emas, texnik oynada bajariladi:
+
+    alembic upgrade 5c1e9a7d2f40                        # oxirgi onlayn revisiya
+    # ilovani va fon ishchilarini to'xtatish (yozuvlar yo'q)
+    python -m app.commands.partitions rebuild
+    alembic upgrade head                                # 8e4b2d6a1c93 qayta qurilgan jadvallarni qabul qiladi
+
+Bo'sh bazada (yangi o'rnatish) 8e4b2d6a1c93 qayta qurishni o'zi bajaradi.
+"""
+import argparse
+from datetime import date
+
+from sqlalchemy import text
+
+from app.core.partitions import (
+    TENANT_PARTITIONED_TABLES, TIME_PARTITIONED_TABLES, add_months, archive_month_partition,
+    ensure_month_partitions, is_partitioned, month_partitions, month_start, rebuild_partitioned,
+)
+from app.database import engine
+
+# Qayta qurish shu revisiyadagi sxemaga mo'ljallangan
+REBUILD_REVISION = "5c1e9a7d2f40"
+
+
+def create(months_ahead: int):
+    with engine.begin() as conn:
+        ensure_month_partitions(conn, months_ahead=months_ahead)
+
+
+def archive(older_than_months: int, output_dir: str):
+    cutoff = add_months(month_start(date.today()), -older_than_months)
+    for table in TIME_PARTITIONED_TABLES:
+        with engine.connect() as conn:
+            if not is_partitioned(conn, table):
+                continue
+            partitions = [name for name, month in month_partitions(conn, table) if month < cutoff]
+        # Har bir partitsiya alohida tranzaksiyada arxivlanadi
+        for partition in partitions:
+            with engine.begin() as conn:
+                path = archive_month_partition(conn, table, partition, output_dir)
+            print(f"{partition} -> {path}")
+
+
+def rebuild(months_ahead: int):
+    # Ikkala jadval bitta tranzaksiyada: xato bo'lsa baza oldingi holatida qoladi
+    with engine.begin() as conn:
+        version = conn.execute(text("SELECT version_num FROM alembic_version")).scalar()
+        if version != REBUILD_REVISION:
+            raise SystemExit(f"Database is at revision {version}; run `alembic upgrade {REBUILD_REVISION}` first")
+        for table in TENANT_PARTITIONED_TABLES:
+            if is_partitioned(conn, table):
+                print(f"{table}: already partitioned")
+                continue
+            rebuild_partitioned(conn, table, months_ahead=months_ahead)
+            print(f"{table}: rebuilt")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="appointments/billings partitsiyalarini boshqarish")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    create_parser = commands.add_parser("create", help="Kelgusi oylar uchun partitsiyalar yaratish")
+    create_parser.add_argument("--months-ahead", type=int, default=3)
+
+    archive_parser = commands.add_parser("archive", help="Eski oylarni ajratib, siqilgan faylga yozish")
+    archive_parser.add_argument("--older-than-months", type=int, default=24)
+    archive_parser.add_argument("--output-dir", default="archive")
+
+    rebuild_parser = commands.add_parser("rebuild", help="appointments/billings ni texnik oynada qayta qurish")
+    rebuild_parser.add_argument("--months-ahead", type=int, default=3)
+
+    args = parser.parse_args()
+    if args.command == "create":
+        create(args.months_ahead)
+    elif args.command == "rebuild":
+        rebuild(args.months_ahead)
+    else:
+        archive(args.older_than_months, args.output_dir)
+
+
+if __name__ == "__main__":
+    main()
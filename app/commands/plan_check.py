@@ -0,0 +1,277 @@
+"""
+Asosiy CRUD so'rovlari rejalarining regressiyasini tekshirish (faqat Postgres, CI da ishlatish uchun).
+
+HOT_QUERIES dagi CRUD chaqiruvlari (routerlar ishlatadiganlari ham) bajariladi, ular yuborgan
+SELECT lar ushlanib `EXPLAIN (FORMAT JSON)` qilinadi. Reja shakli (tugunlar, indekslar;
+partitsiya nomlarisiz) va narx bahosi bazaviy fayl bilan solishtiriladi. Katta jadvalda
+Seq Scan paydo bo'lsa yoki narx chegaradan ko'p oshsa 1 kodi bilan chiqadi.
+
+`--seed` bilan yangi filialga sintetik ma'lumotlar yoziladi va ANALYZE qilinadi; hammasi bitta
+tranzaksiyada bo'lib, oxirida rollback (bazada hech narsa qolmaydi).
+
+    python -m app.commands.plan_check --seed --update   # bazaviy rejalarni yozish
+    python -m app.commands.plan_check --seed            # solishtirish
+    python -m app.commands.plan_check --clinic-id 3     # mavjud ma'lumotlarda
+
+Bazaviy fayl (query_plans.json, repozitoriy ildizida) Postgresga bog'liq, shuning uchun uni
+CI dagi bazada yaratiladi va repozitoriyga commit qilinadi. Bir martalik (va migratsiya yoki
+indeks o'zgarib, rejalar ataylab o'zgarganda) qadamlar:
+
+    alembic upgrade head                                # toza Postgres bazada
+    python -m app.commands.plan_check --seed --update
+    git add query_plans.json                            # o'zgarishni ko'rib chiqib commit qilish
+
+CI ning har bir ishga tushishida migratsiyalardan keyin `--seed` bilan solishtirish qadami
+ishlaydi. Bazaviy fayl bo'lmasa (`--update` siz) tekshiruv 1 kodi bilan yiqiladi: jim o'tib
+ketmasligi uchun.
+"""
+import argparse
+import json
+import re
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.core.partitions import create_clinic_partitions, ensure_month_partitions, month_start
+from app.crud.clinics import (
+    appointment_crud, billing_crud, doctor_crud, doctor_service_crud, patient_crud, patient_history_crud,
+)
+from app.database import engine
+
+ROOT = Path(__file__).resolve().parents[2]
+BASELINE_FILE = ROOT / "query_plans.json"
+COST_THRESHOLD = 0.5  # bazaviy narxdan 50% dan ko'p o'sish - regressiya
+SEQ_SCAN_MIN_ROWS = 1000  # bundan kichik jadvallarda Seq Scan normal
+
+SEED_TABLES = ("users", "doctors", "doctor_services", "patients", "patient_histories",
+               "appointments", "billings", "billing_items")
+# Partitsiya qo'shimchalari: appointments_y2026m10_clinic_3 -> appointments
+PARTITION_SUFFIX = re.compile(r"_y\d{4}m\d{2}|_clinic_\d+|_default")
+
+
+# So'rov nomi -> CRUD chaqiruvi; `s` - namunaviy id lar (sample())
+HOT_QUERIES = {
+    "doctors.list": lambda db, s: doctor_crud.get_multi(db, limit=100),
+    "doctors.by_specialization": lambda db, s: doctor_crud.get_multi(
+        db, filters=[("specialization", s["specialization"])], order_by="specialization"),
+    "services.list": lambda db, s: doctor_service_crud.get_multi(db, limit=100),
+    "services.by_doctor": lambda db, s: doctor_service_crud.get_services_by_doctor(db, s["doctor_id"]),
+    "patients.list": lambda db, s: patient_crud.get_multi(db, limit=100, order_by="-updated_at"),
+    "patients.by_phone": lambda db, s: patient_crud.get_multi(db, filters=[("phone", s["phone"])]),
+    "patients.get": lambda db, s: patient_crud.get(db, s["patient_id"]),
+    "patients.timeline": lambda db, s: patient_crud.get_timeline(db, s["patient_id"]),
+    "patient_history.by_patient": lambda db, s: patient_history_crud.get_history_by_patient(db, s["patient_id"]),
+    "appointments.list": lambda db, s: appointment_crud.get_multi_by_date(
+        db, date_from=s["date_from"], date_to=s["date_to"], order_by="-appointment_date"),
+    "appointments.list_by_doctor": lambda db, s: appointment_crud.get_multi_by_date(
+        db, filters=[("doctor_id", str(s["doctor_id"]))], date_from=s["date_from"], date_to=s["date_to"]),
+    "appointments.by_doctor": lambda db, s: appointment_crud.get_appointments_by_doctor(db, s["doctor_id"]),
+    "appointments.by_patient": lambda db, s: appointment_crud.get_appointments_by_patient(db, s["patient_id"]),
+    "appointments.get": lambda db, s: appointment_crud.get(db, s["appointment_id"]),
+    "billings.list_unpaid": lambda db, s: billing_crud.get_multi_by_date(
+        db, filters=[("paid", "false")], date_from=s["date_from"], date_to=s["date_to"]),
+    "billings.by_appointment": lambda db, s: billing_crud.get_billing_by_appointment(db, s["billed_appointment_id"]),
+    "billings.revenue": lambda db, s: billing_crud.revenue(db, date_from=s["date_from"], date_to=s["date_to"]),
+}
+
+
+def seed(conn, rows: int) -> int:
+    """
+    Yangi filial va unga sintetik ma'lumotlar (`rows` ta qabul, yarmiga hisob-kitob). Filial id si qaytadi.
+    """
+    clinic_id = conn.execute(text("INSERT INTO clinics (name) VALUES ('plan-check ' || now()) RETURNING id")).scalar()
+    ensure_month_partitions(conn)
+    create_clinic_partitions(conn, clinic_id)
+    params = {
+        "clinic": clinic_id, "rows": rows, "doctors": max(rows // 1000, 10), "patients": max(rows // 10, 100),
+        "start": month_start(date.today()), "days": 90,
+    }
+    statements = [
+        """INSERT INTO users (username, email, phone, first_name, last_name, password, role, clinic_id)
+           SELECT 'plan_check_' || :clinic || '_' || g, NULL, '99' || lpad(g::text, 7, '0'), 'Doctor', 'D' || g,
+                  'x', 'doctor', :clinic
+           FROM generate_series(1, :doctors) g""",
+        """INSERT INTO doctors (id, clinic_id, specialization)
+           SELECT id, :clinic, (ARRAY['Terapevt', 'Kardiolog', 'Nevrolog', 'Stomatolog'])[1 + id % 4]
+           FROM users WHERE clinic_id = :clinic AND username LIKE 'plan\\_check\\_%'""",
+        """INSERT INTO doctor_services (clinic_id, doctor_id, service_name, price)
+           SELECT :clinic, d.id, 'Xizmat ' || s, 50 + s * 10
+           FROM doctors d, generate_series(1, 5) s WHERE d.clinic_id = :clinic""",
+        """INSERT INTO patients (clinic_id, first_name, last_name, phone)
+           SELECT :clinic, 'Bemor', 'P' || g, lpad(g::text, 9, '0') FROM generate_series(1, :patients) g""",
+        """INSERT INTO patient_histories (clinic_id, patient_id, medical_history)
+           SELECT clinic_id, id, 'tarix' FROM patients WHERE clinic_id = :clinic""",
+        """WITH s AS (SELECT array_agg(id ORDER BY id) AS ids, array_agg(doctor_id ORDER BY id) AS doctors
+                      FROM doctor_services WHERE clinic_id = :clinic),
+                p AS (SELECT array_agg(id ORDER BY id) AS ids FROM patients WHERE clinic_id = :clinic)
+           INSERT INTO appointments (clinic_id, patient_id, doctor_id, service_id, appointment_date)
+           SELECT :clinic, p.ids[1 + g % cardinality(p.ids)], s.doctors[1 + g % cardinality(s.ids)],
+                  s.ids[1 + g % cardinality(s.ids)], CAST(:start AS date) + g % :days
+           FROM generate_series(1, :rows) g, s, p""",
+        """INSERT INTO billings (clinic_id, appointment_id, subtotal, discount, total_amount, paid, payment_date)
+           SELECT clinic_id, id, 100, 0, 100, id % 3 = 0, appointment_date
+           FROM appointments WHERE clinic_id = :clinic AND id % 2 = 0""",
+        """INSERT INTO billing_items (clinic_id, billing_id, service_id, description, quantity, unit_price, discount, amount)
+           SELECT b.clinic_id, b.id, a.service_id, 'Xizmat', 1, 100, 0, 100
+           FROM billings b JOIN appointments a ON a.id = b.appointment_id AND a.clinic_id = b.clinic_id
+           WHERE b.clinic_id = :clinic""",
+    ]
+    for statement in statements:
+        conn.execute(text(statement), params)
+    # Rejalashtiruvchi yangi ma'lumotlarni ko'rishi uchun
+    for table in SEED_TABLES:
+        conn.execute(text(f"ANALYZE {table}"))
+    return clinic_id
+
+
+def sample(conn, clinic_id: int) -> dict:
+    row = conn.execute(text("""
+        SELECT a.id, a.doctor_id, a.patient_id, a.appointment_date, d.specialization, p.phone
+        FROM appointments a JOIN doctors d ON d.id = a.doctor_id JOIN patients p ON p.id = a.patient_id
+        WHERE a.clinic_id = :clinic AND a.deleted_at IS NULL ORDER BY a.id LIMIT 1
+    """), {"clinic": clinic_id}).first()
+    if row is None:
+        raise SystemExit(f"Clinic {clinic_id} has no appointments; use --seed")
+    billed = conn.execute(text(
+        "SELECT appointment_id FROM billings WHERE clinic_id = :clinic AND deleted_at IS NULL ORDER BY id LIMIT 1"
+    ), {"clinic": clinic_id}).scalar()
+    return {
+        "appointment_id": row.id, "doctor_id": row.doctor_id, "patient_id": row.patient_id,
+        "specialization": row.specialization, "phone": row.phone, "billed_appointment_id": billed or row.id,
+        "date_from": row.appointment_date, "date_to": row.appointment_date + timedelta(days=30),
+    }
+
+
+def capture(conn, clinic_id: int, samples: dict) -> dict:
+    """
+    Har bir so'rov nomi uchun u yuborgan SELECT lar: {"patients.timeline#2": (sql, params)}.
+    """
+    captured = {}
+    db = Session(bind=conn)
+    db.info.update(clinic_id=clinic_id, use_primary=True)
+    for name, run in HOT_QUERIES.items():
+        statements = []
+
+        def record(connection, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith("SELECT"):
+                statements.append((statement, parameters))
+
+        event.listen(conn, "before_cursor_execute", record)
+        try:
+            run(db, samples)
+        finally:
+            event.remove(conn, "before_cursor_execute", record)
+        db.expunge_all()
+        for number, statement in enumerate(statements, 1):
+            captured[name if len(statements) == 1 else f"{name}#{number}"] = statement
+    return captured
+
+
+def _normalize(name: str) -> str:
+    return PARTITION_SUFFIX.sub("", name)
+
+
+def shape(node: dict) -> list:
+    """
+    Reja daraxti narxlarsiz: [tugun, [bolalar]]. Partitsiyalar bo'yicha takrorlanuvchi bolalar birlashtiriladi.
+    """
+    label = node["Node Type"]
+    if "Index Name" in node:
+        label += f" using {_normalize(node['Index Name'])}"
+    if "Relation Name" in node:
+        label += f" on {_normalize(node['Relation Name'])}"
+    children = []
+    for child in node.get("Plans", []):
+        child_shape = shape(child)
+        if child_shape not in children:
+            children.append(child_shape)
+    return [label, children]
+
+
+def seq_scans(node: dict) -> list:
+    found = [node["Relation Name"]] if node["Node Type"] == "Seq Scan" else []
+    for child in node.get("Plans", []):
+        found += seq_scans(child)
+    return found
+
+
+def explain(conn, captured: dict) -> dict:
+    plans = {}
+    for name, (statement, parameters) in captured.items():
+        plan = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        plans[name] = plan[0]["Plan"]
+    return plans
+
+
+def check(conn, plans: dict, baseline: dict, cost_threshold: float, min_rows: int) -> tuple:
+    relation_rows = dict(conn.execute(text("SELECT relname, reltuples FROM pg_class WHERE relkind = 'r'")).all())
+    failures, notes = [], []
+    for name, plan in plans.items():
+        for relation in sorted(set(seq_scans(plan))):
+            if relation_rows.get(relation, 0) >= min_rows:
+                failures.append(f"{name}: Seq Scan on {relation} (~{int(relation_rows[relation])} rows)")
+        known = baseline.get(name)
+        if known is None:
+            notes.append(f"{name}: not in baseline")
+            continue
+        cost = plan["Total Cost"]
+        if cost > known["cost"] * (1 + cost_threshold):
+            failures.append(f"{name}: cost {cost:.1f} > baseline {known['cost']:.1f} (+{cost_threshold:.0%} allowed)")
+        if shape(plan) != known["shape"]:
+            notes.append(f"{name}: plan shape changed")
+    return failures, notes
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Asosiy so'rovlar rejalarini bazaviy rejalar bilan solishtirish")
+    parser.add_argument("--seed", action="store_true", help="Sintetik ma'lumotlar bilan (oxirida rollback)")
+    parser.add_argument("--rows", type=int, default=100000, help="--seed uchun qabullar soni")
+    parser.add_argument("--clinic-id", type=int, help="Mavjud ma'lumotlar ishlatiladigan filial")
+    parser.add_argument("--baseline", default=str(BASELINE_FILE))
+    parser.add_argument("--update", action="store_true", help="Joriy rejalarni bazaviy sifatida yozish")
+    parser.add_argument("--cost-threshold", type=float, default=COST_THRESHOLD)
+    parser.add_argument("--seq-scan-min-rows", type=int, default=SEQ_SCAN_MIN_ROWS)
+    args = parser.parse_args()
+
+    if engine.dialect.name != "postgresql":
+        print("Plan check requires PostgreSQL")
+        return 2
+    if not args.seed and args.clinic_id is None:
+        parser.error("either --seed or --clinic-id is required")
+
+    baseline_path = Path(args.baseline)
+    with engine.connect() as conn:
+        transaction = conn.begin()
+        try:
+            clinic_id = seed(conn, args.rows) if args.seed else args.clinic_id
+            plans = explain(conn, capture(conn, clinic_id, sample(conn, clinic_id)))
+            baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+            if not baseline and not args.update:
+                print(f"FAIL baseline {baseline_path} is missing; create it with --seed --update")
+                return 1
+            failures, notes = check(conn, plans, baseline, args.cost_threshold, args.seq_scan_min_rows)
+        finally:
+            transaction.rollback()
+
+    if args.update:
+        baseline_path.write_text(json.dumps(
+            {name: {"cost": plan["Total Cost"], "shape": shape(plan)} for name, plan in sorted(plans.items())},
+            indent=2, ensure_ascii=False,
+        ) + "\n")
+        print(f"{len(plans)} plans written to {baseline_path}")
+    for note in notes:
+        print(note)
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if not failures:
+        print(f"{len(plans)} queries checked, no plan regressions")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,27 @@
+"""
+Muddati o'tgan Idempotency-Key yozuvlarini o'chirish (cron orqali muntazam).
+
+    python -m app.commands.purge_idempotency --batch-size 1000
+"""
+import argparse
+
+from app.core.idempotency import purge_expired
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Muddati o'tgan idempotency kalitlarini tozalash")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    total = 0
+    # Qisqa tranzaksiyalar bilan partiyalab, jadval uzoq bloklanmasligi uchun
+    while True:
+        deleted = purge_expired(args.batch_size)
+        total += deleted
+        if deleted < args.batch_size:
+            break
+    print(f"deleted: {total}")
+
+
+if __name__ == "__main__":
+    main()
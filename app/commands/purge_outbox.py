@@ -0,0 +1,31 @@
+"""
+Bajarilgan va o'lik outbox hodisalarini o'chirish (cron orqali muntazam).
+OUTBOX_RETENTION_SECONDS dan eskilari o'chiriladi.
+
+    python -m app.commands.purge_outbox --batch-size 1000
+"""
+import argparse
+
+from app.core.outbox import purge_finished
+from app.database import SessionLocal
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Eski outbox hodisalarini tozalash")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    total = 0
+    # Qisqa tranzaksiyalar bilan partiyalab, jadval uzoq bloklanmasligi uchun
+    while True:
+        with SessionLocal() as db:
+            db.info["use_primary"] = True
+            deleted = purge_finished(db, args.batch_size)
+        total += deleted
+        if deleted < args.batch_size:
+            break
+    print(f"deleted: {total}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""
+Ertangi (yoki berilgan kundagi) qabullar uchun eslatmalarni yuborish.
+
+    python -m app.commands.send_reminders --date 2026-10-20 --concurrency 50
+"""
+import argparse
+import logging
+from datetime import date
+
+from app.database import SessionLocal
+from app.models.user import User  # noqa: F401  (Appointment.created_by bog'lanishi uchun)
+from app.services.reminders import dispatch_reminders
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Qabul eslatmalarini yuborish")
+    parser.add_argument("--date", type=date.fromisoformat, default=None, help="Qabul sanasi (standart: ertaga)")
+    parser.add_argument("--concurrency", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=None)
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        stats = dispatch_reminders(db, day=args.date, concurrency=args.concurrency, batch_size=args.batch_size)
+    print(stats)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
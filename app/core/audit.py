@@ -0,0 +1,224 @@
+import atexit
+import csv
+import io
+import json
+import logging
+import threading
+from datetime import datetime, timezone
+
+from sqlalchemy import event, inspect, insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.audit import AuditLog
+from app.models.clinics import Billing, Patient, PatientHistory
+
+logger = logging.getLogger(__name__)
+
+# Kuzatiladigan modellar va ustunlar (None - barcha ustunlar)
+AUDITED = {
+    Patient: None,
+    PatientHistory: None,
+    Billing: {"paid"},
+}
+
+COLUMNS = ("occurred_at", "entity", "entity_id", "action", "actor_id", "clinic_id", "changes")
+
+
+def _value(value):
+    return value if value is None or isinstance(value, (bool, int, float, str)) else str(value)
+
+
+def _diff(obj, action: str, fields) -> dict:
+    changes = {}
+    state = inspect(obj)
+    for attr in state.mapper.column_attrs:
+        key = attr.key
+        if fields is not None and key not in fields:
+            continue
+        if action == "create":
+            value = getattr(obj, key)
+            if value is not None:
+                changes[key] = [None, _value(value)]
+        elif action == "delete":
+            changes[key] = [_value(getattr(obj, key)), None]
+        else:
+            history = state.attrs[key].history
+            if history.has_changes():
+                before = history.deleted[0] if history.deleted else None
+                after = history.added[0] if history.added else None
+                if before != after:
+                    changes[key] = [_value(before), _value(after)]
+    return changes
+
+
+class AuditBuffer:
+    """
+    Audit yozuvlarini xotirada yig'ib, partiyalab (Postgresda COPY bilan) yozadi.
+    Yozuv yo'lida faqat ro'yxatga qo'shish bajariladi; bazaga yozish fon oqimida.
+    """
+    def __init__(self, batch_size: int, flush_interval: float):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._records = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def add(self, records: list):
+        with self._lock:
+            self._records.extend(records)
+            full = len(self._records) >= self.batch_size
+        self._start()
+        if full:
+            self._wakeup.set()
+
+    def _start(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="audit-flusher", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Audit flush failed")
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                records, self._records = self._records, []
+            if not records:
+                return
+            from app.database import engine
+
+            try:
+                with engine.begin() as conn:
+                    if conn.dialect.name == "postgresql":
+                        self._copy(conn, records)
+                    else:
+                        conn.execute(insert(AuditLog), records)
+            except Exception:
+                # Keyingi urinishda qayta yoziladi
+                with self._lock:
+                    self._records[:0] = records
+                raise
+
+    def _copy(self, conn, records: list):
+        data = io.StringIO()
+        writer = csv.writer(data)
+        for record in records:
+            writer.writerow([
+                record["occurred_at"].isoformat(), record["entity"], record["entity_id"], record["action"],
+                "" if record["actor_id"] is None else record["actor_id"],
+                "" if record["clinic_id"] is None else record["clinic_id"],
+                json.dumps(record["changes"]),
+            ])
+        data.seek(0)
+        cursor = conn.connection.cursor()
+        try:
+            cursor.copy_expert(f"COPY audit_log ({', '.join(COLUMNS)}) FROM STDIN WITH CSV", data)
+        finally:
+            cursor.close()
+
+
+buffer = AuditBuffer(settings.AUDIT_BATCH_SIZE, settings.AUDIT_FLUSH_INTERVAL_SECONDS)
+atexit.register(buffer.flush)
+
+
+def query_audit_log(db: Session, entity: str = None, entity_id: int = None, actor_id: int = None,
+                    skip: int = 0, limit: int = 100):
+    """
+    Audit jurnalidan obyekt yoki foydalanuvchi bo'yicha yozuvlar (eng yangilari birinchi).
+    Bufer o'qishda yozilmaydi: oxirgi o'zgarishlar AUDIT_FLUSH_INTERVAL_SECONDS ichida ko'rinadi.
+    """
+    query = db.query(AuditLog)
+    if entity is not None:
+        query = query.filter(AuditLog.entity == entity)
+    if entity_id is not None:
+        query = query.filter(AuditLog.entity_id == entity_id)
+    if actor_id is not None:
+        query = query.filter(AuditLog.actor_id == actor_id)
+    clinic_id = db.info.get("clinic_id")
+    if clinic_id is not None:
+        query = query.filter(AuditLog.clinic_id == clinic_id)
+    return query.order_by(AuditLog.occurred_at.desc()).offset(skip).limit(limit).all()
+
+
+def _record(session: Session, obj, action: str, changes: dict, occurred_at: datetime) -> dict:
+    return {
+        "occurred_at": occurred_at,
+        "entity": type(obj).__tablename__,
+        "entity_id": obj.id,
+        "action": action,
+        "actor_id": session.info.get("actor_id"),
+        "clinic_id": getattr(obj, "clinic_id", None),
+        "changes": changes,
+    }
+
+
+def _queue(session: Session, records: list):
+    if records:
+        session.info.setdefault("audit_records", []).extend(records)
+
+
+def record_removed(session: Session, objects: list, hard: bool = False):
+    """
+    Set-based UPDATE/DELETE bilan o'chirilgan (flushdan o'tmagan) yozuvlarni jurnalga qo'shadi.
+    """
+    now = datetime.now(timezone.utc)
+    _queue(session, [
+        _record(session, obj, "delete",
+                _diff(obj, "delete", AUDITED[type(obj)]) if hard else {"deleted_at": [None, _value(obj.deleted_at)]},
+                now)
+        for obj in objects if type(obj) in AUDITED
+    ])
+
+
+def record_updated(session: Session, obj, before: dict):
+    """
+    UPDATE ... RETURNING bilan o'zgartirilgan yozuv uchun: `before` - eski qiymatlar {ustun: qiymat}.
+    """
+    if type(obj) not in AUDITED:
+        return
+    fields = AUDITED[type(obj)]
+    changes = {
+        key: [_value(value), _value(getattr(obj, key))]
+        for key, value in before.items()
+        if (fields is None or key in fields) and value != getattr(obj, key)
+    }
+    if changes:
+        _queue(session, [_record(session, obj, "update", changes, datetime.now(timezone.utc))])
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_audit_records(session, flush_context):
+    now = datetime.now(timezone.utc)
+    records = []
+    for action, objects in (("create", session.new), ("update", session.dirty), ("delete", session.deleted)):
+        for obj in objects:
+            model = type(obj)
+            if model not in AUDITED:
+                continue
+            changes = _diff(obj, action, AUDITED[model])
+            if changes:
+                records.append(_record(session, obj, action, changes, now))
+    _queue(session, records)
+
+
+@event.listens_for(Session, "after_commit")
+def _buffer_audit_records(session):
+    records = session.info.pop("audit_records", None)
+    if records:
+        buffer.add(records)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_audit_records(session):
+    session.info.pop("audit_records", None)
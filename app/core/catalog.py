@@ -0,0 +1,249 @@
+import logging
+import select
+import threading
+import time
+
+from sqlalchemy import event, func, inspect
+from sqlalchemy import select as sql_select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.clinics import DoctorService, ServiceType, Specialization
+
+logger = logging.getLogger(__name__)
+
+# Bazadagi trigger (notify_catalog_change) "jadval:clinic_id" ko'rinishida xabar yuboradi;
+# doctor_services uchun "doctor_services:clinic_id:id:doctor_id:service_type_id:t|f" (amaldagimi)
+NOTIFY_CHANNEL = "catalog_changes"
+SERVICE_FIELDS = ("id", "clinic_id", "doctor_id", "service_type_id", "deleted_at")
+CATALOG_MODELS = {"specializations": Specialization, "service_types": ServiceType, "doctor_services": DoctorService}
+
+
+def normalize_name(name: str) -> str:
+    return " ".join(name.split())
+
+
+def name_key(name: str) -> str:
+    return normalize_name(name).lower()
+
+
+def _load(conn, table: str, clinic_id: int) -> dict:
+    if table == "doctor_services":
+        # (doctor_id, service_type_id) -> xizmat id va teskarisi
+        rows = conn.execute(
+            sql_select(DoctorService.id, DoctorService.doctor_id, DoctorService.service_type_id)
+            .where(DoctorService.clinic_id == clinic_id, DoctorService.deleted_at.is_(None))
+        ).all()
+        return {
+            "keys": {(row.doctor_id, row.service_type_id): row.id for row in rows},
+            "services": {row.id: (row.doctor_id, row.service_type_id) for row in rows},
+        }
+    model = CATALOG_MODELS[table]
+    rows = conn.execute(sql_select(model.id, model.name).where(model.clinic_id == clinic_id)).all()
+    # nom kaliti -> (id, asl nom)
+    return {name_key(row.name): (row.id, row.name) for row in rows}
+
+
+class CatalogCache:
+    """
+    Mutaxassisliklar, xizmat turlari va doktor xizmatlari kalitlari jarayon xotirasida,
+    filial bo'yicha. Birinchi murojaatda primarydan o'qiladi (read-through), o'zgarishda
+    LISTEN/NOTIFY yoki shu jarayondagi commit orqali bekor qilinadi; doctor_services da esa
+    faqat o'zgargan xizmat kaliti yangilanadi (filialning barcha xizmatlari qayta o'qilmaydi).
+    Xabar yo'qolsa ham yozuv CACHE_DEFAULT_TTL_SECONDS dan keyin qayta o'qiladi (0 - muddatsiz).
+    """
+    def __init__(self):
+        self._entries = {}  # (jadval, clinic_id) -> (o'qilgan vaqt, ma'lumot)
+        self._generations = {}  # o'qish paytida kelgan invalidatsiyani aniqlash uchun
+        self._lock = threading.Lock()
+        self._listener = None
+
+    def get(self, table: str, clinic_id: int) -> dict:
+        key = (table, clinic_id)
+        ttl = settings.CACHE_DEFAULT_TTL_SECONDS
+        with self._lock:
+            entry = self._entries.get(key)
+            generation = self._generations.get(key, 0)
+        if entry is not None and (not ttl or time.monotonic() - entry[0] < ttl):
+            return entry[1]
+        from app.database import engine
+
+        with engine.connect() as conn:
+            data = _load(conn, table, clinic_id)
+        with self._lock:
+            if self._generations.get(key, 0) == generation:
+                self._entries[key] = (time.monotonic(), data)
+        return data
+
+    def invalidate(self, table: str = None, clinic_id: int = None):
+        with self._lock:
+            keys = [
+                key for key in self._entries
+                if (table is None or key[0] == table) and (clinic_id is None or key[1] == clinic_id)
+            ]
+            if table is not None and clinic_id is not None:
+                keys.append((table, clinic_id))
+            for key in set(keys):
+                self._entries.pop(key, None)
+                self._generations[key] = self._generations.get(key, 0) + 1
+
+    def patch_service(self, clinic_id: int, service_id: int, doctor_id: int, service_type_id: int, live: bool):
+        """
+        Bitta xizmatning (doctor_id, service_type_id) kalitini yangilaydi yoki olib tashlaydi.
+        Filial keshi hali o'qilmagan bo'lsa hech narsa qilinmaydi.
+        """
+        key = ("doctor_services", clinic_id)
+        with self._lock:
+            # Shu paytda o'qilayotgan (o'zgarishdan oldingi) ma'lumot keshga yozilmasin
+            self._generations[key] = self._generations.get(key, 0) + 1
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            data = entry[1]
+            old = data["services"].pop(service_id, None)
+            if old is not None and data["keys"].get(old) == service_id:
+                del data["keys"][old]
+            if live:
+                data["keys"][(doctor_id, service_type_id)] = service_id
+                data["services"][service_id] = (doctor_id, service_type_id)
+
+    def warm(self, clinic_ids):
+        for clinic_id in clinic_ids:
+            for table in CATALOG_MODELS:
+                self.get(table, clinic_id)
+
+    # --- Qidiruvlar -------------------------------------------------------------------------
+
+    def names(self, table: str, clinic_id: int) -> list:
+        return sorted(self.get(table, clinic_id).values(), key=lambda item: item[1].lower())
+
+    def resolve(self, db: Session, table: str, clinic_id: int, name: str):
+        """
+        Nomni katalogdagi (id, asl nom) ga aylantiradi; katalogda bo'lmasa shu tranzaksiyada qo'shiladi.
+        """
+        name = normalize_name(name)
+        found = self.get(table, clinic_id).get(name_key(name))
+        if found is not None:
+            return found
+        model = CATALOG_MODELS[table]
+        criteria = [model.clinic_id == clinic_id, func.lower(model.name) == name.lower()]
+        row = db.query(model.id, model.name).filter(*criteria).first()
+        if row is not None:
+            return row.id, row.name
+        try:
+            with db.begin_nested():
+                obj = model(clinic_id=clinic_id, name=name)
+                db.add(obj)
+        except IntegrityError:
+            # Parallel so'rov shu nomni qo'shib ulgurdi
+            row = db.query(model.id, model.name).filter(*criteria).one()
+            return row.id, row.name
+        return obj.id, obj.name
+
+    def find_service(self, clinic_id: int, doctor_id: int, service_type_id: int):
+        return self.get("doctor_services", clinic_id)["keys"].get((doctor_id, service_type_id))
+
+    def service_key(self, clinic_id: int, service_id: int):
+        """
+        Xizmatning (doctor_id, service_type_id) juftligi, topilmasa (None, None).
+        """
+        return self.get("doctor_services", clinic_id)["services"].get(service_id, (None, None))
+
+    # --- NOTIFY tinglovchi --------------------------------------------------------------------
+
+    def start_listener(self):
+        with self._lock:
+            if self._listener is not None and self._listener.is_alive():
+                return
+            self._listener = threading.Thread(target=self._listen, name="catalog-listener", daemon=True)
+            self._listener.start()
+
+    def _listen(self):
+        from app.database import engine
+
+        while True:
+            try:
+                connection = engine.raw_connection()
+                # LISTEN ulanishi pulga qaytmaydi
+                connection.detach()
+                try:
+                    connection.dbapi_connection.autocommit = True
+                    cursor = connection.cursor()
+                    cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                    # Ulanish uzilgan paytdagi xabarlar yo'qolgan bo'lishi mumkin
+                    self.invalidate()
+                    pg_connection = connection.dbapi_connection
+                    while True:
+                        if select.select([pg_connection], [], [], 5) == ([], [], []):
+                            continue
+                        pg_connection.poll()
+                        while pg_connection.notifies:
+                            self._apply_notify(pg_connection.notifies.pop(0).payload)
+                finally:
+                    connection.close()
+            except Exception:
+                logger.exception("Catalog listener failed, reconnecting")
+                threading.Event().wait(1)
+
+    def _apply_notify(self, payload: str):
+        parts = payload.split(":")
+        if parts[0] == "doctor_services" and len(parts) == 6:
+            clinic_id, service_id, doctor_id, service_type_id, live = parts[1:]
+            self.patch_service(int(clinic_id), int(service_id), int(doctor_id) if doctor_id else None,
+                               int(service_type_id) if service_type_id else None, live == "t")
+        else:
+            self.invalidate(parts[0], int(parts[1]))
+
+
+cache = CatalogCache()
+
+
+def _service_state(obj, deleted: bool, new: bool):
+    # (doctor_id, service_type_id, amaldagimi); qiymat noma'lum (expired) bo'lsa None - butun filial
+    # bekor qilinadi. Yangi qatorda berilmagan ustunlar NULL
+    values = inspect(obj).dict
+    if not new and any(field not in values for field in SERVICE_FIELDS):
+        return None
+    return values.get("doctor_id"), values.get("service_type_id"), not deleted and values.get("deleted_at") is None
+
+
+def record_changed(session: Session, objects: list, deleted: bool = False, new: bool = False):
+    """
+    Set-based UPDATE/DELETE bilan o'zgargan katalog yozuvlari: commitdan keyin kesh bekor qilinadi
+    (doctor_services da faqat o'sha xizmat kaliti yangilanadi). `deleted` - qatorlar bazadan
+    o'chirilgan, `new` - shu flushda qo'shilgan.
+    """
+    changed = session.info.setdefault("catalog_changed", {})
+    for obj in objects:
+        table = getattr(obj, "__tablename__", None)
+        if table == "doctor_services":
+            state = _service_state(obj, deleted, new)
+            if state is None:
+                changed[(table, obj.clinic_id, None)] = None
+            else:
+                changed[(table, obj.clinic_id, obj.id)] = state
+        elif table in CATALOG_MODELS:
+            changed[(table, obj.clinic_id, None)] = None
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_catalog_changes(session, flush_context):
+    record_changed(session, list(session.new), new=True)
+    record_changed(session, list(session.dirty))
+    record_changed(session, list(session.deleted), deleted=True)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_catalog(session):
+    # Boshqa workerlarga trigger orqali NOTIFY yetadi, shu jarayonda esa darhol
+    for (table, clinic_id, id), state in session.info.pop("catalog_changed", {}).items():
+        if state is None:
+            cache.invalidate(table, clinic_id)
+        else:
+            cache.patch_service(clinic_id, id, *state)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_catalog_changes(session):
+    session.info.pop("catalog_changed", None)
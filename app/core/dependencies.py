@@ -1,7 +1,7 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
 from fastapi.security import OAuth2PasswordBearer
-from app.models.user import User  # Modelni to'g'ri import qilganingizga ishonch hosil qiling
+from app.models.user import RoleEnum, User  # Modelni to'g'ri import qilganingizga ishonch hosil qiling
 from app.core.auth import decode_access_token  # Tokenni dekodlash funksiyasini to'g'ri import qiling
 from app.database import get_db
 
@@ -49,3 +49,14 @@ def get_current_reception_user(current_user: User = Depends(get_current_user)) -
             detail="You must be an Reception.",
         )
     return current_user
+
+def require_admin(request: Request, db: Session = Depends(get_db)) -> User:
+    # Token TenantMiddleware da dekodlangan (uid), rol bazadan tekshiriladi
+    user_id = getattr(request.state, "user_id", None)
+    user = db.get(User, user_id) if user_id is not None else None
+    if user is None or user.deleted_at is not None or user.role != RoleEnum.admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You must be an Admin.",
+        )
+    return user
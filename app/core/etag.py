@@ -0,0 +1,23 @@
+from typing import Optional
+
+from fastapi import Header, HTTPException, Response
+
+
+def if_match(if_match: Optional[str] = Header(None)) -> Optional[int]:
+    """
+    If-Match sarlavhasidan yozuv versiyasini oladi: "3" yoki W/"3". Sarlavha bo'lmasa None.
+    Noto'g'ri sarlavha - 400; 412 faqat versiya mos kelmaganda (CRUD da) qaytariladi.
+    """
+    if if_match is None or if_match.strip() == "*":
+        return None
+    value = if_match.strip()
+    if value.startswith("W/"):
+        value = value[2:]
+    try:
+        return int(value.strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid If-Match header")
+
+
+def set_etag(response: Response, obj):
+    response.headers["ETag"] = f'"{obj.version}"'
@@ -0,0 +1,103 @@
+import typing
+from typing import Optional
+
+from fastapi import HTTPException, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload, load_only, selectinload
+
+
+def _nested_schema(annotation):
+    # Optional[UserResponse], List[UserResponse] -> UserResponse
+    for arg in typing.get_args(annotation) or (annotation,):
+        if isinstance(arg, type) and issubclass(arg, BaseModel):
+            return arg
+        nested = _nested_schema(arg) if typing.get_args(arg) else None
+        if nested is not None:
+            return nested
+    return None
+
+
+def parse_fields(fields: Optional[str], schema) -> Optional[dict]:
+    """
+    `?fields=id,user.first_name` -> {"id": {}, "user": {"first_name": {}}}. Faqat javob
+    sxemasidagi maydonlar qabul qilinadi. Parametr berilmasa None (to'liq javob).
+    """
+    if not fields:
+        return None
+    tree = {}
+    for path in fields.split(","):
+        path = path.strip()
+        if not path:
+            continue
+        node, current = tree, schema
+        for name in path.split("."):
+            if current is None or name not in current.model_fields:
+                raise HTTPException(status_code=400, detail=f"Unknown field '{path}'")
+            node = node.setdefault(name, {})
+            current = _nested_schema(current.model_fields[name].annotation)
+        if current is not None and not node:
+            # Ichki obyekt to'liq so'ralgan: uning sxemasidagi maydonlar
+            node.update(_schema_tree(current))
+    return tree or None
+
+
+def _schema_tree(schema) -> dict:
+    tree = {}
+    for name, field in schema.model_fields.items():
+        nested = _nested_schema(field.annotation)
+        tree[name] = _schema_tree(nested) if nested is not None else {}
+    return tree
+
+
+def load_options(model, tree: Optional[dict]) -> list:
+    """
+    Tanlangan maydonlar uchun SQL proyeksiyasi: ustunlar load_only bilan, bog'lanishlar
+    joinedload/selectinload bilan (ichida yana load_only).
+    """
+    if tree is None:
+        return []
+    mapper = inspect(model)
+    columns, options = [], []
+    for name, sub in tree.items():
+        if name in mapper.relationships:
+            relationship = mapper.relationships[name]
+            target = relationship.mapper.class_
+            # Kolleksiyalar alohida so'rovda (LIMIT asosiy qatorlarga ta'sir qilmasligi uchun)
+            loader = (selectinload if relationship.uselist else joinedload)(getattr(model, name))
+            options.append(loader.options(*load_options(target, sub)))
+        elif name in mapper.column_attrs:
+            columns.append(getattr(model, name))
+        else:
+            raise HTTPException(status_code=400, detail=f"Field '{name}' cannot be selected")
+    if not columns:
+        # Faqat bog'lanish so'ralgan: asosiy jadvaldan birlamchi kalit yetarli
+        columns = [getattr(model, mapper.get_property_by_column(mapper.primary_key[0]).key)]
+    return [load_only(*columns), *options]
+
+
+def sparse(obj, tree: dict):
+    """
+    Obyektdan faqat tanlangan maydonlar (yuklanmagan atributlarga murojaat qilinmaydi).
+    """
+    if obj is None:
+        return None
+    if isinstance(obj, (list, tuple)):
+        return [sparse(item, tree) for item in obj]
+    result = {}
+    for name, sub in tree.items():
+        value = getattr(obj, name)
+        result[name] = sparse(value, sub) if sub else value
+    return result
+
+
+def sparse_response(response: Response, items: list, tree: Optional[dict]):
+    """
+    Maydonlar tanlanmagan bo'lsa ro'yxat o'zicha qaytadi (response_model bo'yicha), aks holda
+    qisqartirilgan JSON (endpointda o'rnatilgan sarlavhalar saqlanadi).
+    """
+    if tree is None:
+        return items
+    return JSONResponse(jsonable_encoder(sparse(items, tree)), headers=dict(response.headers))
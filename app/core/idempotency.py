@@ -0,0 +1,274 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import and_, delete, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.middleware import parse_routes
+from app.models.idempotency import IdempotencyKey
+
+HEADER = b"idempotency-key"
+# Saqlangan javob qayta berilganini bildiradi
+REPLAYED_HEADER = (b"idempotent-replayed", b"true")
+
+
+def request_hash(method: str, path: str, query: bytes, body: bytes) -> str:
+    digest = hashlib.sha256()
+    for part in (method.encode(), path.encode(), query, body):
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+class StoredResponse:
+    def __init__(self, request_hash: str, status_code: int, headers: list, body: bytes, expires_at: float):
+        self.request_hash = request_hash
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+        self.expires_at = expires_at
+
+
+class ResponseCache:
+    """
+    Yakunlangan javoblar uchun jarayon ichidagi LRU kesh (bazaga murojaatsiz qayta berish).
+    """
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            stored = self._items.get(key)
+            if stored is None:
+                return None
+            if stored.expires_at <= time.time():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return stored
+
+    def set(self, key: str, stored: StoredResponse):
+        with self._lock:
+            self._items[key] = stored
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+
+# --- Baza bilan ishlash (sinxron, threadpoolda chaqiriladi) -------------------------------------
+
+def _session():
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    db.info["use_primary"] = True
+    return db
+
+
+def _stored(row: IdempotencyKey) -> StoredResponse:
+    return StoredResponse(row.request_hash, row.status_code, [tuple(item) for item in row.response_headers or []],
+                          row.response_body or b"", row.expires_at.timestamp())
+
+
+def claim(key: str, hash_: str):
+    """
+    Kalitni egallaydi. Egallansa None, aks holda mavjud yozuv: StoredResponse (yakunlangan)
+    yoki "in_progress" (boshqa worker hali bajarmoqda). Muddati o'tgan va osilib qolgan
+    (IDEMPOTENCY_LOCK_SECONDS dan uzoq bajarilayotgan) yozuvlar qayta egallanadi.
+    """
+    now = datetime.now(timezone.utc)
+    with _session() as db:
+        db.execute(delete(IdempotencyKey).where(
+            IdempotencyKey.key == key,
+            or_(
+                IdempotencyKey.expires_at <= now,
+                and_(IdempotencyKey.status_code.is_(None),
+                     IdempotencyKey.created_at <= now - timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS)),
+            ),
+        ))
+        dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+        inserted = db.execute(
+            dialect.insert(IdempotencyKey)
+            .values(key=key, request_hash=hash_, created_at=now,
+                    expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_TTL_SECONDS))
+            .on_conflict_do_nothing(index_elements=["key"])
+            .returning(IdempotencyKey.key)
+        ).first()
+        db.commit()
+        if inserted is not None:
+            return None
+        row = db.execute(select(IdempotencyKey).where(IdempotencyKey.key == key)).scalar_one_or_none()
+        if row is None:
+            # Oraliqda o'chirildi: keyingi urinishda egallanadi
+            return "in_progress"
+        if row.status_code is None:
+            return "in_progress" if row.request_hash == hash_ else _stored(row)
+        return _stored(row)
+
+
+def complete(key: str, status_code: int, headers: list, body: bytes):
+    with _session() as db:
+        db.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.key == key)
+            .values(status_code=status_code, response_headers=[list(item) for item in headers], response_body=body)
+        )
+        db.commit()
+
+
+def release(key: str):
+    # Muvaffaqiyatsiz (5xx) yoki uzilgan so'rov: mijoz shu kalit bilan qayta urinishi mumkin
+    with _session() as db:
+        db.execute(delete(IdempotencyKey).where(IdempotencyKey.key == key, IdempotencyKey.status_code.is_(None)))
+        db.commit()
+
+
+def purge_expired(batch_size: int = 1000) -> int:
+    with _session() as db:
+        expired = (
+            select(IdempotencyKey.key)
+            .where(IdempotencyKey.expires_at <= datetime.now(timezone.utc))
+            .limit(batch_size)
+            .scalar_subquery()
+        )
+        deleted = db.execute(delete(IdempotencyKey).where(IdempotencyKey.key.in_(expired))).rowcount
+        db.commit()
+        return deleted
+
+
+# --- Middleware -------------------------------------------------------------------------------
+
+class IdempotencyMiddleware:
+    """
+    IDEMPOTENCY_ROUTES dagi `Idempotency-Key` sarlavhali so'rovlar: birinchi so'rov javobi
+    saqlanadi, takrorlari endpoint va CRUD ga tegmasdan shu javobni oladi. Shu jarayondagi
+    parallel takrorlar birinchisini kutadi, boshqa workerlardagilar esa bazadagi yozuvni.
+    Kalit boshqa tanali so'rov bilan ishlatilsa 422.
+    """
+    def __init__(self, app):
+        self.app = app
+        self.routes = parse_routes(settings.IDEMPOTENCY_ROUTES)
+        self.cache = ResponseCache(settings.IDEMPOTENCY_CACHE_SIZE)
+        self._inflight = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or (scope["method"], scope["path"]) not in self.routes:
+            return await self.app(scope, receive, send)
+        raw_key = dict(scope["headers"]).get(HEADER)
+        if not raw_key:
+            return await self.app(scope, receive, send)
+
+        body = await self._read_body(receive)
+        hash_ = request_hash(scope["method"], scope["path"], scope.get("query_string", b""), body)
+        # Kalit filial va foydalanuvchi doirasida (TenantMiddleware to'ldiradi)
+        state = scope.get("state", {})
+        key = f"{state.get('clinic_id')}:{state.get('user_id')}:{raw_key.decode('latin-1')[:200]}"
+
+        while True:
+            stored = self.cache.get(key)
+            if stored is not None:
+                return await self._replay(send, stored, hash_)
+            waiter = self._inflight.get(key)
+            if waiter is None:
+                break
+            await asyncio.shield(waiter)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._inflight[key] = waiter
+        try:
+            stored = await self._claim(key, hash_)
+            if stored == "in_progress":
+                return await self._send_json(send, 409, {"detail": "A request with this Idempotency-Key is in progress"},
+                                             [(b"retry-after", b"1")])
+            if stored is not None:
+                if stored.request_hash == hash_:
+                    self.cache.set(key, stored)
+                return await self._replay(send, stored, hash_)
+            await self._execute(scope, body, receive, send, key, hash_)
+        finally:
+            self._inflight.pop(key, None)
+            waiter.set_result(None)
+
+    async def _claim(self, key: str, hash_: str):
+        # Boshqa workerdagi bir xil so'rov tugashini kutish
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+        while True:
+            stored = await run_in_threadpool(claim, key, hash_)
+            if stored != "in_progress" or time.monotonic() >= deadline:
+                return stored
+            await asyncio.sleep(0.1)
+
+    async def _execute(self, scope, body: bytes, receive, send, key: str, hash_: str):
+        response = {"status": None, "headers": [], "body": []}
+        delivered = False
+
+        async def receive_body():
+            # Tana allaqachon o'qilgan; keyingi chaqiruvlar (uzilishni kutish) asl receive ga
+            nonlocal delivered
+            if delivered:
+                return await receive()
+            delivered = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = [(name, value) for name, value in message.get("headers", [])]
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+            await send(message)
+
+        completed = False
+        try:
+            await self.app(scope, receive_body, capture)
+            if response["status"] is not None and response["status"] < 500:
+                headers = [(name.decode("latin-1"), value.decode("latin-1")) for name, value in response["headers"]
+                           if name.lower() not in (b"set-cookie", b"content-length")]
+                content = b"".join(response["body"])
+                await run_in_threadpool(complete, key, response["status"], headers, content)
+                completed = True
+                self.cache.set(key, StoredResponse(
+                    hash_, response["status"], [(name.encode("latin-1"), value.encode("latin-1")) for name, value in headers],
+                    content, time.time() + settings.IDEMPOTENCY_TTL_SECONDS,
+                ))
+        finally:
+            if not completed:
+                await run_in_threadpool(release, key)
+
+    async def _replay(self, send, stored: StoredResponse, hash_: str):
+        if stored.request_hash != hash_:
+            return await self._send_json(send, 422, {"detail": "Idempotency-Key was already used with a different request"})
+        headers = [(_bytes(name), _bytes(value)) for name, value in stored.headers]
+        headers += [(b"content-length", str(len(stored.body)).encode()), REPLAYED_HEADER]
+        await send({"type": "http.response.start", "status": stored.status_code, "headers": headers})
+        await send({"type": "http.response.body", "body": stored.body})
+
+    async def _send_json(self, send, status_code: int, payload: dict, headers: list = ()):
+        body = json.dumps(payload).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()), *headers],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def _read_body(self, receive) -> bytes:
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                return b"".join(chunks)
+
+
+def _bytes(value) -> bytes:
+    return value if isinstance(value, bytes) else value.encode("latin-1")
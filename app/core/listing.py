@@ -0,0 +1,21 @@
+import json
+from typing import Literal
+
+from fastapi import Response
+
+# ?total= qiymatlari: "estimate" - statistikadan (arzon), "exact" - COUNT(*)
+TotalMode = Literal["exact", "estimate"]
+
+# Brauzer (CORS) o'qiy olishi kerak bo'lgan sarlavhalar
+LIST_HEADERS = ["X-Total-Count", "X-Total-Estimated", "X-Facets"]
+
+
+def set_list_headers(response: Response, meta: dict):
+    """
+    Ro'yxat javobi tanasi o'zgarmaydi (massiv), jami son va facetlar sarlavhalarda qaytadi.
+    """
+    if "total" in meta:
+        response.headers["X-Total-Count"] = str(meta["total"])
+        response.headers["X-Total-Estimated"] = "true" if meta["estimated"] else "false"
+    if "facets" in meta:
+        response.headers["X-Facets"] = json.dumps(meta["facets"], separators=(",", ":"))
@@ -0,0 +1,224 @@
+import asyncio
+import gzip
+import time
+from urllib.parse import parse_qsl, urlencode
+
+from fastapi import Request, status
+from fastapi.responses import JSONResponse
+from jose import JWTError, jwt
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.core.config import settings
+from app.database import READ_METHODS
+
+# Oxirgi yozuvdan keyin o'qishlar primaryda qolishi kerak bo'lgan vaqt (unix timestamp)
+PRIMARY_STICKY_COOKIE = "db_primary_until"
+
+
+class ReadYourWritesMiddleware(BaseHTTPMiddleware):
+    """
+    Yozgan mijoz o'z o'zgarishlarini ko'rishi uchun (read-your-writes)
+    muvaffaqiyatli yozuvdan keyin qisqa vaqt uning o'qishlarini primaryga yo'naltiradi.
+    """
+    async def dispatch(self, request: Request, call_next):
+        try:
+            sticky_until = float(request.cookies.get(PRIMARY_STICKY_COOKIE, 0))
+        except ValueError:
+            sticky_until = 0
+        request.state.read_primary = sticky_until > time.time()
+
+        response = await call_next(request)
+
+        if request.method not in READ_METHODS and response.status_code < 400:
+            response.set_cookie(
+                PRIMARY_STICKY_COOKIE,
+                str(int(time.time() + settings.READ_STICKY_SECONDS)),
+                max_age=settings.READ_STICKY_SECONDS,
+                httponly=True,
+                samesite="lax",
+            )
+        return response
+
+
+def parse_routes(value: str) -> set:
+    """
+    "POST /clinic/appointments/,GET /clinic/doctors/" -> {("POST", "/clinic/appointments/"), ...}
+    """
+    routes = set()
+    for item in value.split(","):
+        method, _, path = item.strip().partition(" ")
+        if path.strip():
+            routes.add((method.upper(), path.strip()))
+    return routes
+
+
+class TenantMiddleware(BaseHTTPMiddleware):
+    """
+    Bearer tokendagi `clinic_id` ni o'qib, so'rov qaysi filialga tegishli ekanini aniqlaydi
+    (va audit uchun foydalanuvchi id sini). Token faqat dekodlanadi (bazaga murojaat yo'q);
+    token bo'lmasa standart filial ishlatiladi. Yaroqsiz (muddati o'tgan, soxta) token hech
+    qanday filialga kirish bermaydi: so'rov darhol 401 bilan rad etiladi.
+    """
+    async def dispatch(self, request: Request, call_next):
+        clinic_id = user_id = None
+        authorization = request.headers.get("authorization", "")
+        scheme, _, token = authorization.partition(" ")
+        if scheme.lower() == "bearer" and token:
+            try:
+                payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+                clinic_id = payload.get("clinic_id")
+                user_id = payload.get("uid")
+            except JWTError:
+                return JSONResponse(
+                    {"detail": "Could not validate credentials"},
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    headers={"WWW-Authenticate": "Bearer"},
+                )
+        request.state.clinic_id = clinic_id or settings.DEFAULT_CLINIC_ID
+        request.state.user_id = user_id
+        return await call_next(request)
+
+
+def _accepted_encodings(header: str) -> set:
+    encodings = set()
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        encodings.add(name.strip().lower())
+    return encodings
+
+
+class CompressionMiddleware:
+    """
+    Javobni brotli (paket o'rnatilgan bo'lsa) yoki gzip bilan siqadi. Faqat to'liq (bir
+    bo'lakli) va COMPRESSION_MIN_SIZE dan katta matn/JSON javoblar siqiladi; oqimli
+    javoblar (SSE, Arrow eksport) o'zgarishsiz o'tadi.
+    """
+    COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "application/xml")
+
+    def __init__(self, app):
+        self.app = app
+        try:
+            import brotli
+        except ImportError:
+            brotli = None
+        self.brotli = brotli
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = dict(scope["headers"])
+        accepted = _accepted_encodings(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if self.brotli is not None and "br" in accepted:
+            encoding = "br"
+        elif "gzip" in accepted:
+            encoding = "gzip"
+        else:
+            return await self.app(scope, receive, send)
+
+        start = None
+
+        async def send_compressed(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                # Tana kelmaguncha sarlavhalar ushlab turiladi
+                start = message
+                return
+            if start is None:
+                return await send(message)
+            response_start, start = start, None
+            body = message.get("body", b"")
+            if message.get("more_body") or not self._should_compress(response_start, body):
+                await send(response_start)
+                return await send(message)
+            compressed = self._compress(encoding, body)
+            response_headers = [
+                (key, value) for key, value in response_start["headers"] if key.lower() != b"content-length"
+            ]
+            response_headers += [
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(compressed)).encode()),
+                (b"vary", b"Accept-Encoding"),
+            ]
+            await send({**response_start, "headers": response_headers})
+            await send({**message, "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
+
+    def _should_compress(self, start: dict, body: bytes) -> bool:
+        if len(body) < settings.COMPRESSION_MIN_SIZE:
+            return False
+        headers = {key.lower(): value for key, value in start["headers"]}
+        if b"content-encoding" in headers:
+            return False
+        content_type = headers.get(b"content-type", b"").decode("latin-1")
+        return content_type.startswith(self.COMPRESSIBLE_TYPES)
+
+    def _compress(self, encoding: str, body: bytes) -> bytes:
+        if encoding == "br":
+            return self.brotli.compress(body, quality=settings.COMPRESSION_BROTLI_QUALITY)
+        return gzip.compress(body, compresslevel=settings.COMPRESSION_GZIP_LEVEL)
+
+
+class SingleFlightMiddleware:
+    """
+    SINGLE_FLIGHT_ROUTES dagi bir vaqtda kelgan bir xil GET so'rovlar (yo'l, tartiblangan query,
+    filial, primary/replika) bitta bajariladi: qolganlari birinchisi tugashini kutib, uning
+    javobini (status, sarlavhalar, tana) oladi. Javob keshlanmaydi, faqat parallel so'rovlar birlashadi.
+    """
+    def __init__(self, app):
+        self.app = app
+        self.routes = parse_routes(settings.SINGLE_FLIGHT_ROUTES)
+        self._inflight = {}
+
+    def _key(self, scope) -> tuple:
+        query = parse_qsl(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True)
+        state = scope.get("state", {})
+        return (
+            scope["path"],
+            urlencode(sorted(query, key=lambda item: item[0])),
+            state.get("clinic_id"),
+            bool(state.get("read_primary")),
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or (scope["method"], scope["path"]) not in self.routes:
+            return await self.app(scope, receive, send)
+        key = self._key(scope)
+        leader = self._inflight.get(key)
+        if leader is not None:
+            response = await asyncio.shield(leader)
+            if response is not None:
+                return await self._send(send, response)
+            # Birinchi so'rov javobsiz tugadi (xato): o'zi bajaradi
+            return await self.app(scope, receive, send)
+
+        leader = asyncio.get_running_loop().create_future()
+        self._inflight[key] = leader
+        response = {"status": None, "headers": [], "body": [], "complete": False}
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = [
+                    (name, value) for name, value in message.get("headers", []) if name.lower() != b"set-cookie"
+                ]
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+                response["complete"] = not message.get("more_body", False)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, capture)
+        finally:
+            self._inflight.pop(key, None)
+            leader.set_result(
+                (response["status"], response["headers"], b"".join(response["body"]))
+                if response["complete"] and response["status"] < 500 else None
+            )
+
+    async def _send(self, send, response: tuple):
+        status_code, headers, body = response
+        await send({"type": "http.response.start", "status": status_code, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
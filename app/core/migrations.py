@@ -0,0 +1,189 @@
+"""
+Alembic revisiyalari uchun onlayn migratsiya yordamchilari (faqat Postgres, online rejim).
+
+Oddiy `op.create_index` / `op.create_foreign_key` jadvalni butun qurilish yoki tekshirish
+davomida bloklaydi. Bu yerdagi funksiyalar ishni qisqa qulflar va alohida tranzaksiyalarga
+bo'ladi, qulf olinmasa (lock_timeout) biroz kutib qayta urinadi:
+
+    from app.core.migrations import add_foreign_key, batched_backfill, create_index_concurrently
+
+    create_index_concurrently('ix_appointments_doctor_id', 'appointments', ['doctor_id'])
+    add_foreign_key('appointments_doctor_id_fkey', 'appointments', 'doctors', ['doctor_id'], ['id'])
+    batched_backfill('appointments', 'notes = :notes', where='notes IS NULL', params={'notes': ''})
+
+Yordamchilar autocommit blokida ishlaydi: revisiya o'rtasida yiqilsa, qayta ishga tushirish
+xavfsiz bo'lishi uchun har bir qadam IF NOT EXISTS / mavjudligini tekshirish bilan yozilgan.
+"""
+import hashlib
+import time
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.exc import OperationalError
+
+from app.core.config import settings
+
+LOCK_NOT_AVAILABLE = "55P03"  # lock_timeout tugadi
+MAX_IDENTIFIER = 63
+
+PARTITION_TREE = sa.text("""
+    SELECT t.relid::regclass::text AS relation, t.parentrelid::regclass::text AS parent, t.isleaf, t.level
+    FROM pg_partition_tree(CAST(:table AS regclass)) t
+    ORDER BY t.level
+""")
+
+
+def _execute(statement: str, params: dict = None, retries: int = None):
+    """
+    Autocommit rejimida bitta buyruq; qulf kutish vaqti tugasa eksponensial kutib qayta urinadi.
+    """
+    retries = settings.MIGRATION_LOCK_RETRIES if retries is None else retries
+    for attempt in range(retries + 1):
+        try:
+            return op.get_bind().execute(sa.text(statement), params or {})
+        except OperationalError as exc:
+            if getattr(exc.orig, "pgcode", None) != LOCK_NOT_AVAILABLE or attempt == retries:
+                raise
+            time.sleep(min(2 ** attempt, 30))
+
+
+def _scalar(statement: str, params: dict = None):
+    return op.get_bind().execute(sa.text(statement), params or {}).scalar()
+
+
+def _tree(table: str) -> list:
+    # Oddiy jadval uchun ham bitta qator (o'zi, barg sifatida)
+    return op.get_bind().execute(PARTITION_TREE, {"table": table}).all()
+
+
+def _child_name(name: str, table: str, relation: str) -> str:
+    # ix_appointments_doctor_id + appointments_y2026m10_clinic_1 -> ix_appointments_doctor_id_y2026m10_clinic_1
+    suffix = relation[len(table) + 1:] if relation.startswith(f"{table}_") else relation
+    child = f"{name}_{suffix}"
+    if len(child) > MAX_IDENTIFIER:
+        digest = hashlib.md5(child.encode()).hexdigest()[:8]
+        child = f"{child[:MAX_IDENTIFIER - 9]}_{digest}"
+    return child
+
+
+def _index_state(name: str):
+    # None - yo'q, True/False - indisvalid
+    return _scalar("SELECT i.indisvalid FROM pg_index i WHERE i.indexrelid = to_regclass(:name)", {"name": name})
+
+
+def _constraint_exists(name: str, table: str) -> bool:
+    return bool(_scalar(
+        "SELECT 1 FROM pg_constraint WHERE conname = :name AND conrelid = CAST(:table AS regclass)",
+        {"name": name, "table": table},
+    ))
+
+
+def create_index_concurrently(name: str, table: str, columns: list, unique: bool = False,
+                              where: str = None, include: list = None):
+    """
+    CREATE INDEX CONCURRENTLY: yozuvlar bloklanmaydi. Partitsiyalangan jadvalda (CONCURRENTLY
+    qo'llab-quvvatlanmaydi) ota jadvallarda `ON ONLY` bilan bo'sh indeks, har bir bargda
+    CONCURRENTLY indeks yaratilib, pastdan yuqoriga ATTACH qilinadi. Oldingi yiqilgan urinishdan
+    qolgan yaroqsiz (INVALID) indeks qayta quriladi.
+    """
+    definition = f"({', '.join(columns)})"
+    if include:
+        definition += f" INCLUDE ({', '.join(include)})"
+    if where:
+        definition += f" WHERE {where}"
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    tree = _tree(table)
+    names = {row.relation: name if row.level == 0 else _child_name(name, table, row.relation) for row in tree}
+
+    with op.get_context().autocommit_block():
+        for row in tree:
+            index = names[row.relation]
+            if not row.isleaf:
+                _execute(f"CREATE {kind} IF NOT EXISTS {index} ON ONLY {row.relation} {definition}")
+                continue
+            if _index_state(index) is False:
+                _execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index}")
+            _execute(f"CREATE {kind} CONCURRENTLY IF NOT EXISTS {index} ON {row.relation} {definition}")
+        # Barcha bo'laklar ulangach ota indeks avtomatik yaroqli bo'ladi
+        for row in sorted(tree, key=lambda item: -item.level):
+            if row.parent is not None:
+                _execute(f"ALTER INDEX {names[row.parent]} ATTACH PARTITION {names[row.relation]}")
+
+
+def drop_index_concurrently(name: str, table: str):
+    """
+    Oddiy jadvalda DROP INDEX CONCURRENTLY; partitsiyalangan indeksni faqat oddiy DROP bilan
+    o'chirish mumkin (qisqa qulf, lock_timeout va qayta urinish bilan).
+    """
+    partitioned = len(_tree(table)) > 1
+    with op.get_context().autocommit_block():
+        _execute(f"DROP INDEX {'' if partitioned else 'CONCURRENTLY '}IF EXISTS {name}")
+
+
+def add_foreign_key(name: str, source: str, referent: str, local_cols: list, remote_cols: list,
+                    ondelete: str = None):
+    """
+    Tashqi kalit ikki bosqichda: `NOT VALID` bilan qo'shish (qisqa qulf, mavjud qatorlar
+    tekshirilmaydi) va `VALIDATE CONSTRAINT` (yozuvlarni bloklamaydigan SHARE UPDATE EXCLUSIVE).
+    Partitsiyalangan jadvalga NOT VALID kalit qo'shib bo'lmaydi: avval har bir bargda shu usulda
+    yaratiladi, keyin ota jadvalga qo'shilganda tayyor kalitlar tekshiruvsiz biriktiriladi.
+    """
+    reference = (
+        f"FOREIGN KEY ({', '.join(local_cols)}) REFERENCES {referent} ({', '.join(remote_cols)})"
+        + (f" ON DELETE {ondelete}" if ondelete else "")
+    )
+    tree = _tree(source)
+    with op.get_context().autocommit_block():
+        if _constraint_exists(name, source):
+            return
+        for row in tree:
+            if not row.isleaf:
+                continue
+            constraint = name if row.level == 0 else _child_name(name, source, row.relation)
+            if not _constraint_exists(constraint, row.relation):
+                _execute(f"ALTER TABLE {row.relation} ADD CONSTRAINT {constraint} {reference} NOT VALID")
+            _execute(f"ALTER TABLE {row.relation} VALIDATE CONSTRAINT {constraint}")
+        if len(tree) > 1:
+            _execute(f"ALTER TABLE {source} ADD CONSTRAINT {name} {reference}")
+
+
+def set_not_null(table: str, column: str):
+    """
+    SET NOT NULL butun jadvalni qulf ostida skanerlaydi. Avval `CHECK (... IS NOT NULL) NOT VALID`
+    tekshiriladi (bloklamasdan), shundan keyin SET NOT NULL skanersiz bajariladi (Postgres 12+).
+    """
+    check = f"{table}_{column}_not_null"[:MAX_IDENTIFIER]
+    with op.get_context().autocommit_block():
+        if not _constraint_exists(check, table):
+            _execute(f"ALTER TABLE {table} ADD CONSTRAINT {check} CHECK ({column} IS NOT NULL) NOT VALID")
+        _execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {check}")
+        _execute(f"ALTER TABLE {table} ALTER COLUMN {column} SET NOT NULL")
+        _execute(f"ALTER TABLE {table} DROP CONSTRAINT {check}")
+
+
+def batched_backfill(table: str, assignments: str, where: str = None, params: dict = None, key: str = "id",
+                     batch_size: int = None, pause: float = None) -> int:
+    """
+    `UPDATE table SET assignments` ni kalit oralig'i bo'yicha kichik partiyalarda, har birini
+    alohida tranzaksiyada bajaradi: qatorlar qisqa vaqt qulflanadi, WAL va replikalar ulguradi.
+    Yangilangan qatorlar soni qaytadi.
+    """
+    batch_size = batch_size or settings.MIGRATION_BATCH_SIZE
+    pause = settings.MIGRATION_BATCH_PAUSE_SECONDS if pause is None else pause
+    condition = f"{key} > :last AND {key} <= :upper" + (f" AND ({where})" if where else "")
+    total = 0
+    with op.get_context().autocommit_block():
+        last = _scalar(f"SELECT min({key}) - 1 FROM {table}")
+        while last is not None:
+            upper = _scalar(
+                f"SELECT max({key}) FROM (SELECT {key} FROM {table} WHERE {key} > :last ORDER BY {key} LIMIT :limit) batch",
+                {"last": last, "limit": batch_size},
+            )
+            if upper is None:
+                break
+            total += _execute(f"UPDATE {table} SET {assignments} WHERE {condition}",
+                              {**(params or {}), "last": last, "upper": upper}).rowcount
+            last = upper
+            if pause:
+                time.sleep(pause)
+    return total
@@ -0,0 +1,145 @@
+import importlib
+import logging
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, event, func, or_, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.outbox import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+# topic -> handlerlar ro'yxati
+handlers = {}
+
+
+def handler(topic: str):
+    """
+    Outbox hodisasi uchun handler ro'yxatdan o'tkazish:
+
+        @outbox.handler("appointment.created")
+        def send_confirmation(payload: dict): ...
+    """
+    def register(func):
+        handlers.setdefault(topic, []).append(func)
+        return func
+    return register
+
+
+def load_handlers():
+    """
+    OUTBOX_HANDLER_MODULES dagi modullarni import qiladi (ular @handler bilan ro'yxatdan o'tadi).
+    """
+    for module in filter(None, (name.strip() for name in settings.OUTBOX_HANDLER_MODULES.split(","))):
+        importlib.import_module(module)
+
+
+def enqueue(db: Session, topic: str, payload: dict):
+    """
+    Hodisani joriy tranzaksiyaga qo'shadi. Commit bo'lmasa hodisa ham yo'qoladi,
+    side-effect ishlari esa so'rov vaqtida emas, worker tomonidan bajariladi.
+    Handleri yo'q topic yozilmaydi: uni hech kim o'qimaydi, jadval esa cheksiz o'sadi.
+    """
+    if topic not in handlers:
+        return
+    db.add(OutboxEvent(topic=topic, payload=payload))
+    db.info["outbox_pending"] = True
+
+
+def backoff(attempts: int) -> timedelta:
+    seconds = settings.OUTBOX_RETRY_BASE_SECONDS * (2 ** (attempts - 1))
+    return timedelta(seconds=min(seconds, settings.OUTBOX_RETRY_MAX_SECONDS))
+
+
+def process_batch(db: Session, batch_size: int = None) -> int:
+    """
+    Bajarilmagan hodisalardan bir partiyani olib handlerlarga beradi.
+    Parallel workerlar bir-birini kutmasligi uchun FOR UPDATE SKIP LOCKED ishlatiladi.
+    Handleri yo'q topiclar olinmaydi: ular handler ro'yxatdan o'tguncha navbatda qoladi
+    (qarang: unhandled_topics). Qayta ishlangan hodisalar sonini qaytaradi.
+    """
+    if not handlers:
+        return 0
+    events = (
+        db.query(OutboxEvent)
+        .filter(
+            OutboxEvent.processed_at.is_(None),
+            OutboxEvent.topic.in_(list(handlers)),
+            OutboxEvent.available_at <= func.now(),
+            OutboxEvent.attempts < settings.OUTBOX_MAX_ATTEMPTS,
+        )
+        .order_by(OutboxEvent.available_at, OutboxEvent.id)
+        .limit(batch_size or settings.OUTBOX_BATCH_SIZE)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    now = datetime.now(timezone.utc)
+    for outbox_event in events:
+        try:
+            for func_ in handlers[outbox_event.topic]:
+                func_(outbox_event.payload)
+        except Exception as exc:
+            outbox_event.attempts += 1
+            outbox_event.last_error = repr(exc)
+            outbox_event.available_at = now + backoff(outbox_event.attempts)
+            logger.warning("Outbox event %s (%s) failed: %r", outbox_event.id, outbox_event.topic, exc)
+        else:
+            outbox_event.processed_at = now
+    db.commit()
+    return len(events)
+
+
+def unhandled_topics(db: Session) -> dict:
+    """
+    Bajarilmagan, lekin handleri ro'yxatdan o'tmagan hodisalar: {topic: soni}.
+    """
+    rows = (
+        db.query(OutboxEvent.topic, func.count())
+        .filter(OutboxEvent.processed_at.is_(None), OutboxEvent.topic.notin_(list(handlers)))
+        .group_by(OutboxEvent.topic)
+    )
+    return dict(rows.all())
+
+
+def purge_finished(db: Session, batch_size: int = 1000) -> int:
+    """
+    OUTBOX_RETENTION_SECONDS dan eski bajarilgan va o'lik hodisalarni bitta partiyada o'chiradi.
+    O'chirilganlar soni qaytadi.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.OUTBOX_RETENTION_SECONDS)
+    finished = (
+        select(OutboxEvent.id)
+        .where(or_(
+            OutboxEvent.processed_at < cutoff,
+            (OutboxEvent.attempts >= settings.OUTBOX_MAX_ATTEMPTS) & (OutboxEvent.available_at < cutoff),
+        ))
+        .limit(batch_size)
+        .scalar_subquery()
+    )
+    deleted = db.execute(delete(OutboxEvent).where(OutboxEvent.id.in_(finished))).rowcount
+    db.commit()
+    return deleted
+
+
+def drain(session_factory, batch_size: int = None) -> int:
+    """
+    Navbat bo'shaguncha partiyalarni qayta ishlaydi.
+    """
+    total = 0
+    while True:
+        with session_factory() as db:
+            db.info["use_primary"] = True
+            processed = process_batch(db, batch_size)
+        total += processed
+        if not processed:
+            return total
+
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_inline(session):
+    # "inline" rejimida (testlar, lokal ishga tushirish) hodisalar commitdan keyin shu jarayonda bajariladi
+    if settings.OUTBOX_MODE != "inline" or not session.info.pop("outbox_pending", False):
+        return
+    from app.database import SessionLocal
+    drain(SessionLocal)
@@ -0,0 +1,221 @@
+import gzip
+import os
+import re
+from datetime import date
+
+from sqlalchemy import text
+
+# Oy (RANGE) bo'yicha bo'lingan jadvallar va ularning sana ustuni.
+TIME_PARTITIONED_TABLES = {
+    "appointments": "appointment_date",
+    "billings": "payment_date",
+    "audit_log": "occurred_at",
+}
+# Oylik partitsiyasi o'z navbatida clinic_id (LIST) bo'yicha bo'linadigan jadvallar
+TENANT_PARTITIONED_TABLES = ("appointments", "billings")
+
+MONTH_PARTITION_RE = re.compile(r"_y(\d{4})m(\d{2})$")
+# Qayta qurilgan jadvallarning tashqi kalitlari: (nomi, ustun, jadval). billings -> appointments
+# kaliti qaytmaydi - appointments ning birlamchi kaliti endi sanani ham o'z ichiga oladi
+PARTITION_FOREIGN_KEYS = {
+    "appointments": [
+        ("appointments_patient_id_fkey", "patient_id", "patients"),
+        ("appointments_doctor_id_fkey", "doctor_id", "doctors"),
+        ("appointments_service_id_fkey", "service_id", "doctor_services"),
+        ("appointments_created_by_id_fkey", "created_by_id", "users"),
+        ("appointments_clinic_id_fkey", "clinic_id", "clinics"),
+    ],
+    "billings": [
+        ("billings_clinic_id_fkey", "clinic_id", "clinics"),
+    ],
+}
+
+
+def is_partitioned(conn, table: str) -> bool:
+    """
+    Jadval Postgresda partitsiyalangan (relkind = 'p') ekanini tekshiradi.
+    """
+    if conn.dialect.name != "postgresql":
+        return False
+    relkind = conn.execute(
+        text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:table)"),
+        {"table": table},
+    ).scalar()
+    return relkind == "p"
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_partition_name(table: str, month: date) -> str:
+    return f"{table}_y{month.year:04d}m{month.month:02d}"
+
+
+def month_partitions(conn, table: str) -> list:
+    """
+    Jadvalning oylik partitsiyalari: [(nomi, oy boshi), ...] sana bo'yicha tartiblangan.
+    """
+    rows = conn.execute(
+        text("SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+             "WHERE i.inhparent = to_regclass(:table)"),
+        {"table": table},
+    ).scalars()
+    partitions = []
+    for name in rows:
+        match = MONTH_PARTITION_RE.search(name)
+        if match:
+            partitions.append((name, date(int(match.group(1)), int(match.group(2)), 1)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def create_month_partition(conn, table: str, month: date):
+    """
+    Bir oylik partitsiya yaratadi (mavjud bo'lsa tegmaydi); filial jadvallarida uni filiallar bo'yicha bo'ladi.
+    """
+    month = month_start(month)
+    name = month_partition_name(table, month)
+    by_clinic = table in TENANT_PARTITIONED_TABLES
+    bounds = {"start": month, "end": add_months(month, 1)}
+    default = f"{table}_default"
+    column = TIME_PARTITIONED_TABLES[table]
+    # Oralig'i hali ochilmagan sanadagi qatorlar DEFAULT ga tushgan bo'ladi: ular turganda
+    # Postgres yangi partitsiyani qo'shmaydi. DEFAULT ajratiladi, qatorlar yangi oyga ko'chiriladi
+    condition = f"{column} >= :start AND {column} < :end"
+    missing = conn.execute(
+        text("SELECT to_regclass(:name) IS NULL AND to_regclass(:default) IS NOT NULL"),
+        {"name": name, "default": default},
+    ).scalar()
+    moved = missing and conn.execute(
+        text(f"SELECT EXISTS (SELECT 1 FROM {default} WHERE {condition})"), bounds
+    ).scalar()
+    if moved:
+        conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {default}"))
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+        + (" PARTITION BY LIST (clinic_id)" if by_clinic else "")
+    ))
+    if by_clinic:
+        _create_clinic_leaves(conn, name)
+    if moved:
+        conn.execute(text(f"INSERT INTO {table} SELECT * FROM {default} WHERE {condition}"), bounds)
+        conn.execute(text(f"DELETE FROM {default} WHERE {condition}"), bounds)
+        conn.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {default} DEFAULT"))
+
+
+def _create_clinic_leaves(conn, name: str):
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {name}_default PARTITION OF {name} DEFAULT"))
+    for clinic_id in conn.execute(text("SELECT id FROM clinics")).scalars():
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {name}_clinic_{int(clinic_id)} "
+            f"PARTITION OF {name} FOR VALUES IN ({int(clinic_id)})"
+        ))
+
+
+def ensure_month_partitions(conn, months_ahead: int = 3, start: date = None):
+    """
+    Joriy oydan boshlab `months_ahead` oy oldinga partitsiyalar borligini ta'minlaydi.
+    """
+    start = month_start(start or date.today())
+    for table in TIME_PARTITIONED_TABLES:
+        if not is_partitioned(conn, table):
+            continue
+        for offset in range(months_ahead + 1):
+            create_month_partition(conn, table, add_months(start, offset))
+
+
+def create_clinic_partitions(conn, clinic_id: int):
+    """
+    Yangi filial uchun har bir clinic_id bo'yicha bo'lingan (LIST) partitsiyada
+    alohida bo'lak yaratadi, shunda filial so'rovlari faqat o'z bo'lagini o'qiydi.
+    """
+    clinic_id = int(clinic_id)
+    for table in TENANT_PARTITIONED_TABLES:
+        if not is_partitioned(conn, table):
+            continue
+        parents = conn.execute(
+            text("SELECT c.relname FROM pg_class c JOIN pg_partitioned_table p ON p.partrelid = c.oid "
+                 "WHERE p.partstrat = 'l' AND (c.oid = to_regclass(:table) OR c.oid IN "
+                 "(SELECT inhrelid FROM pg_inherits WHERE inhparent = to_regclass(:table)))"),
+            {"table": table},
+        ).scalars().all()
+        for parent in parents:
+            conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {parent}_clinic_{clinic_id} "
+                f"PARTITION OF {parent} FOR VALUES IN ({clinic_id})"
+            ))
+
+
+def rebuild_partitioned(conn, table: str, months_ahead: int = 3):
+    """
+    Oddiy jadvalni oy (RANGE), har oy ichida esa filial (LIST) bo'yicha bo'lingan jadvalga
+    aylantiradi: mavjud sanalar oralig'i va kelgusi `months_ahead` oy uchun partitsiyalar
+    yaratiladi, qatorlar ko'chiriladi. Jadval butunlay qayta yoziladi (ACCESS EXCLUSIVE), shuning
+    uchun faqat bo'sh jadvalda yoki yozuvlar to'xtatilgan texnik oynada chaqiriladi
+    (`python -m app.commands.partitions rebuild`).
+    """
+    column = TIME_PARTITIONED_TABLES[table]
+    old = f"{table}_unpartitioned"
+    conn.execute(text(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE"))
+    if table == "billings":
+        # Sanasiz billinglarga qabul sanasi qo'yiladi (create_for_appointment ham shunday qiladi)
+        conn.execute(text(
+            "UPDATE billings SET payment_date = (SELECT a.appointment_date FROM appointments a "
+            "WHERE a.id = billings.appointment_id AND a.clinic_id = billings.clinic_id) "
+            "WHERE payment_date IS NULL"
+        ))
+    # Sana yangi PRIMARY KEY ga kiradi: NULL qatorlar ko'chirishdan oldin to'xtatiladi
+    missing = conn.execute(text(f"SELECT count(*) FROM {table} WHERE {column} IS NULL")).scalar()
+    if missing:
+        raise RuntimeError(f"{table}.{column}: {missing} rows without a partition date; set the dates before rebuilding")
+    first, last = conn.execute(text(f"SELECT min({column}), max({column}) FROM {table}")).one()
+
+    conn.execute(text("ALTER TABLE billings DROP CONSTRAINT IF EXISTS billings_appointment_id_fkey"))
+    conn.execute(text(f"ALTER TABLE {table} RENAME TO {old}"))
+    conn.execute(text(f"ALTER INDEX {table}_pkey RENAME TO {old}_pkey"))
+    conn.execute(text(f"ALTER SEQUENCE {table}_id_seq OWNED BY NONE"))
+    conn.execute(text(
+        f"CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS, PRIMARY KEY (id, {column}, clinic_id)) "
+        f"PARTITION BY RANGE ({column})"
+    ))
+    conn.execute(text(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id"))
+    conn.execute(text(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT"))
+    current = month_start(date.today())
+    month = month_start(first) if first else current
+    end = max(month_start(last) if last else current, add_months(current, months_ahead))
+    while month <= end:
+        create_month_partition(conn, table, month)
+        month = add_months(month, 1)
+
+    conn.execute(text(f"INSERT INTO {table} SELECT * FROM {old}"))
+    conn.execute(text(f"DROP TABLE {old} CASCADE"))
+    conn.execute(text(f"CREATE INDEX ix_{table}_id ON {table} (id)"))
+    conn.execute(text(f"CREATE INDEX ix_{table}_clinic_id ON {table} (clinic_id)"))
+    for name, local_column, referent in PARTITION_FOREIGN_KEYS[table]:
+        conn.execute(text(
+            f"ALTER TABLE {table} ADD CONSTRAINT {name} FOREIGN KEY ({local_column}) REFERENCES {referent} (id)"
+        ))
+
+
+def archive_month_partition(conn, table: str, partition: str, output_dir: str) -> str:
+    """
+    Oylik partitsiyani asosiy jadvaldan ajratadi (DETACH), uni gzip qilingan CSV faylga
+    yozadi va o'chiradi. Yozilgan fayl yo'lini qaytaradi.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f"{partition}.csv.gz")
+    conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {partition}"))
+    cursor = conn.connection.cursor()
+    try:
+        with gzip.open(path, "wb") as archive:
+            cursor.copy_expert(f"COPY (SELECT * FROM {partition}) TO STDOUT WITH CSV HEADER", archive)
+    finally:
+        cursor.close()
+    conn.execute(text(f"DROP TABLE {partition} CASCADE"))
+    return path
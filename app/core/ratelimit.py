@@ -0,0 +1,218 @@
+import json
+import threading
+import time
+import zlib
+
+from fastapi import HTTPException, status
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+
+UNITS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+class Limit:
+    """
+    Token bucket chegarasi: `capacity` ta so'rov, `period` soniyada to'liq tiklanadi.
+    "20/minute" yoki "5/10" (5 ta so'rov 10 soniyada) ko'rinishida yoziladi.
+    """
+    def __init__(self, capacity: int, period: float):
+        self.capacity = capacity
+        self.period = period
+        self.rate = capacity / period  # soniyada tiklanadigan tokenlar
+
+    @classmethod
+    def parse(cls, value: str) -> "Limit":
+        count, _, per = value.strip().partition("/")
+        period = UNITS[per] if per in UNITS else float(per)
+        return cls(int(count), period)
+
+    def __repr__(self):
+        return f"Limit({self.capacity}/{self.period}s)"
+
+
+class MemoryBucketStore:
+    """
+    Jarayon ichidagi token bucket ombori. Kalitlar bir nechta bo'lakka (shard) bo'linadi,
+    har bir bo'lakning o'z qulfi bor, shuning uchun oqimlar bir-birini kam to'sadi.
+    """
+    blocking = False  # Tarmoqqa murojaat yo'q: event loop ichida chaqirish mumkin
+
+    def __init__(self, shards: int = 16, max_keys_per_shard: int = 10000):
+        self.max_keys_per_shard = max_keys_per_shard
+        self._shards = [({}, threading.Lock()) for _ in range(shards)]
+
+    def _shard(self, key: str):
+        return self._shards[zlib.crc32(key.encode()) % len(self._shards)]
+
+    def consume(self, key: str, limit: Limit, cost: int = 1):
+        """
+        Bucketdan `cost` token oladi. (ruxsat berildimi, qancha soniyadan keyin qayta urinish mumkin)
+        """
+        buckets, lock = self._shard(key)
+        now = time.monotonic()
+        with lock:
+            tokens, updated_at, _ = buckets.get(key, (limit.capacity, now, limit.period))
+            tokens = min(limit.capacity, tokens + (now - updated_at) * limit.rate)
+            if tokens >= cost:
+                buckets[key] = (tokens - cost, now, limit.period)
+                allowed, retry_after = True, 0.0
+            else:
+                buckets[key] = (tokens, now, limit.period)
+                allowed, retry_after = False, (cost - tokens) / limit.rate
+            if len(buckets) > self.max_keys_per_shard:
+                self._prune(buckets, now)
+        return allowed, retry_after
+
+    def _prune(self, buckets: dict, now: float):
+        # To'liq tiklangan bucketlar boshlang'ich holatdan farq qilmaydi, ularni o'chirish mumkin
+        for key, (_, updated_at, period) in list(buckets.items()):
+            if now - updated_at >= period:
+                del buckets[key]
+
+
+class RedisBucketStore:
+    """
+    Redis (yoki unga mos server) dagi token bucket: bir nechta worker/jarayon umumiy chegarani ishlatadi.
+    Hisob-kitob atomar Lua skriptda bajariladi. Har bir consume tarmoq so'rovi: async koddan
+    faqat threadpool orqali chaqiriladi (qarang consume_async).
+    """
+    blocking = True
+
+    SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local cost = tonumber(ARGV[4])
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+    local tokens = tonumber(bucket[1]) or capacity
+    local updated_at = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + (now - updated_at) * rate)
+    local allowed = 0
+    local retry_after = 0
+    if tokens >= cost then
+        tokens = tokens - cost
+        allowed = 1
+    else
+        retry_after = (cost - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated_at', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return {allowed, tostring(retry_after)}
+    """
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("RATE_LIMIT_REDIS_URL is set but the 'redis' package is not installed")
+        self._client = redis.Redis.from_url(url)
+        self._script = self._client.register_script(self.SCRIPT)
+
+    def consume(self, key: str, limit: Limit, cost: int = 1):
+        allowed, retry_after = self._script(
+            keys=[f"ratelimit:{key}"],
+            args=[limit.capacity, limit.rate, time.time(), cost],
+        )
+        return bool(allowed), float(retry_after)
+
+
+def create_store():
+    if settings.RATE_LIMIT_REDIS_URL:
+        return RedisBucketStore(settings.RATE_LIMIT_REDIS_URL)
+    return MemoryBucketStore()
+
+
+def parse_route_limits(value: str) -> dict:
+    """
+    "POST /users/getToken=20/minute,GET /clinic/doctors/=300/minute" -> {("POST", "/users/getToken"): Limit}
+    """
+    limits = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        route, _, limit = item.rpartition("=")
+        method, _, path = route.strip().partition(" ")
+        limits[(method.upper(), path.strip())] = Limit.parse(limit)
+    return limits
+
+
+store = create_store()
+route_limits = parse_route_limits(settings.RATE_LIMIT_ROUTES)
+username_limit = Limit.parse(settings.RATE_LIMIT_LOGIN_PER_USERNAME)
+
+
+def _too_many_requests(retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many requests",
+        headers={"Retry-After": str(max(1, int(retry_after + 0.999)))},
+    )
+
+
+async def consume_async(key: str, limit: Limit, cost: int = 1):
+    """
+    store.consume ning async varianti: Redis ombori event loopni to'smasligi uchun threadpoolda.
+    """
+    if store.blocking:
+        return await run_in_threadpool(store.consume, key, limit, cost)
+    return store.consume(key, limit, cost)
+
+
+def enforce_rate_limit(key: str, limit: Limit):
+    """
+    Chegaradan oshilgan bo'lsa 429 qaytaradi. Endpoint ichida, qimmat ishdan (bcrypt, DB) oldin chaqiriladi.
+    Bloklovchi chaqiruv: faqat sinxron (`def`, threadpoolda ishlaydigan) endpointlardan; async
+    endpointlar `await enforce_rate_limit_async(...)` ishlatadi.
+    """
+    allowed, retry_after = store.consume(key, limit)
+    if not allowed:
+        raise _too_many_requests(retry_after)
+
+
+async def enforce_rate_limit_async(key: str, limit: Limit):
+    allowed, retry_after = await consume_async(key, limit)
+    if not allowed:
+        raise _too_many_requests(retry_after)
+
+
+def client_ip(scope) -> str:
+    if settings.RATE_LIMIT_TRUST_PROXY:
+        for name, value in scope.get("headers", []):
+            if name == b"x-forwarded-for":
+                return value.decode("latin-1").split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+class RateLimitMiddleware:
+    """
+    IP bo'yicha chegaralovchi ASGI middleware. Rad etish so'rov tanasi o'qilishidan oldin,
+    bitta dict murojaati va hisob bilan bajariladi, endpoint umuman chaqirilmaydi.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            limit = route_limits.get((scope["method"], scope["path"]))
+            if limit is not None:
+                allowed, retry_after = await consume_async(
+                    f"ip:{scope['method']}:{scope['path']}:{client_ip(scope)}", limit)
+                if not allowed:
+                    await self._reject(send, retry_after)
+                    return
+        await self.app(scope, receive, send)
+
+    async def _reject(self, send, retry_after: float):
+        body = json.dumps({"detail": "Too many requests"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status.HTTP_429_TOO_MANY_REQUESTS,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, int(retry_after + 0.999))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,172 @@
+import asyncio
+import json
+import logging
+import select
+import threading
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.clinics import Appointment
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "schedule_events"
+
+
+class Subscriber:
+    def __init__(self, loop, clinic_id: int, doctor_id: int = None, day: str = None):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=settings.STREAM_QUEUE_SIZE)
+        self.clinic_id = clinic_id
+        self.doctor_id = doctor_id
+        self.day = day
+
+    def matches(self, payload: dict) -> bool:
+        return (
+            payload.get("clinic_id") == self.clinic_id
+            and (self.doctor_id is None or payload.get("doctor_id") == self.doctor_id)
+            and (self.day is None or payload.get("appointment_date") == self.day)
+        )
+
+    def push(self, payload: dict):
+        try:
+            self.queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            # Sekin mijoz boshqalarni to'xtatmasligi uchun hodisa tashlab yuboriladi
+            pass
+
+
+class ScheduleBroker:
+    """
+    Jadval hodisalarini obunachilarga tarqatadi. "local" rejimida jarayon ichida,
+    "postgres" rejimida esa LISTEN/NOTIFY orqali barcha workerlarga.
+    """
+    def __init__(self):
+        self.subscribers = set()
+        self._lock = threading.Lock()
+        self._listener = None
+
+    def subscribe(self, subscriber: Subscriber):
+        with self._lock:
+            self.subscribers.add(subscriber)
+        if settings.STREAM_BACKEND == "postgres":
+            self._start_listener()
+
+    def unsubscribe(self, subscriber: Subscriber):
+        with self._lock:
+            self.subscribers.discard(subscriber)
+
+    def dispatch(self, payload: dict):
+        """
+        Hodisani shu jarayondagi mos obunachilarga beradi (istalgan oqimdan chaqirish mumkin).
+        """
+        with self._lock:
+            subscribers = [s for s in self.subscribers if s.matches(payload)]
+        for subscriber in subscribers:
+            subscriber.loop.call_soon_threadsafe(subscriber.push, payload)
+
+    def _start_listener(self):
+        with self._lock:
+            if self._listener is not None and self._listener.is_alive():
+                return
+            self._listener = threading.Thread(target=self._listen, name="schedule-listener", daemon=True)
+            self._listener.start()
+
+    def _listen(self):
+        from app.database import engine
+
+        while True:
+            try:
+                connection = engine.raw_connection()
+                # LISTEN ulanishi pulga qaytmaydi
+                connection.detach()
+                try:
+                    connection.dbapi_connection.autocommit = True
+                    cursor = connection.cursor()
+                    cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                    pg_connection = connection.dbapi_connection
+                    while True:
+                        if select.select([pg_connection], [], [], 5) == ([], [], []):
+                            continue
+                        pg_connection.poll()
+                        while pg_connection.notifies:
+                            notify = pg_connection.notifies.pop(0)
+                            self.dispatch(json.loads(notify.payload))
+                finally:
+                    connection.close()
+            except Exception:
+                logger.exception("Schedule listener failed, reconnecting")
+                threading.Event().wait(1)
+
+
+broker = ScheduleBroker()
+
+
+def appointment_event(event_type: str, appointment: Appointment) -> dict:
+    return {
+        "type": event_type,
+        "id": appointment.id,
+        "clinic_id": appointment.clinic_id,
+        "doctor_id": appointment.doctor_id,
+        "patient_id": appointment.patient_id,
+        "service_id": appointment.service_id,
+        "appointment_date": str(appointment.appointment_date) if appointment.appointment_date else None,
+    }
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_schedule_events(session, flush_context):
+    events = []
+    for obj in session.new:
+        if isinstance(obj, Appointment):
+            events.append(appointment_event("appointment.created", obj))
+    for obj in session.dirty:
+        if isinstance(obj, Appointment) and session.is_modified(obj, include_collections=False):
+            events.append(appointment_event("appointment.updated", obj))
+    for obj in session.deleted:
+        if isinstance(obj, Appointment):
+            events.append(appointment_event("appointment.cancelled", obj))
+    _queue_events(session, events)
+
+
+def record_removed(session: Session, objects: list):
+    """
+    Set-based o'chirish (soft delete) bilan bekor qilingan qabullar uchun hodisalar.
+    """
+    _queue_events(session, [
+        appointment_event("appointment.cancelled", obj) for obj in objects if isinstance(obj, Appointment)
+    ])
+
+
+def record_updated(session: Session, objects: list):
+    """
+    UPDATE ... RETURNING bilan o'zgartirilgan qabullar uchun hodisalar.
+    """
+    _queue_events(session, [
+        appointment_event("appointment.updated", obj) for obj in objects if isinstance(obj, Appointment)
+    ])
+
+
+def _queue_events(session: Session, events: list):
+    if not events:
+        return
+    if settings.STREAM_BACKEND == "postgres" and session.bind.dialect.name == "postgresql":
+        # NOTIFY tranzaksion: hodisa faqat commitdan keyin yetkaziladi
+        for payload in events:
+            session.connection().execute(text("SELECT pg_notify(:channel, :payload)"),
+                                         {"channel": NOTIFY_CHANNEL, "payload": json.dumps(payload)})
+    else:
+        session.info.setdefault("schedule_events", []).extend(events)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_schedule_events(session):
+    for payload in session.info.pop("schedule_events", []):
+        broker.dispatch(payload)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_schedule_events(session):
+    session.info.pop("schedule_events", None)
@@ -1,36 +1,130 @@
 from fastapi import HTTPException
+from sqlalchemy import delete, func, select, update
 from sqlalchemy.orm import Session
-from typing import Generic, TypeVar, Type, Any, Dict
+from typing import Generic, TypeVar, Type, Any, Dict, Iterable, Optional, Sequence, Tuple
+from app.core import audit, catalog, outbox, stream
+from app.crud import totals
+from app.crud.filters import EQUALITY_OPS, build_filters, build_order_by
 from app.models.user import User
-from app.models.clinics import Doctor
+from app.models.clinics import Doctor, DoctorService, Patient, PatientHistory, Appointment, Billing, BillingItem
 from app.schemas.clinics import DoctorCreate, DoctorUpdate
 
 ModelType = TypeVar("ModelType")
+
+# O'chirishda ergashadigan bog'liq yozuvlar: model -> [(bola model, tashqi kalit ustuni)]
+CASCADES = {
+    Doctor: [(DoctorService, "doctor_id"), (Appointment, "doctor_id")],
+    Patient: [(PatientHistory, "patient_id"), (Appointment, "patient_id")],
+    Appointment: [(Billing, "appointment_id")],
+    Billing: [(BillingItem, "billing_id")],
+}
 CreateSchemaType = TypeVar("CreateSchemaType")
 UpdateSchemaType = TypeVar("UpdateSchemaType")
 
+
+def sync_appointment_totals(db: Session, appointment_ids: Iterable[int]):
+    """
+    Qabullardagi billed_total/paid_total ni amaldagi (o'chirilmagan) billinglardan qayta hisoblaydi.
+    Billing o'chirilganda yoki to'lov holati o'zgarganda shu tranzaksiyada chaqiriladi.
+    """
+    appointment_ids = list(set(appointment_ids))
+    if not appointment_ids:
+        return
+    live = select(func.coalesce(func.sum(Billing.total_amount), 0)).where(
+        Billing.appointment_id == Appointment.id,
+        Billing.clinic_id == Appointment.clinic_id,
+        Billing.deleted_at.is_(None),
+    )
+    db.execute(
+        update(Appointment)
+        .where(Appointment.id.in_(appointment_ids))
+        .values(billed_total=live.scalar_subquery(), paid_total=live.where(Billing.paid.is_(True)).scalar_subquery()),
+        execution_options={"synchronize_session": False},
+    )
+
+
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
+    # Yaratilganda outboxga yoziladigan hodisa nomi (masalan "appointment.created")
+    created_event: Optional[str] = None
+    # Ro'yxatda ruxsat etilgan filtrlar {maydon: operatorlar} va saralash maydonlari (indekslangan bo'lishi kerak)
+    filter_fields: Dict[str, set] = {}
+    sort_fields: set = {"id"}
+    # `?facets=` bilan qiymatlari bo'yicha sanaladigan maydonlar
+    facet_fields: set = set()
+
     def __init__(self, model: Type[ModelType]):
         self.model = model
 
+    def filters(self, db: Session) -> list:
+        """
+        Har bir so'rovga qo'shiladigan shartlar: joriy tenant (filial) va o'chirilmaganlik.
+        """
+        criteria = []
+        clinic_id = db.info.get("clinic_id")
+        if clinic_id is not None and hasattr(self.model, "clinic_id"):
+            criteria.append(self.model.clinic_id == clinic_id)
+        if hasattr(self.model, "deleted_at"):
+            criteria.append(self.model.deleted_at.is_(None))
+        return criteria
+
+    def query(self, db: Session):
+        """
+        Modelga so'rov. Model filialga tegishli bo'lsa, joriy tenant bo'yicha filtrlanadi,
+        soft delete qilingan yozuvlar chiqarib tashlanadi.
+        """
+        return db.query(self.model).filter(*self.filters(db))
+
+    def tenant_fields(self, db: Session) -> Dict[str, Any]:
+        clinic_id = db.info.get("clinic_id")
+        if clinic_id is not None and hasattr(self.model, "clinic_id"):
+            return {"clinic_id": clinic_id}
+        return {}
+
     def get(self, db: Session, id: int):
-        return db.query(self.model).filter(self.model.id == id).first()
+        return self.query(db).filter(self.model.id == id).first()
     
-    def get_multi(self, db: Session, *, skip: int = 0, limit: int = 100):
-        return db.query(self.model).offset(skip).limit(limit).all()
+    def list_query(self, db: Session, filters: Optional[Iterable[Tuple[str, str]]] = None):
+        """
+        Ro'yxat so'rovi: `?paid=false&payment_date__gte=...` kabi filtrlar (filter_fields bo'yicha).
+        """
+        return self.query(db).filter(*build_filters(self.model, filters or (), self.filter_fields))
+
+    def get_multi(self, db: Session, *, skip: int = 0, limit: int = 100,
+                  filters: Optional[Iterable[Tuple[str, str]]] = None, order_by: Optional[str] = None,
+                  options: Sequence = ()):
+        # options: masalan ?fields= dan load_only/joinedload
+        return (
+            self.list_query(db, filters)
+            .options(*options)
+            .order_by(*build_order_by(self.model, order_by, self.sort_fields))
+            .offset(skip)
+            .limit(limit)
+            .all()
+        )
+
+    def list_totals(self, db: Session, query, total: Optional[str] = None, facets: Optional[str] = None,
+                    filtered: bool = True) -> dict:
+        """
+        Ro'yxat so'rovi uchun jami son (total=exact|estimate) va facet sonlari, faqat so'ralganda.
+        """
+        return totals.list_totals(db, self, query, total, facets, filtered)
 
     def get_all(self, db: Session, skip: int = 0, limit: int = 100):
-        return db.query(self.model).offset(skip).limit(limit).all()
+        return self.query(db).offset(skip).limit(limit).all()
 
     def create(self, db: Session, obj_in: CreateSchemaType):
-        db_obj = self.model(**obj_in.dict())
+        data = obj_in if isinstance(obj_in, dict) else obj_in.dict()
+        db_obj = self.model(**{**self.tenant_fields(db), **data})
         db.add(db_obj)
+        if self.created_event:
+            db.flush()
+            outbox.enqueue(db, self.created_event, {"id": db_obj.id, **self.tenant_fields(db)})
         db.commit()
         db.refresh(db_obj)
         return db_obj
     
     def create_patient(self, db: Session, obj_in: dict):
-        db_obj = self.model(**obj_in) 
+        db_obj = self.model(**{**self.tenant_fields(db), **obj_in}) 
         db.add(db_obj)
         db.commit()
         db.refresh(db_obj)
@@ -44,70 +138,225 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         db.refresh(db_obj)
         return db_obj
 
+    def update_by_id(self, db: Session, id: int, obj_in: UpdateSchemaType, version: Optional[int] = None,
+                     exclude_unset: bool = True):
+        """
+        Yozuvni bitta UPDATE ... RETURNING bilan o'zgartiradi (oldindan SELECT qilinmaydi).
+        Modelda `version` ustuni bo'lsa u oshiriladi; `version` berilsa (If-Match) va yozuv
+        o'zgargan bo'lsa 412 qaytariladi. Yozuv topilmasa None.
+        """
+        values = dict(obj_in) if isinstance(obj_in, dict) else obj_in.dict(exclude_unset=exclude_unset)
+        if not values:
+            return self.get(db, id)
+        criteria = [self.model.id == id, *self.filters(db)]
+        if hasattr(self.model, "version"):
+            if version is not None:
+                criteria.append(self.model.version == version)
+            values["version"] = self.model.version + 1
+        # Audit uchun eski qiymatlar shu so'rovning o'zida CTE orqali olinadi
+        fields = [key for key in values if key != "version"]
+        old = (
+            select(self.model.id, *[getattr(self.model, key) for key in fields])
+            .where(*criteria)
+            .with_for_update()
+            .cte("old")
+        )
+        row = db.execute(
+            update(self.model)
+            .where(self.model.id == old.c.id)
+            .values(**values)
+            .returning(self.model, *[old.c[key].label(f"old_{key}") for key in fields]),
+            execution_options={"synchronize_session": False, "populate_existing": True},
+        ).first()
+        if row is None:
+            db.rollback()
+            if version is not None and self.get(db, id) is not None:
+                raise HTTPException(status_code=412, detail="Record was modified by another request")
+            return None
+        obj = row[0]
+        audit.record_updated(db, obj, dict(zip(fields, row[1:])))
+        stream.record_updated(db, [obj])
+        catalog.record_changed(db, [obj])
+        self.update_related(db, obj, values)
+        # Commitdan keyin obyekt qayta SELECT qilinmasligi uchun sessiyadan ajratiladi
+        db.expunge(obj)
+        db.commit()
+        return obj
+
     def delete(self, db: Session, id: int):
-        obj = db.query(self.model).filter(self.model.id == id).first()
+        obj = self.query(db).filter(self.model.id == id).first()
         if obj:
             db.delete(obj)
             db.commit()
         return obj
 
+    def remove(self, db: Session, id: int, hard: bool = False):
+        """
+        Yozuvni va unga bog'liq yozuvlarni (CASCADES) o'chiradi. Har bir jadval uchun bitta
+        set-based UPDATE (soft delete) yoki DELETE ishlatiladi, hammasi bitta tranzaksiyada.
+        O'chirilgan asosiy obyektni yoki topilmasa None qaytaradi.
+        """
+        removed_billings = []
+        if hard:
+            obj = self.get(db, id)
+            if obj is None:
+                return None
+            plan = self._cascade_plan(self.model, [id], [])
+            # Tashqi kalitlar buzilmasligi uchun avval bolalar o'chiriladi
+            for model, ids in reversed(plan):
+                removed = db.execute(
+                    delete(model).where(model.id.in_(ids)).returning(model),
+                    execution_options={"synchronize_session": False},
+                ).scalars().all()
+                audit.record_removed(db, removed, hard=True)
+                stream.record_removed(db, removed)
+                catalog.record_changed(db, removed, deleted=True)
+                if model is Billing:
+                    removed_billings += removed
+        else:
+            removed = db.execute(
+                update(self.model)
+                .where(self.model.id == id, *self.filters(db))
+                .values(deleted_at=func.now())
+                .returning(self.model),
+                execution_options={"synchronize_session": False, "populate_existing": True},
+            ).scalars().all()
+            if not removed:
+                return None
+            obj = removed[0]
+            audit.record_removed(db, removed)
+            stream.record_removed(db, removed)
+            catalog.record_changed(db, removed)
+            if self.model is Billing:
+                removed_billings += removed
+            for model, ids in self._cascade_plan(self.model, [id], [])[1:]:
+                removed = db.execute(
+                    update(model)
+                    .where(model.id.in_(ids), model.deleted_at.is_(None))
+                    .values(deleted_at=func.now())
+                    .returning(model),
+                    execution_options={"synchronize_session": False, "populate_existing": True},
+                ).scalars().all()
+                audit.record_removed(db, removed)
+                stream.record_removed(db, removed)
+                catalog.record_changed(db, removed)
+                if model is Billing:
+                    removed_billings += removed
+        # O'chirilgan billinglar qabul yig'indilaridan chiqariladi
+        sync_appointment_totals(db, [billing.appointment_id for billing in removed_billings])
+        self.remove_related(db, id, hard)
+        db.commit()
+        return obj
+
+    def remove_related(self, db: Session, id: int, hard: bool):
+        """
+        CASCADES ga sig'maydigan qo'shimcha o'chirishlar uchun (shu tranzaksiyada).
+        """
+        pass
+
+    def update_related(self, db: Session, obj: ModelType, values: dict):
+        """
+        update_by_id dan keyin bog'liq yozuvlarni moslash uchun (shu tranzaksiyada, commitdan oldin).
+        """
+        pass
+
+    def _cascade_plan(self, model, ids, plan: list) -> list:
+        # (model, id lar) juftliklari: ota birinchi, keyin bolalar (id lar subquery sifatida)
+        plan.append((model, ids))
+        for child, column in CASCADES.get(model, []):
+            self._cascade_plan(child, select(child.id).where(getattr(child, column).in_(ids)), plan)
+        return plan
+
 def get_user_by_username(db: Session, username: str):
-    return db.query(User).filter(User.username == username).first()
+    return db.query(User).filter(User.username == username, User.deleted_at.is_(None)).first()
 
 
 class CRUDDoctor(CRUDBase[Doctor, DoctorCreate, DoctorUpdate]):
     """
     Doktor uchun maxsus CRUD.
     """
+    filter_fields = {"specialization": EQUALITY_OPS}
+    sort_fields = {"id", "specialization"}
+    facet_fields = {"specialization"}
+
     def create_with_doctor(self, db: Session, user_data: dict, doctor_data: dict):
         """
         Doktor va unga tegishli foydalanuvchini yaratish.
         """
-        user = User(**user_data)
+        tenant = self.tenant_fields(db)
+        user = User(**{**tenant, **user_data})
         db.add(user)
         db.commit()
         db.refresh(user)
 
-        doctor = self.model(id=user.id, **doctor_data)
+        doctor = self.model(id=user.id, **{**tenant, **self.with_specialization(db, doctor_data)})
         db.add(doctor)
         db.commit()
         db.refresh(doctor)
 
         return doctor
 
+    def with_specialization(self, db: Session, values: dict) -> dict:
+        """
+        Erkin matndagi mutaxassislikni katalogdagi yozuvga bog'laydi (yo'q bo'lsa qo'shiladi).
+        """
+        clinic_id = self.tenant_fields(db).get("clinic_id")
+        if not values.get("specialization") or clinic_id is None:
+            return values
+        specialization_id, name = catalog.cache.resolve(db, "specializations", clinic_id, values["specialization"])
+        return {**values, "specialization": name, "specialization_id": specialization_id}
+
+    def remove_related(self, db: Session, id: int, hard: bool):
+        # Doktorning foydalanuvchi hisobi ham o'chiriladi
+        if hard:
+            db.execute(delete(User).where(User.id == id), execution_options={"synchronize_session": False})
+        else:
+            db.execute(
+                update(User).where(User.id == id, User.deleted_at.is_(None)).values(deleted_at=func.now()),
+                execution_options={"synchronize_session": False},
+            )
+
     def update_patch_with_doctor(self, db: Session, doctor_id: int, doctor_data: DoctorUpdate):
-        db_doctor = db.query(Doctor).filter(Doctor.id == doctor_id).first()
+        db_doctor = self.query(db).filter(Doctor.id == doctor_id).first()
         if not db_doctor:
             raise HTTPException(status_code=404, detail="Doctor not found")
 
         db_user = db_doctor.user
 
         doctor_fields = {key: value for key, value in doctor_data.dict(exclude_unset=True).items() if hasattr(Doctor, key)}
+        doctor_fields = self.with_specialization(db, doctor_fields)
         for key, value in doctor_fields.items():
             setattr(db_doctor, key, value)
 
         user_fields = {key: value for key, value in doctor_data.dict(exclude_unset=True).items() if hasattr(User, key)}
         for key, value in user_fields.items():
             setattr(db_user, key, value)
+        if user_fields:
+            # Sinxronizatsiya uchun: foydalanuvchi maydonlari ham doktorning o'zgarishi hisoblanadi
+            db_doctor.updated_at = func.now()
 
         db.commit()
         db.refresh(db_doctor)
         return db_doctor
 
     def update_put_with_doctor(self, db: Session, doctor_id: int, doctor_data: DoctorCreate):
-        db_doctor = db.query(Doctor).filter(Doctor.id == doctor_id).first()
+        db_doctor = self.query(db).filter(Doctor.id == doctor_id).first()
         if not db_doctor:
             raise HTTPException(status_code=404, detail="Doctor not found")
 
         db_user = db_doctor.user
 
         doctor_fields = {key: value for key, value in doctor_data.dict().items() if hasattr(Doctor, key)}
+        doctor_fields = self.with_specialization(db, doctor_fields)
         for key, value in doctor_fields.items():
             setattr(db_doctor, key, value)
 
         user_fields = {key: value for key, value in doctor_data.dict().items() if hasattr(User, key)}
         for key, value in user_fields.items():
             setattr(db_user, key, value)
+        if user_fields:
+            # Sinxronizatsiya uchun: foydalanuvchi maydonlari ham doktorning o'zgarishi hisoblanadi
+            db_doctor.updated_at = func.now()
 
         db.commit()
         db.refresh(db_doctor)
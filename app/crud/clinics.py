@@ -1,52 +1,349 @@
-from sqlalchemy.orm import Session
-from app.models.clinics import Doctor, DoctorService, Patient, Appointment, PatientHistory, Billing
+from datetime import date
+from decimal import Decimal
+from typing import Iterable, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import func, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload
+from app.core import catalog, outbox
+from app.core.partitions import create_clinic_partitions
+from app.models.clinics import Clinic, Doctor, DoctorService, Patient, Appointment, PatientHistory, Billing, BillingItem
 from app.schemas.clinics import (
+    ClinicCreate,
     DoctorCreate, DoctorUpdate, 
     DoctorServiceCreate, DoctorServiceUpdate, 
     PatientCreate, PatientUpdate, 
     AppointmentCreate, AppointmentUpdate, 
     PatientHistoryCreate, PatientHistoryUpdate, 
-    BillingCreate, BillingUpdate
+    BillingCreate, BillingUpdate, BillingItemCreate
 )
-from app.crud.base import CRUDBase
+from app.crud.base import CRUDBase, sync_appointment_totals
+from app.crud.filters import EQUALITY_OPS, RANGE_OPS, build_order_by
 from app.crud.base import CRUDDoctor
 
 
 doctor_crud = CRUDDoctor(Doctor)
 
+# Clinic (tenant) uchun CRUD
+class CRUDClinic(CRUDBase[Clinic, ClinicCreate, ClinicCreate]):
+    def create(self, db: Session, obj_in: ClinicCreate):
+        clinic = Clinic(**obj_in.dict())
+        db.add(clinic)
+        db.flush()
+        create_clinic_partitions(db.connection(), clinic.id)
+        db.commit()
+        db.refresh(clinic)
+        return clinic
+
+    def ensure_clinic(self, db: Session, clinic_id: int, name: str = "Main"):
+        """
+        Filial mavjud bo'lmasa yaratadi (standart filial uchun).
+        """
+        clinic = db.get(Clinic, clinic_id)
+        if clinic is None:
+            clinic = Clinic(id=clinic_id, name=name)
+            db.add(clinic)
+            db.flush()
+            if db.bind.dialect.name == "postgresql":
+                # id qo'lda berilgani uchun sequence ni surib qo'yamiz
+                db.execute(text("SELECT setval(pg_get_serial_sequence('clinics', 'id'), (SELECT max(id) FROM clinics))"))
+            create_clinic_partitions(db.connection(), clinic_id)
+            db.commit()
+        return clinic
+
+
 # DoctorService uchun CRUD
 class CRUDDoctorService(CRUDBase[DoctorService, DoctorServiceCreate, DoctorServiceUpdate]):
+    filter_fields = {"doctor_id": EQUALITY_OPS, "service_name": EQUALITY_OPS, "price": RANGE_OPS}
+    sort_fields = {"id", "price", "service_name"}
+    facet_fields = {"doctor_id"}
+
+    def with_service_type(self, db: Session, values: dict, service_id: Optional[int] = None) -> dict:
+        """
+        service_name ni katalogdagi xizmat turiga bog'laydi va doktorda shu xizmat borligini
+        xotiradagi katalogdan tekshiradi (bazaga so'rovsiz).
+        """
+        clinic_id = self.tenant_fields(db).get("clinic_id")
+        if clinic_id is None or not (values.get("service_name") or values.get("doctor_id")):
+            return values
+        # Yangilashda berilmagan maydonlar xizmatning joriy qiymatlaridan olinadi
+        doctor_id, service_type_id = catalog.cache.service_key(clinic_id, service_id)
+        if values.get("service_name"):
+            service_type_id, name = catalog.cache.resolve(db, "service_types", clinic_id, values["service_name"])
+            values = {**values, "service_name": name, "service_type_id": service_type_id}
+        doctor_id = values.get("doctor_id") or doctor_id
+        if service_type_id is None:
+            return values
+        existing = catalog.cache.find_service(clinic_id, doctor_id, service_type_id)
+        if existing is not None and existing != service_id:
+            name = values.get("service_name")
+            detail = f"Service with name '{name}' already exists for this doctor." if name else "Service already exists for this doctor."
+            raise HTTPException(status_code=400, detail=detail)
+        return values
+
+    def create(self, db: Session, obj_in: DoctorServiceCreate):
+        values = self.with_service_type(db, obj_in.dict())
+        try:
+            return super().create(db, values)
+        except IntegrityError:
+            # Parallel so'rov shu xizmatni qo'shib ulgurdi (uq_doctor_services_clinic_doctor_type_live)
+            db.rollback()
+            raise HTTPException(status_code=400, detail="Service already exists for this doctor.")
+
+    def update_by_id(self, db: Session, id: int, obj_in: DoctorServiceUpdate, version: Optional[int] = None,
+                     exclude_unset: bool = True):
+        values = self.with_service_type(db, obj_in.dict(exclude_unset=exclude_unset), service_id=id)
+        try:
+            return super().update_by_id(db, id, values, version=version, exclude_unset=exclude_unset)
+        except IntegrityError:
+            db.rollback()
+            raise HTTPException(status_code=400, detail="Service already exists for this doctor.")
+
     def get_services_by_doctor(self, db: Session, doctor_id: int):
-        return db.query(DoctorService).filter(DoctorService.doctor_id == doctor_id).all()
+        return self.query(db).filter(DoctorService.doctor_id == doctor_id).all()
 
 
 # Patient uchun CRUD
 class CRUDPatient(CRUDBase[Patient, PatientCreate, PatientUpdate]):
+    filter_fields = {"first_name": EQUALITY_OPS, "phone": EQUALITY_OPS}
+    sort_fields = {"id", "first_name", "updated_at"}
+
     def get_patient_by_patient(self, db: Session, patient_id: str):
-        return db.query(Patient).filter(Patient.id == patient_id).first()
+        return self.query(db).filter(Patient.id == patient_id).first()
+
+    def get_timeline(self, db: Session, patient_id: int, skip: int = 0, limit: int = 20):
+        """
+        Bemor, uning tarixi va qabullari (doktor, xizmat, to'lov bilan) ikki so'rovda:
+        1) bemor + tarix, 2) qabullar sahifasi + barcha bog'liq yozuvlar JOIN orqali.
+        O'chirilgan tarix va billinglar JOIN shartida chiqarib tashlanadi.
+        """
+        patient = (
+            self.query(db)
+            .options(joinedload(Patient.history.and_(PatientHistory.deleted_at.is_(None))))
+            .filter(Patient.id == patient_id)
+            .first()
+        )
+        if patient is None:
+            return None
+        appointments = (
+            appointment_crud.query(db)
+            .options(
+                joinedload(Appointment.doctor).joinedload(Doctor.user),
+                joinedload(Appointment.service),
+                joinedload(Appointment.billing.and_(Billing.deleted_at.is_(None))),
+            )
+            .filter(Appointment.patient_id == patient_id)
+            .order_by(Appointment.appointment_date.desc(), Appointment.id.desc())
+            .offset(skip)
+            .limit(limit)
+            .all()
+        )
+        return {
+            "patient": patient,
+            "history": patient.history,
+            "appointments": appointments,
+            "skip": skip,
+            "limit": limit,
+        }
 
 
 # Appointment uchun CRUD
 class CRUDApartment(CRUDBase[Appointment, AppointmentCreate, AppointmentUpdate]):
-    def get_appointments_by_doctor(self, db: Session, doctor_id: int):
-        return db.query(Appointment).filter(Appointment.doctor_id == doctor_id).all()
+    created_event = "appointment.created"
+    filter_fields = {"doctor_id": EQUALITY_OPS, "patient_id": EQUALITY_OPS, "appointment_date": RANGE_OPS}
+    sort_fields = {"id", "appointment_date"}
+    facet_fields = {"doctor_id"}
+
+    def filter_dates(self, query, date_from: Optional[date] = None, date_to: Optional[date] = None):
+        """
+        Sana oralig'i bo'yicha filtr. appointments oy bo'yicha bo'lingani uchun
+        Postgres faqat kerakli oylik partitsiyalarni o'qiydi (partition pruning).
+        """
+        if date_from is not None:
+            query = query.filter(Appointment.appointment_date >= date_from)
+        if date_to is not None:
+            query = query.filter(Appointment.appointment_date <= date_to)
+        return query
+
+    def list_query_by_date(self, db: Session, filters: Optional[Iterable[Tuple[str, str]]] = None,
+                           date_from: Optional[date] = None, date_to: Optional[date] = None):
+        return self.filter_dates(self.list_query(db, filters), date_from, date_to)
+
+    def get_multi_by_date(self, db: Session, *, skip: int = 0, limit: int = 100,
+                          date_from: Optional[date] = None, date_to: Optional[date] = None,
+                          filters: Optional[Iterable[Tuple[str, str]]] = None, order_by: Optional[str] = None,
+                          options: Sequence = ()):
+        return (
+            self.list_query_by_date(db, filters, date_from, date_to)
+            .options(*options)
+            .order_by(*build_order_by(self.model, order_by, self.sort_fields))
+            .offset(skip)
+            .limit(limit)
+            .all()
+        )
 
-    def get_appointments_by_patient(self, db: Session, patient_id: int):
-        return db.query(Appointment).filter(Appointment.patient_id == patient_id).all()
+    def update_related(self, db: Session, obj: Appointment, values: dict):
+        # Qabul sanasi mavjud to'lovdan keyinga surilmaydi (to'lov qabuldan oldin bo'lmaydi)
+        if "appointment_date" in values:
+            billing = billing_crud.get_billing_by_appointment(db, obj.id)
+            if billing is not None and billing.payment_date < obj.appointment_date:
+                db.rollback()
+                raise HTTPException(status_code=400, detail="Appointment date cannot be after its payment date")
+
+    def get_appointments_by_doctor(self, db: Session, doctor_id: int,
+                                   date_from: Optional[date] = None, date_to: Optional[date] = None):
+        query = self.query(db).filter(Appointment.doctor_id == doctor_id)
+        return self.filter_dates(query, date_from, date_to).all()
+
+    def get_appointments_by_patient(self, db: Session, patient_id: int,
+                                    date_from: Optional[date] = None, date_to: Optional[date] = None):
+        query = self.query(db).filter(Appointment.patient_id == patient_id)
+        return self.filter_dates(query, date_from, date_to).all()
 
 
 # PatientHistory uchun CRUD
 class CRUDPatientHistory(CRUDBase[PatientHistory, PatientHistoryCreate, PatientHistoryUpdate]):
     def get_history_by_patient(self, db: Session, patient_id: int):
-        return db.query(PatientHistory).filter(PatientHistory.patient_id == patient_id).first()
+        return self.query(db).filter(PatientHistory.patient_id == patient_id).first()
 
 
 # Billing uchun CRUD
 class CRUDBilling(CRUDBase[Billing, BillingCreate, BillingUpdate]):
-    def get_billing_by_appointment(self, db: Session, appointment_id: int):
-        return db.query(Billing).filter(Billing.appointment_id == appointment_id).first()
+    created_event = "billing.created"
+    filter_fields = {"paid": {"eq", "ne"}, "payment_date": RANGE_OPS}
+    sort_fields = {"id", "payment_date"}
+    facet_fields = {"paid"}
+
+    def filter_dates(self, query, date_from: Optional[date] = None, date_to: Optional[date] = None):
+        # billings payment_date bo'yicha oylarga bo'lingan
+        if date_from is not None:
+            query = query.filter(Billing.payment_date >= date_from)
+        if date_to is not None:
+            query = query.filter(Billing.payment_date <= date_to)
+        return query
+
+    def list_query_by_date(self, db: Session, filters: Optional[Iterable[Tuple[str, str]]] = None,
+                           date_from: Optional[date] = None, date_to: Optional[date] = None):
+        return self.filter_dates(self.list_query(db, filters), date_from, date_to)
+
+    def get_multi_by_date(self, db: Session, *, skip: int = 0, limit: int = 100,
+                          date_from: Optional[date] = None, date_to: Optional[date] = None,
+                          filters: Optional[Iterable[Tuple[str, str]]] = None, order_by: Optional[str] = None,
+                          options: Sequence = ()):
+        return (
+            self.list_query_by_date(db, filters, date_from, date_to)
+            .options(*options)
+            .order_by(*build_order_by(self.model, order_by, self.sort_fields))
+            .offset(skip)
+            .limit(limit)
+            .all()
+        )
+
+    def get_billing_by_appointment(self, db: Session, appointment_id: int, date_from: Optional[date] = None):
+        # To'lov qabul sanasidan oldin bo'lmaydi (create_for_appointment tekshiradi): date_from sifatida
+        # appointment sanasini berish partitsiyalarni qisqartiradi
+        query = self.query(db).filter(Billing.appointment_id == appointment_id)
+        return self.filter_dates(query, date_from).first()
+
+    def create_for_appointment(self, db: Session, obj_in: BillingCreate):
+        """
+        Hisob-kitobni serverda hisoblaydi: qatorlar berilmasa qabul xizmatining narxi olinadi,
+        narxsiz qatorlar DoctorService.price dan to'ldiriladi. Billing, uning qatorlari va
+        qabuldagi billed_total/paid_total bitta tranzaksiyada yoziladi.
+        """
+        tenant = self.tenant_fields(db)
+        # Qabul qatori qulflanadi: parallel so'rovlar ikkinchi billing yarata olmaydi (One-to-One)
+        appointment = (
+            appointment_crud.query(db).filter(Appointment.id == obj_in.appointment_id).with_for_update().first()
+        )
+        if appointment is None:
+            raise HTTPException(status_code=404, detail="Appointment not found")
+        if obj_in.payment_date is not None and obj_in.payment_date < appointment.appointment_date:
+            raise HTTPException(status_code=400, detail="Payment date cannot be before the appointment date")
+        # Sanasiz: eski (tekshiruvdan oldingi) billinglar ham topilsin; ix_billings_appointment_id ishlatiladi
+        if self.get_billing_by_appointment(db, appointment.id) is not None:
+            raise HTTPException(status_code=400, detail="Billing already exists for this appointment")
+        items = obj_in.items or [BillingItemCreate(service_id=appointment.service_id)]
+
+        # Narxi kerak bo'lgan xizmatlar bitta so'rovda olinadi
+        service_ids = {item.service_id for item in items if item.unit_price is None}
+        if None in service_ids:
+            raise HTTPException(status_code=400, detail="Item needs either service_id or unit_price")
+        services = {
+            service.id: service
+            for service in doctor_service_crud.query(db).filter(DoctorService.id.in_(service_ids))
+        } if service_ids else {}
+
+        billing_items = []
+        for item in items:
+            service = services.get(item.service_id)
+            if item.unit_price is None and (service is None or service.price is None):
+                raise HTTPException(status_code=400, detail=f"Service {item.service_id} has no price")
+            unit_price = Decimal(str(item.unit_price)) if item.unit_price is not None else service.price
+            discount = Decimal(str(item.discount))
+            amount = unit_price * item.quantity - discount
+            if amount < 0:
+                raise HTTPException(status_code=400, detail="Discount exceeds item amount")
+            billing_items.append(BillingItem(
+                **tenant, service_id=item.service_id, quantity=item.quantity, unit_price=unit_price,
+                discount=discount, amount=amount,
+                description=item.description or (service.service_name if service is not None else None),
+            ))
+
+        subtotal = sum((item.amount for item in billing_items), Decimal("0"))
+        discount = Decimal(str(obj_in.discount))
+        if discount > subtotal:
+            raise HTTPException(status_code=400, detail="Discount exceeds billing subtotal")
+        billing = Billing(
+            **tenant, appointment_id=appointment.id, subtotal=subtotal, discount=discount,
+            total_amount=subtotal - discount, paid=obj_in.paid,
+            payment_date=obj_in.payment_date or appointment.appointment_date,
+            items=billing_items,
+        )
+        db.add(billing)
+        db.flush()
+        # Qabul yig'indilari atomar oshiriladi (sana partitsiyani aniqlaydi)
+        db.execute(
+            update(Appointment)
+            .where(Appointment.id == appointment.id, Appointment.appointment_date == appointment.appointment_date)
+            .values(
+                billed_total=Appointment.billed_total + billing.total_amount,
+                paid_total=Appointment.paid_total + (billing.total_amount if billing.paid else 0),
+            ),
+            execution_options={"synchronize_session": False},
+        )
+        outbox.enqueue(db, self.created_event, {"id": billing.id, **tenant})
+        db.commit()
+        db.refresh(billing)
+        return billing
+
+    def update_related(self, db: Session, obj: Billing, values: dict):
+        # To'lov sanasi qabuldan oldin bo'lmaydi; to'lov holati qabuldagi paid_total ga ta'sir qiladi
+        if "payment_date" in values:
+            appointment_date = (
+                db.query(Appointment.appointment_date).filter(Appointment.id == obj.appointment_id).scalar()
+            )
+            if appointment_date is not None and obj.payment_date < appointment_date:
+                db.rollback()
+                raise HTTPException(status_code=400, detail="Payment date cannot be before the appointment date")
+        if "paid" in values:
+            sync_appointment_totals(db, [obj.appointment_id])
+
+    def revenue(self, db: Session, date_from: Optional[date] = None, date_to: Optional[date] = None):
+        """
+        Davr bo'yicha tushum: faqat billings dagi tayyor summalar yig'iladi, join kerak emas.
+        """
+        query = self.filter_dates(self.query(db), date_from, date_to).with_entities(
+            func.count(Billing.id),
+            func.coalesce(func.sum(Billing.total_amount), 0),
+            func.coalesce(func.sum(Billing.total_amount).filter(Billing.paid.is_(True)), 0),
+        )
+        count, billed, paid = query.one()
+        return {"billings": count, "billed": billed, "paid": paid}
 
 
+clinic_crud = CRUDClinic(Clinic)
 doctor_service_crud = CRUDDoctorService(DoctorService)
 patient_crud = CRUDPatient(Patient)
 appointment_crud = CRUDApartment(Appointment)
@@ -0,0 +1,143 @@
+import re
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from typing import Iterable, List, Mapping, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import Boolean, Date, DateTime, Enum, Integer, Numeric, inspect
+
+# Ro'yxat endpointlarida filtr sifatida talqin qilinmaydigan parametrlar
+RESERVED_PARAMS = {"skip", "limit", "order_by", "date_from", "date_to", "total", "facets", "fields"}
+
+OPERATORS = {
+    "eq": lambda column, value: column == value,
+    "ne": lambda column, value: column != value,
+    "lt": lambda column, value: column < value,
+    "lte": lambda column, value: column <= value,
+    "gt": lambda column, value: column > value,
+    "gte": lambda column, value: column >= value,
+    "in": lambda column, value: column.in_(value),
+    "isnull": lambda column, value: column.is_(None) if value else column.isnot(None),
+}
+# CRUD larda ruxsat etilgan operatorlar to'plamlari
+EQUALITY_OPS = {"eq", "ne", "in", "isnull"}
+RANGE_OPS = {"eq", "ne", "lt", "lte", "gt", "gte", "in"}
+
+
+def _bad_request(detail: str):
+    return HTTPException(status_code=400, detail=detail)
+
+
+def _parse_bool(value: str) -> bool:
+    lowered = value.lower()
+    if lowered in ("true", "1", "yes"):
+        return True
+    if lowered in ("false", "0", "no"):
+        return False
+    raise ValueError(value)
+
+
+def coerce(column, value: str):
+    """
+    Query parametridagi matnni ustun turiga o'giradi.
+    """
+    column_type = column.type
+    if isinstance(column_type, Boolean):
+        return _parse_bool(value)
+    if isinstance(column_type, Enum):
+        return column_type.python_type(value)
+    if isinstance(column_type, Integer):
+        return int(value)
+    if isinstance(column_type, Numeric):
+        return Decimal(value)
+    if isinstance(column_type, DateTime):
+        return datetime.fromisoformat(value)
+    if isinstance(column_type, Date):
+        return date.fromisoformat(value)
+    return value
+
+
+def build_filters(model, params: Iterable[Tuple[str, str]], allowed: Mapping[str, set]) -> list:
+    """
+    `field__op=value` ko'rinishidagi parametrlarni SQL shartlariga aylantiradi.
+    Faqat `allowed` dagi maydon va operatorlar qabul qilinadi ({maydon: {operatorlar}}).
+    """
+    criteria = []
+    for key, raw in params:
+        if key in RESERVED_PARAMS:
+            continue
+        field, _, op = key.partition("__")
+        op = op or "eq"
+        if field not in allowed or op not in allowed[field]:
+            raise _bad_request(f"Filtering by '{key}' is not supported")
+        column = getattr(model, field)
+        try:
+            if op == "isnull":
+                value = _parse_bool(raw)
+            elif op == "in":
+                value = [coerce(column, item) for item in raw.split(",") if item != ""]
+            else:
+                value = coerce(column, raw)
+        except (ValueError, InvalidOperation):
+            raise _bad_request(f"Invalid value for '{key}': {raw}")
+        criteria.append(OPERATORS[op](column, value))
+    return criteria
+
+
+def has_filters(params: Iterable[Tuple[str, str]]) -> bool:
+    return any(key not in RESERVED_PARAMS for key, _ in params)
+
+
+def build_order_by(model, order_by: str, allowed: set) -> list:
+    """
+    "-price,service_name" -> [price DESC, service_name ASC]. Oxirida id qo'shiladi (barqaror sahifalash).
+    """
+    ordering, fields = [], set()
+    for item in (order_by or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        field = item.lstrip("-")
+        if field not in allowed:
+            raise _bad_request(f"Sorting by '{field}' is not supported")
+        column = getattr(model, field)
+        ordering.append(column.desc() if item.startswith("-") else column.asc())
+        fields.add(field)
+    if "id" not in fields:
+        ordering.append(model.id.asc())
+    return ordering
+
+
+def indexed_columns(model) -> set:
+    """
+    Indeks bilan qo'llab-quvvatlanadigan ustunlar: indeksning birinchi ustuni, tenant
+    (clinic_id) dan keyingi ustun va qisman indeks shartida ishtirok etgan ustunlar.
+    """
+    table = inspect(model).local_table
+    columns = {column.name for column in table.primary_key.columns}
+    for column in table.columns:
+        if column.index or column.unique:
+            columns.add(column.name)
+    for index in table.indexes:
+        names = [column.name for column in index.columns]
+        if names:
+            columns.add(names[0])
+        if len(names) > 1 and names[0] == "clinic_id":
+            columns.add(names[1])
+        where = index.dialect_options["postgresql"].get("where")
+        if where is not None:
+            columns.update(column.name for column in table.columns if re.search(rf"\b{column.name}\b", str(where)))
+    return columns
+
+
+def index_advisor(crud) -> List[str]:
+    """
+    CRUD ning ruxsat etilgan filtr/saralash maydonlaridan indeks bilan qo'llab-quvvatlanmaganlari.
+    """
+    model = crud.model
+    indexed = indexed_columns(model)
+    warnings = []
+    for field in sorted(set(crud.filter_fields) | set(crud.sort_fields)):
+        if field not in indexed:
+            warnings.append(f"{model.__tablename__}.{field} is filterable/sortable but not indexed")
+    return warnings
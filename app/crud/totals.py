@@ -0,0 +1,109 @@
+import json
+
+from fastapi import HTTPException
+from sqlalchemy import func, text
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from app.core.partitions import TENANT_PARTITIONED_TABLES
+
+# Filial bo'laklari (LIST partitsiyalar) bo'yicha statistikadan taxminiy son
+PARTITION_ESTIMATE = text(
+    "SELECT sum(c.reltuples) FROM pg_partition_tree(CAST(:table AS regclass)) t "
+    "JOIN pg_class c ON c.oid = t.relid "
+    "WHERE t.isleaf AND c.relname LIKE :pattern"
+)
+
+
+class Explain(Executable, ClauseElement):
+    """
+    `EXPLAIN (FORMAT JSON) <so'rov>` SQLAlchemy orqali bajariladi: IN (...) kabi kengaytiriladigan
+    parametrlar va tiplarning bind konvertatsiyasi oddiy so'rovdagidek ishlaydi.
+    """
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain)
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+def exact_count(query) -> int:
+    return query.order_by(None).with_entities(func.count()).scalar()
+
+
+def estimate_count(db, query, model=None, filtered: bool = True) -> int:
+    """
+    Taxminiy son, jadvalni o'qimasdan: filtrsiz filial so'rovida partitsiyalarning
+    pg_class.reltuples yig'indisi, aks holda rejalashtiruvchining (EXPLAIN) baholashi.
+    Postgres bo'lmasa aniq son qaytariladi.
+    """
+    conn = db.connection()
+    if conn.dialect.name != "postgresql":
+        return exact_count(query)
+    clinic_id = db.info.get("clinic_id")
+    if not filtered and model is not None and model.__tablename__ in TENANT_PARTITIONED_TABLES and clinic_id is not None:
+        estimate = conn.execute(PARTITION_ESTIMATE, {
+            "table": model.__tablename__,
+            "pattern": f"%\\_clinic\\_{int(clinic_id)}",
+        }).scalar()
+        # reltuples = -1: partitsiya hali ANALYZE qilinmagan
+        if estimate is not None and estimate >= 0:
+            return int(estimate)
+    plan = conn.execute(Explain(query.order_by(None).statement)).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def facet_counts(db, query, model, fields: list) -> dict:
+    """
+    Har bir maydon qiymati bo'yicha sonlar: {maydon: {qiymat: son}}. Postgresda barcha
+    maydonlar bitta so'rovda (GROUPING SETS) hisoblanadi.
+    """
+    query = query.order_by(None)
+    columns = [getattr(model, field) for field in fields]
+    facets = {field: {} for field in fields}
+    if db.connection().dialect.name == "postgresql" and len(columns) > 1:
+        rows = query.with_entities(
+            *columns, *[func.grouping(column) for column in columns], func.count()
+        ).group_by(func.grouping_sets(*columns)).all()
+        for row in rows:
+            values, grouping, count = row[:len(fields)], row[len(fields):-1], row[-1]
+            # grouping() = 0 bo'lgan ustun shu qatorda guruhlangan
+            index = list(grouping).index(0)
+            facets[fields[index]][_key(values[index])] = count
+        return facets
+    for field, column in zip(fields, columns):
+        for value, count in query.with_entities(column, func.count()).group_by(column).all():
+            facets[field][_key(value)] = count
+    return facets
+
+
+def _key(value) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(getattr(value, "value", value))
+
+
+def list_totals(db, crud, query, total: str = None, facets: str = None, filtered: bool = True) -> dict:
+    """
+    Ro'yxat uchun qo'shimcha ma'lumot, faqat so'ralganda: total=exact|estimate, facets=a,b.
+    """
+    meta = {}
+    if total == "exact":
+        meta["total"], meta["estimated"] = exact_count(query), False
+    elif total == "estimate":
+        meta["total"], meta["estimated"] = estimate_count(db, query, crud.model, filtered), True
+    if facets:
+        fields = [field.strip() for field in facets.split(",") if field.strip()]
+        unknown = [field for field in fields if field not in crud.facet_fields]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Facets not supported: {', '.join(unknown)}")
+        meta["facets"] = facet_counts(db, query, crud.model, fields)
+    return meta
@@ -1,10 +1,19 @@
 from app.models.user import User
 from app.schemas.user import UserCreate, UserResponse
 from app.crud.base import CRUDBase
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
 
 class CRUDUser(CRUDBase[User, UserCreate, UserResponse]):
+    def filters(self, db: Session) -> list:
+        # Filialga biriktirilmagan (global) foydalanuvchilar har bir filialda ko'rinadi
+        criteria = [User.deleted_at.is_(None)]
+        clinic_id = db.info.get("clinic_id")
+        if clinic_id is not None:
+            criteria.append(or_(User.clinic_id == clinic_id, User.clinic_id.is_(None)))
+        return criteria
+
     def get_user_by_username(self, db: Session, username: str) -> User | None:
-        return db.query(User).filter(User.username == username).first()
+        return db.query(User).filter(User.username == username, User.deleted_at.is_(None)).first()
 
 user_crud = CRUDUser(User)
\ No newline at end of file
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, BigInteger, Integer, String, DateTime, JSON, Index
+from app.database import Base
+
+
+# AuditLog Model - faqat qo'shiladigan (append-only), oy bo'yicha bo'lingan o'zgarishlar jurnali
+class AuditLog(Base):
+    __tablename__ = "audit_log"
+    __table_args__ = (
+        Index("ix_audit_log_entity", "entity", "entity_id", "occurred_at"),
+        Index("ix_audit_log_actor", "actor_id", "occurred_at"),
+    )
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    occurred_at = Column(DateTime(timezone=True), nullable=False)  # Partitsiya kaliti
+    entity = Column(String, nullable=False)  # Jadval nomi, masalan "patients"
+    entity_id = Column(Integer, nullable=False)
+    action = Column(String, nullable=False)  # create / update / delete
+    actor_id = Column(Integer, nullable=True)
+    clinic_id = Column(Integer, nullable=True)
+    changes = Column(JSON, nullable=False)  # {"ustun": [eski, yangi]}
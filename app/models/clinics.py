@@ -1,16 +1,63 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Date, Boolean, Text, Float, Numeric
+from sqlalchemy import Column, Integer, String, ForeignKey, Date, DateTime, Boolean, Text, Float, Numeric, Index, func, text
 from sqlalchemy.orm import relationship
 from app.database import Base
 import re
 from sqlalchemy.orm import validates
 
 
+# Clinic (filial) Model - tenant
+class Clinic(Base):
+    __tablename__ = "clinics"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, unique=True, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+
+
+# Katalog: mutaxassisliklar va xizmat turlari (filial bo'yicha, nom registrga qaramay unikal)
+class Specialization(Base):
+    __tablename__ = "specializations"
+    __table_args__ = (
+        Index("uq_specializations_clinic_name", "clinic_id", func.lower(text("name")), unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    clinic_id = Column(Integer, ForeignKey("clinics.id"), nullable=False)
+    name = Column(String(100), nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+
+
+class ServiceType(Base):
+    __tablename__ = "service_types"
+    __table_args__ = (
+        Index("uq_service_types_clinic_name", "clinic_id", func.lower(text("name")), unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    clinic_id = Column(Integer, ForeignKey("clinics.id"), nullable=False)
+    name = Column(String, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+
+
 # Doctor Model
 class Doctor(Base):
     __tablename__ = "doctors"
+    __table_args__ = (
+        Index("ix_doctors_clinic_live", "clinic_id", "id", postgresql_where=text("deleted_at IS NULL")),
+        Index("ix_doctors_clinic_updated", "clinic_id", "updated_at", "id"),  # /clinic/changes uchun
+        Index("ix_doctors_clinic_specialization", "clinic_id", "specialization"),
+    )
 
     id = Column(Integer, ForeignKey("users.id"), primary_key=True)
-    specialization = Column(String, nullable=False)
+    clinic_id = Column(Integer, ForeignKey("clinics.id"), nullable=False, index=True)
+    deleted_at = Column(DateTime(timezone=True), nullable=True)  # Soft delete
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+    specialization = Column(String, nullable=False)  # Katalogdagi nom (ro'yxat va filtrlar uchun)
+    specialization_id = Column(Integer, ForeignKey("specializations.id"), nullable=True, index=True)
 
     # Bog'lanish
     user = relationship("User", back_populates="doctor_profile")  # One-to-One
@@ -20,10 +67,27 @@ class Doctor(Base):
 
 class DoctorService(Base):
     __tablename__ = "doctor_services"
+    __table_args__ = (
+        Index("ix_doctor_services_clinic_live", "clinic_id", "id", postgresql_where=text("deleted_at IS NULL")),
+        Index("ix_doctor_services_clinic_updated", "clinic_id", "updated_at", "id"),  # /clinic/changes uchun
+        # Doktor xizmatlari ro'yxati (?fields=id,service_name,price) jadvalga murojaatsiz o'qiladi
+        Index("ix_doctor_services_clinic_doctor_covering", "clinic_id", "doctor_id",
+              postgresql_include=["id", "service_name", "price", "deleted_at"]),
+        Index("ix_doctor_services_clinic_price", "clinic_id", "price"),
+        # Doktorda bir turdagi xizmat bittadan (katalog keshidagi tekshiruvni parallel so'rovlar chetlab o'tmasligi uchun)
+        Index("uq_doctor_services_clinic_doctor_type_live", "clinic_id", "doctor_id", "service_type_id", unique=True,
+              postgresql_where=text("deleted_at IS NULL"), sqlite_where=text("deleted_at IS NULL")),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    doctor_id = Column(Integer, ForeignKey("doctors.id"))
-    service_name = Column(String, index=True)
+    clinic_id = Column(Integer, ForeignKey("clinics.id"), nullable=False, index=True)
+    deleted_at = Column(DateTime(timezone=True), nullable=True)  # Soft delete
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+    version = Column(Integer, nullable=False, default=1, server_default="1")  # Optimistic concurrency (ETag)
+    doctor_id = Column(Integer, ForeignKey("doctors.id"), index=True)
+    service_name = Column(String, index=True)  # Katalogdagi nom
+    service_type_id = Column(Integer, ForeignKey("service_types.id"), nullable=True, index=True)
     price = Column(Numeric(10, 2))
 
     # Bog'lanish
@@ -34,11 +98,23 @@ class DoctorService(Base):
 # Patient Model
 class Patient(Base):
     __tablename__ = "patients"
+    __table_args__ = (
+        # Telefon filial ichida faqat o'chirilmagan bemorlar orasida unikal
+        Index("uq_patients_clinic_phone", "clinic_id", "phone", unique=True,
+              postgresql_where=text("deleted_at IS NULL"), sqlite_where=text("deleted_at IS NULL")),
+        Index("ix_patients_clinic_live", "clinic_id", "id", postgresql_where=text("deleted_at IS NULL")),
+        Index("ix_patients_clinic_updated", "clinic_id", "updated_at", "id"),  # /clinic/changes uchun
+    )
 
     id = Column(Integer, primary_key=True, index=True)
+    clinic_id = Column(Integer, ForeignKey("clinics.id"), nullable=False, index=True)
+    deleted_at = Column(DateTime(timezone=True), nullable=True)  # Soft delete
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+    version = Column(Integer, nullable=False, default=1, server_default="1")  # Optimistic concurrency (ETag)
     first_name = Column(String, index=True, nullable=False)
     last_name = Column(String)    
-    phone = Column(String, unique=True, index=True, nullable=False)
+    phone = Column(String, index=True, nullable=False)
     email = Column(String)
     date_of_birth = Column(Date, nullable=True)
 
@@ -55,20 +131,38 @@ class Patient(Base):
 # Appointment Model
 class Appointment(Base):
     __tablename__ = "appointments"
+    __table_args__ = (
+        Index("ix_appointments_clinic_live", "clinic_id", "id", postgresql_where=text("deleted_at IS NULL")),
+        # Kalendar proyeksiyalari (doktor/bemor bo'yicha, sana oralig'ida) index-only scan bilan
+        Index("ix_appointments_clinic_doctor_date_covering", "clinic_id", "doctor_id", "appointment_date",
+              postgresql_include=["id", "patient_id", "service_id", "deleted_at"]),
+        Index("ix_appointments_clinic_patient_date_covering", "clinic_id", "patient_id", "appointment_date",
+              postgresql_include=["id", "doctor_id", "service_id", "deleted_at"]),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    patient_id = Column(Integer, ForeignKey("patients.id"))
-    doctor_id = Column(Integer, ForeignKey("doctors.id"))
-    service_id = Column(Integer, ForeignKey("doctor_services.id"))
-    appointment_date = Column(Date)
+    clinic_id = Column(Integer, ForeignKey("clinics.id"), nullable=False, index=True)
+    deleted_at = Column(DateTime(timezone=True), nullable=True)  # Soft delete
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+    version = Column(Integer, nullable=False, default=1, server_default="1")  # Optimistic concurrency (ETag)
+    # Tashqi kalit indekslari: CASCADES va bog'langan yozuv o'chirilganda filialsiz qidiruvlar uchun
+    patient_id = Column(Integer, ForeignKey("patients.id"), index=True)
+    doctor_id = Column(Integer, ForeignKey("doctors.id"), index=True)
+    service_id = Column(Integer, ForeignKey("doctor_services.id"), index=True)
+    appointment_date = Column(Date, nullable=False, index=True)  # Partitsiya kaliti
     notes = Column(Text, nullable=True)
+    # Hisob-kitoblar yig'indisi: billing yaratilganda, to'lov holati o'zgarganda va o'chirilganda
+    # shu tranzaksiyada yangilanadi
+    billed_total = Column(Numeric(10, 2), nullable=False, default=0, server_default="0")
+    paid_total = Column(Numeric(10, 2), nullable=False, default=0, server_default="0")
 
     # Bog'lanishlar
     patient = relationship("Patient", back_populates="appointments")  # Many-to-One
     doctor = relationship("Doctor", back_populates="appointments")  # Many-to-One
     service = relationship("DoctorService", back_populates="appointments")  # Many-to-One
     billing = relationship("Billing", back_populates="appointment", uselist=False)  # One-to-One
-    created_by_id = Column(Integer, ForeignKey("users.id"))
+    created_by_id = Column(Integer, ForeignKey("users.id"), index=True)
 
     # Relationship
     created_by = relationship("User", back_populates="created_appointments")
@@ -76,9 +170,19 @@ class Appointment(Base):
 # PatientHistory Model
 class PatientHistory(Base):
     __tablename__ = "patient_histories"
+    __table_args__ = (
+        Index("ix_patient_histories_clinic_live", "clinic_id", "id", postgresql_where=text("deleted_at IS NULL")),
+        # One-to-One: bemorda bitta amaldagi tarix
+        Index("uq_patient_histories_patient_live", "patient_id", unique=True,
+              postgresql_where=text("deleted_at IS NULL"), sqlite_where=text("deleted_at IS NULL")),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    patient_id = Column(Integer, ForeignKey("patients.id"))
+    clinic_id = Column(Integer, ForeignKey("clinics.id"), nullable=False, index=True)
+    deleted_at = Column(DateTime(timezone=True), nullable=True)  # Soft delete
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+    patient_id = Column(Integer, ForeignKey("patients.id"), index=True)
     medical_history = Column(Text, nullable=True)
     
 
@@ -89,12 +193,51 @@ class PatientHistory(Base):
 # Billing Model
 class Billing(Base):
     __tablename__ = "billings"
+    __table_args__ = (
+        Index("ix_billings_clinic_live", "clinic_id", "id", postgresql_where=text("deleted_at IS NULL")),
+        # Davr bo'yicha ro'yxat va tushum (revenue) jadvalga murojaatsiz o'qiladi
+        Index("ix_billings_clinic_payment_date_covering", "clinic_id", "payment_date",
+              postgresql_include=["id", "appointment_id", "total_amount", "paid", "deleted_at"]),
+        # To'lanmagan hisob-kitoblar (?paid=false) kichik qisman indeksdan o'qiladi
+        Index("ix_billings_unpaid", "clinic_id", "payment_date", postgresql_where=text("paid = false")),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    appointment_id = Column(Integer, ForeignKey("appointments.id"))
-    total_amount = Column(Numeric(10, 2))
+    clinic_id = Column(Integer, ForeignKey("clinics.id"), nullable=False, index=True)
+    deleted_at = Column(DateTime(timezone=True), nullable=True)  # Soft delete
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+    # Partitsiyalangan jadvalda unikal indeks partitsiya kalitlarini o'z ichiga olishi shart,
+    # shuning uchun "bitta qabulga bitta billing" create_for_appointment da tekshiriladi
+    # Postgresda bu tashqi kalit yo'q (appointments partitsiyalangan): faqat ORM bog'lanishi uchun
+    appointment_id = Column(Integer, ForeignKey("appointments.id"), index=True)
+    subtotal = Column(Numeric(10, 2))
+    discount = Column(Numeric(10, 2), nullable=False, default=0, server_default="0")
+    total_amount = Column(Numeric(10, 2))  # subtotal - discount, serverda hisoblanadi
     paid = Column(Boolean, default=False)
-    payment_date = Column(Date, nullable=False)
+    payment_date = Column(Date, nullable=False)  # Partitsiya kaliti
 
     # Bog'lanish
     appointment = relationship("Appointment", back_populates="billing")  # One-to-One
+    items = relationship("BillingItem", back_populates="billing")  # One-to-Many
+
+
+# BillingItem Model - hisob-kitob qatorlari
+class BillingItem(Base):
+    __tablename__ = "billing_items"
+
+    id = Column(Integer, primary_key=True, index=True)
+    clinic_id = Column(Integer, ForeignKey("clinics.id"), nullable=False, index=True)
+    deleted_at = Column(DateTime(timezone=True), nullable=True)  # Soft delete
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+    billing_id = Column(Integer, ForeignKey("billings.id"), nullable=False, index=True)
+    service_id = Column(Integer, ForeignKey("doctor_services.id"), nullable=True, index=True)
+    description = Column(String)
+    quantity = Column(Integer, nullable=False, default=1)
+    unit_price = Column(Numeric(10, 2), nullable=False)
+    discount = Column(Numeric(10, 2), nullable=False, default=0)
+    amount = Column(Numeric(10, 2), nullable=False)  # quantity * unit_price - discount
+
+    # Bog'lanish
+    billing = relationship("Billing", back_populates="items")  # Many-to-One
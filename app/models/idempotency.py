@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, String, DateTime, JSON, LargeBinary, Index, func
+from app.database import Base
+
+
+# IdempotencyKey Model - Idempotency-Key sarlavhali POST so'rovlarning saqlangan javoblari
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        Index("ix_idempotency_keys_expires_at", "expires_at"),
+    )
+
+    key = Column(String, primary_key=True)  # "clinic_id:user_id:kalit"
+    request_hash = Column(String(64), nullable=False)  # metod, yo'l va tana sha256
+    status_code = Column(Integer, nullable=True)  # None - so'rov hali bajarilmoqda
+    response_headers = Column(JSON, nullable=True)
+    response_body = Column(LargeBinary, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False)
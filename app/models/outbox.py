@@ -0,0 +1,20 @@
+from sqlalchemy import Column, BigInteger, Integer, String, Text, DateTime, JSON, Index, func, text
+from app.database import Base
+
+
+# Outbox Model - tranzaksiya bilan birga yoziladigan, keyin worker bajaradigan hodisalar
+class OutboxEvent(Base):
+    __tablename__ = "outbox_events"
+    __table_args__ = (
+        # Worker faqat bajarilmagan hodisalarni o'qiydi
+        Index("ix_outbox_events_pending", "available_at", "id", postgresql_where=text("processed_at IS NULL")),
+    )
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    topic = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    available_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    processed_at = Column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, String, DateTime, func
+from app.database import Base
+
+
+# ReminderDelivery Model - har bir eslatma bir marta yuborilishi uchun idempotency kalitlari
+class ReminderDelivery(Base):
+    __tablename__ = "reminder_deliveries"
+
+    id = Column(Integer, primary_key=True)
+    idempotency_key = Column(String, unique=True, nullable=False)
+    appointment_id = Column(Integer, nullable=False, index=True)
+    channel = Column(String, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    sent_at = Column(DateTime(timezone=True), nullable=True)
@@ -1,5 +1,5 @@
 # app/models/user.py
-from sqlalchemy import Column, Integer, String, Enum
+from sqlalchemy import Column, Integer, String, Enum, ForeignKey, DateTime, Index, func
 from app.database import Base
 from sqlalchemy.orm import Session
 from sqlalchemy.orm import relationship
@@ -17,6 +17,9 @@ class RoleEnum(str, enum.Enum):
 # User Model
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        Index("ix_users_clinic_updated", "clinic_id", "updated_at", "id"),  # /clinic/changes uchun
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String, unique=True, index=True, nullable=False)
@@ -26,6 +29,11 @@ class User(Base):
     last_name = Column(String)
     password = Column(String, nullable=False)
     role = Column(Enum(RoleEnum), default=RoleEnum.reception) 
+    clinic_id = Column(Integer, ForeignKey("clinics.id"), nullable=True, index=True)  # Foydalanuvchi ishlaydigan filial
+    deleted_at = Column(DateTime(timezone=True), nullable=True)  # Soft delete
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+    version = Column(Integer, nullable=False, default=1, server_default="1")  # Optimistic concurrency (ETag)
 
     # Bog'lanish
     created_appointments = relationship("Appointment", back_populates="created_by")  # Reception tomonidan yaratilgan appointmentlar
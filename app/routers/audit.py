@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from app.core.audit import query_audit_log
+from app.core.dependencies import require_admin
+from app.database import get_db
+from app.schemas.audit import AuditLogResponse
+
+router = APIRouter()
+
+
+# Obyekt yoki foydalanuvchi bo'yicha o'zgarishlar tarixi
+@router.get("/", response_model=List[AuditLogResponse], dependencies=[Depends(require_admin)])
+def get_audit_log(
+    entity: Optional[str] = None,
+    entity_id: Optional[int] = None,
+    actor_id: Optional[int] = None,
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+):
+    return query_audit_log(db, entity=entity, entity_id=entity_id, actor_id=actor_id, skip=skip, limit=limit)
@@ -1,23 +1,39 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+import asyncio
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from datetime import date
+from typing import List, Optional
 
 from app.core.auth import hash_password
+from app.core.catalog import cache as catalog_cache
+from app.core.config import settings
+from app.core.dependencies import require_admin
+from app.core.etag import if_match, set_etag
+from app.core.fields import load_options, parse_fields, sparse_response
+from app.core.listing import TotalMode, set_list_headers
+from app.crud.filters import has_filters
+from app.core.stream import Subscriber, broker
+from app.services.sync import get_changes
 from app.database import get_db
 from app.models.user import User
 from app.models.clinics import Doctor
-from app.models.clinics import Patient, DoctorService
+from app.models.clinics import Patient, DoctorService, Appointment, Billing
 
 from app.schemas.clinics import (
+    ClinicCreate, ClinicResponse,
     DoctorCreate, DoctorUpdate, DoctorResponse,
     DoctorServiceCreate, DoctorServiceUpdate, DoctorServiceResponse,
     PatientCreate, PatientUpdate, PatientResponse,
     AppointmentCreate, AppointmentUpdate, AppointmentResponse,
     PatientHistoryCreate, PatientHistoryUpdate, PatientHistoryResponse,
-    BillingCreate, BillingUpdate, BillingResponse
+    BillingCreate, BillingUpdate, BillingResponse, BillingDetailResponse, RevenueResponse,
+    PatientTimelineResponse, ChangesResponse, CatalogItemResponse,
 )
 from app.crud.clinics import (
-    doctor_crud, doctor_service_crud, patient_crud, 
+    clinic_crud, doctor_crud, doctor_service_crud, patient_crud, 
     appointment_crud, patient_history_crud, billing_crud
 )
 
@@ -25,6 +41,18 @@ router = APIRouter()
 
 #-----------------------------------------------------------------------------------------------------
 
+# Clinic (filial) endpoints
+@router.post("/clinics/", response_model=ClinicResponse, status_code=status.HTTP_201_CREATED,
+             dependencies=[Depends(require_admin)])
+def create_clinic(clinic: ClinicCreate, db: Session = Depends(get_db)):
+    return clinic_crud.create(db=db, obj_in=clinic)
+
+@router.get("/clinics/", response_model=List[ClinicResponse])
+def get_clinics(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
+    return clinic_crud.get_multi(db=db, skip=skip, limit=limit)
+
+#-----------------------------------------------------------------------------------------------------
+
 # doctor create
 @router.post("/doctors/", response_model=DoctorResponse)
 def create_doctor(doctor_data: DoctorCreate, db: Session = Depends(get_db)):
@@ -60,8 +88,19 @@ def create_doctor(doctor_data: DoctorCreate, db: Session = Depends(get_db)):
     return doctor
 
 @router.get("/doctors/", response_model=List[DoctorResponse])
-def get_doctors(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    return doctor_crud.get_multi(db=db, skip=skip, limit=limit)
+def get_doctors(request: Request, response: Response, skip: int = 0, limit: int = 10, order_by: Optional[str] = None,
+                total: Optional[TotalMode] = None, facets: Optional[str] = None, fields: Optional[str] = None,
+                db: Session = Depends(get_db)):
+    # Qolgan query parametrlari filtr sifatida: ?field=value, ?field__gte=value
+    filters = request.query_params.multi_items()
+    if total or facets:
+        set_list_headers(response, doctor_crud.list_totals(db, doctor_crud.list_query(db, filters), total, facets,
+                                                           filtered=has_filters(filters)))
+    # ?fields=id,user.first_name - faqat shu ustunlar o'qiladi va qaytariladi
+    fieldset = parse_fields(fields, DoctorResponse)
+    items = doctor_crud.get_multi(db=db, skip=skip, limit=limit, filters=filters, order_by=order_by,
+                                  options=load_options(Doctor, fieldset))
+    return sparse_response(response, items, fieldset)
 
 @router.get("/doctors/{doctor_id}", response_model=DoctorResponse)
 def get_doctor(doctor_id: int, db: Session = Depends(get_db)):
@@ -77,16 +116,18 @@ def update_doctor(doctor_id: int, doctor: DoctorUpdate, db: Session = Depends(ge
 
 @router.delete("/doctors/{doctor_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_doctor(doctor_id: int, db: Session = Depends(get_db)):
-    db_doctor = db.query(Doctor).filter(Doctor.id == doctor_id).first()
-    if not db_doctor:
+    # Doktor, uning foydalanuvchisi, xizmatlari, qabullari va to'lovlari bitta tranzaksiyada
+    if not doctor_crud.remove(db=db, id=doctor_id):
         raise HTTPException(status_code=404, detail="Doctor not found")
 
-    db.delete(db_doctor.user)
-
-    db.delete(db_doctor)
-    db.commit()
+# Katalog: xotiradagi keshdan, bazaga so'rovsiz
+@router.get("/specializations/", response_model=List[CatalogItemResponse])
+def get_specializations(db: Session = Depends(get_db)):
+    return [{"id": id, "name": name} for id, name in catalog_cache.names("specializations", db.info["clinic_id"])]
 
-    return {"detail": "Doctor and associated user deleted"}
+@router.get("/service-types/", response_model=List[CatalogItemResponse])
+def get_service_types(db: Session = Depends(get_db)):
+    return [{"id": id, "name": name} for id, name in catalog_cache.names("service_types", db.info["clinic_id"])]
 
 # -------------------------------------------------------------------------------------------------------------
 
@@ -94,51 +135,46 @@ def delete_doctor(doctor_id: int, db: Session = Depends(get_db)):
 # DoctorService endpoints
 @router.post("/services/", response_model=DoctorServiceResponse, status_code=status.HTTP_201_CREATED)
 def create_service(service: DoctorServiceCreate, db: Session = Depends(get_db)):
-    existing_service = db.query(DoctorService).filter(
-        DoctorService.doctor_id == service.doctor_id,
-        DoctorService.service_name == service.service_name
-    ).first()
-    
-    if existing_service:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Service with name '{service.service_name}' already exists for this doctor."
-        )
+    # Dublikat tekshiruvi CRUD ichida, xotiradagi katalog bo'yicha
     return doctor_service_crud.create(db=db, obj_in=service)
 
 @router.get("/services/", response_model=List[DoctorServiceResponse])
-def get_services(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    return doctor_service_crud.get_multi(db=db, skip=skip, limit=limit)
+def get_services(request: Request, response: Response, skip: int = 0, limit: int = 10, order_by: Optional[str] = None,
+                 total: Optional[TotalMode] = None, facets: Optional[str] = None, fields: Optional[str] = None,
+                 db: Session = Depends(get_db)):
+    # Qolgan query parametrlari filtr sifatida: ?field=value, ?field__gte=value
+    filters = request.query_params.multi_items()
+    if total or facets:
+        set_list_headers(response, doctor_service_crud.list_totals(db, doctor_service_crud.list_query(db, filters), total, facets,
+                                                                   filtered=has_filters(filters)))
+    fieldset = parse_fields(fields, DoctorServiceResponse)
+    items = doctor_service_crud.get_multi(db=db, skip=skip, limit=limit, filters=filters, order_by=order_by,
+                                          options=load_options(DoctorService, fieldset))
+    return sparse_response(response, items, fieldset)
 
 @router.get("/service/{service_id}", response_model=DoctorServiceResponse)
-def get_service(service_id: int, db: Session = Depends(get_db)):
+def get_service(service_id: int, response: Response, db: Session = Depends(get_db)):
     service = doctor_service_crud.get(db=db, id=service_id)
     if not service:
         raise HTTPException(status_code=404, detail="Service not found")
+    set_etag(response, service)
     return service
 
 @router.patch("/service/{service_id}", response_model=DoctorServiceResponse)
-def update_service(service_id: int, service: DoctorServiceUpdate, db: Session = Depends(get_db)):
-    db_service = doctor_service_crud.get(db=db, id=service_id)
+def update_service(service_id: int, service: DoctorServiceUpdate, response: Response,
+                   version: Optional[int] = Depends(if_match), db: Session = Depends(get_db)):
+    db_service = doctor_service_crud.update_by_id(db=db, id=service_id, obj_in=service, version=version)
     if not db_service:
         raise HTTPException(status_code=404, detail="Service not found")
-    existing_service = db.query(DoctorService).filter(
-        DoctorService.doctor_id == service.doctor_id,
-        DoctorService.service_name == service.service_name
-    ).first()
-    
-    if existing_service:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Service with name '{service.service_name}' already exists for this doctor.")
-    return doctor_service_crud.update(db=db, db_obj=db_service, obj_in=service)
+    set_etag(response, db_service)
+    return db_service
 
 @router.delete("/service/{service_id}", response_model=DoctorServiceResponse)
 def delete_service(service_id: int, db: Session = Depends(get_db)):
-    service = doctor_service_crud.get(db=db, id=service_id)
+    service = doctor_service_crud.remove(db=db, id=service_id)
     if not service:
         raise HTTPException(status_code=404, detail="Service not found")
-    return doctor_service_crud.delete(db=db, id=service_id)
+    return service
 
 # -------------------------------------------------------------------------------------------------------------
 
@@ -155,7 +191,7 @@ def create_patient(patient: PatientCreate, db: Session = Depends(get_db)):
                 detail=f"{field.replace('_', ' ').capitalize()} is required",
             )
     
-    if db.query(Patient).filter(Patient.phone == patient.phone).first():
+    if patient_crud.query(db).filter(Patient.phone == patient.phone).first():
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Phone already registered",
@@ -179,29 +215,50 @@ def create_patient(patient: PatientCreate, db: Session = Depends(get_db)):
 
 
 @router.get("/patients/", response_model=List[PatientResponse])
-def get_patients(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    return patient_crud.get_multi(db=db, skip=skip, limit=limit)
+def get_patients(request: Request, response: Response, skip: int = 0, limit: int = 10, order_by: Optional[str] = None,
+                 total: Optional[TotalMode] = None, facets: Optional[str] = None, fields: Optional[str] = None,
+                 db: Session = Depends(get_db)):
+    # Qolgan query parametrlari filtr sifatida: ?field=value, ?field__gte=value
+    filters = request.query_params.multi_items()
+    if total or facets:
+        set_list_headers(response, patient_crud.list_totals(db, patient_crud.list_query(db, filters), total, facets,
+                                                            filtered=has_filters(filters)))
+    fieldset = parse_fields(fields, PatientResponse)
+    items = patient_crud.get_multi(db=db, skip=skip, limit=limit, filters=filters, order_by=order_by,
+                                   options=load_options(Patient, fieldset))
+    return sparse_response(response, items, fieldset)
 
 @router.get("/patient/{patient_id}", response_model=PatientResponse)
-def get_patient(patient_id: int, db: Session = Depends(get_db)):
+def get_patient(patient_id: int, response: Response, db: Session = Depends(get_db)):
     patient = patient_crud.get(db=db, id=patient_id)
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
+    set_etag(response, patient)
     return patient
 
+@router.get("/patient/{patient_id}/timeline", response_model=PatientTimelineResponse)
+def get_patient_timeline(patient_id: int, skip: int = 0, limit: int = 20, db: Session = Depends(get_db)):
+    timeline = patient_crud.get_timeline(db=db, patient_id=patient_id, skip=skip, limit=limit)
+    if not timeline:
+        raise HTTPException(status_code=404, detail="Patient not found")
+    return timeline
+
 @router.patch("/patients/{patient_id}", response_model=PatientResponse)
-def update_patient(patient_id: int, patient: PatientUpdate, db: Session = Depends(get_db)):
-    db_patient = patient_crud.get(db=db, id=patient_id)
+def update_patient(patient_id: int, patient: PatientUpdate, response: Response,
+                   version: Optional[int] = Depends(if_match), db: Session = Depends(get_db)):
+    # Bitta UPDATE ... RETURNING; If-Match versiyasi mos kelmasa 412
+    db_patient = patient_crud.update_by_id(db=db, id=patient_id, obj_in=patient, version=version)
     if not db_patient:
         raise HTTPException(status_code=404, detail="Patient not found")
-    return patient_crud.update(db=db, db_obj=db_patient, obj_in=patient)
+    set_etag(response, db_patient)
+    return db_patient
 
 @router.delete("/patient/{patient_id}", response_model=PatientResponse)
 def delete_patient(patient_id: int, db: Session = Depends(get_db)):
-    service = patient_crud.get(db=db, id=patient_id)
-    if not service:
+    patient = patient_crud.remove(db=db, id=patient_id)
+    if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
-    return patient_crud.remove(db=db, id=patient_id)
+    return patient
 
 # @router.patch("/patient/{patient_id}", response_model=PatientResponse)
 # def update_patient(patient_id: int, patient: PatientUpdate, request: Request, db: Session = Depends(get_db)):
@@ -228,15 +285,93 @@ def delete_patient(patient_id: int, db: Session = Depends(get_db)):
 def create_appointment(appointment: AppointmentCreate, db: Session = Depends(get_db)):
     return appointment_crud.create(db=db, obj_in=appointment)
 
+@router.patch("/appointments/{appointment_id}", response_model=AppointmentResponse)
+def update_appointment(appointment_id: int, appointment: AppointmentUpdate, response: Response,
+                       version: Optional[int] = Depends(if_match), db: Session = Depends(get_db)):
+    # Bitta UPDATE ... RETURNING; If-Match versiyasi mos kelmasa 412
+    db_appointment = appointment_crud.update_by_id(db=db, id=appointment_id, obj_in=appointment, version=version)
+    if not db_appointment:
+        raise HTTPException(status_code=404, detail="Appointment not found")
+    set_etag(response, db_appointment)
+    return db_appointment
+
+@router.delete("/appointments/{appointment_id}", response_model=AppointmentResponse)
+def cancel_appointment(appointment_id: int, db: Session = Depends(get_db)):
+    appointment = appointment_crud.remove(db=db, id=appointment_id)
+    if not appointment:
+        raise HTTPException(status_code=404, detail="Appointment not found")
+    return appointment
+
 @router.get("/appointments/", response_model=List[AppointmentResponse])
-def get_appointments(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    return appointment_crud.get_multi(db=db, skip=skip, limit=limit)
+def get_appointments(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 10,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    order_by: Optional[str] = None,
+    total: Optional[TotalMode] = None,
+    facets: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    filters = request.query_params.multi_items()
+    if total or facets:
+        query = appointment_crud.list_query_by_date(db, filters, date_from, date_to)
+        set_list_headers(response, appointment_crud.list_totals(db, query, total, facets,
+                                                                filtered=has_filters(filters) or bool(date_from or date_to)))
+    fieldset = parse_fields(fields, AppointmentResponse)
+    items = appointment_crud.get_multi_by_date(db=db, skip=skip, limit=limit, date_from=date_from, date_to=date_to,
+                                               filters=filters, order_by=order_by, options=load_options(Appointment, fieldset))
+    return sparse_response(response, items, fieldset)
+
+# Oflayn mijozlar uchun delta: since dan keyin o'zgargan va o'chirilgan yozuvlar
+@router.get("/changes", response_model=ChangesResponse)
+def get_clinic_changes(since: Optional[str] = None, limit: Optional[int] = Query(None, ge=1, le=5000),
+                       db: Session = Depends(get_db)):
+    return get_changes(db=db, since=since, limit=limit)
+
+# Jadval o'zgarishlari oqimi (Server-Sent Events)
+@router.get("/stream")
+async def stream_schedule(
+    request: Request,
+    doctor_id: Optional[int] = None,
+    day: Optional[date] = Query(None, alias="date"),
+):
+    subscriber = Subscriber(
+        asyncio.get_running_loop(),
+        clinic_id=getattr(request.state, "clinic_id", settings.DEFAULT_CLINIC_ID),
+        doctor_id=doctor_id,
+        day=str(day) if day else None,
+    )
+    broker.subscribe(subscriber)
+
+    async def events():
+        try:
+            yield ": connected\n\n"
+            while not await request.is_disconnected():
+                try:
+                    payload = await asyncio.wait_for(subscriber.queue.get(), timeout=settings.STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                yield f"event: {payload['type']}\ndata: {json.dumps(payload)}\n\n"
+        finally:
+            broker.unsubscribe(subscriber)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
 
 # ----------------------------------------------------------------------------------------------------------
 
 # PatientHistory endpoints
 @router.post("/histories/", response_model=PatientHistoryResponse, status_code=status.HTTP_201_CREATED)
 def create_patient_history(history: PatientHistoryCreate, db: Session = Depends(get_db)):
+    if patient_history_crud.get_history_by_patient(db=db, patient_id=history.patient_id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Patient history already exists",
+        )
     return patient_history_crud.create(db=db, obj_in=history)
 
 @router.get("/histories/", response_model=List[PatientHistoryResponse])
@@ -245,10 +380,42 @@ def get_patient_histories(skip: int = 0, limit: int = 10, db: Session = Depends(
 
 # ------------------------------------------------------------------------------------------------------------
 # Billing endpoints
-@router.post("/billings/", response_model=BillingResponse, status_code=status.HTTP_201_CREATED)
+@router.post("/billings/", response_model=BillingDetailResponse, status_code=status.HTTP_201_CREATED)
 def create_billing(billing: BillingCreate, db: Session = Depends(get_db)):
-    return billing_crud.create(db=db, obj_in=billing)
+    return billing_crud.create_for_appointment(db=db, obj_in=billing)
+
+@router.patch("/billings/{billing_id}", response_model=BillingResponse)
+def update_billing(billing_id: int, billing: BillingUpdate, db: Session = Depends(get_db)):
+    # Bitta UPDATE ... RETURNING; paid o'zgarsa qabuldagi paid_total shu tranzaksiyada moslanadi
+    db_billing = billing_crud.update_by_id(db=db, id=billing_id, obj_in=billing)
+    if not db_billing:
+        raise HTTPException(status_code=404, detail="Billing not found")
+    return db_billing
+
+@router.get("/billings/revenue", response_model=RevenueResponse)
+def get_revenue(date_from: Optional[date] = None, date_to: Optional[date] = None, db: Session = Depends(get_db)):
+    return billing_crud.revenue(db=db, date_from=date_from, date_to=date_to)
 
 @router.get("/billings/", response_model=List[BillingResponse])
-def get_billings(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    return billing_crud.get_multi(db=db, skip=skip, limit=limit)
+def get_billings(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 10,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    order_by: Optional[str] = None,
+    total: Optional[TotalMode] = None,
+    facets: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    filters = request.query_params.multi_items()
+    if total or facets:
+        query = billing_crud.list_query_by_date(db, filters, date_from, date_to)
+        set_list_headers(response, billing_crud.list_totals(db, query, total, facets,
+                                                            filtered=has_filters(filters) or bool(date_from or date_to)))
+    fieldset = parse_fields(fields, BillingResponse)
+    items = billing_crud.get_multi_by_date(db=db, skip=skip, limit=limit, date_from=date_from, date_to=date_to,
+                                           filters=filters, order_by=order_by, options=load_options(Billing, fieldset))
+    return sparse_response(response, items, fieldset)
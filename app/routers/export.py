@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+
+from app.core.config import settings
+from app.core.dependencies import require_admin
+from app.services.snapshot import SNAPSHOT_TABLES, arrow_stream, load_pyarrow
+
+router = APIRouter()
+
+
+# Jadvalni Arrow IPC stream sifatida yuklab olish (faqat joriy filial, since_id dan keyingi qatorlar)
+@router.get("/{table}", dependencies=[Depends(require_admin)])
+def export_table(table: str, request: Request, since_id: int = 0):
+    model = SNAPSHOT_TABLES.get(table)
+    if model is None:
+        raise HTTPException(status_code=404, detail="Unknown table")
+    try:
+        load_pyarrow()
+    except RuntimeError as error:
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail=str(error))
+    clinic_id = getattr(request.state, "clinic_id", settings.DEFAULT_CLINIC_ID)
+    return StreamingResponse(
+        arrow_stream(model, clinic_id=clinic_id, since_id=since_id),
+        media_type="application/vnd.apache.arrow.stream",
+        headers={"Content-Disposition": f'attachment; filename="{table}.arrows"'},
+    )
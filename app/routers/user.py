@@ -1,8 +1,8 @@
 
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
 from sqlalchemy.orm import Session
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from typing import List
+from typing import List, Optional
 
 from app.crud.user import user_crud
 from app.schemas.user import UserCreate, UserResponse, UserVerify, UserLogin, UserUpdate
@@ -13,6 +13,8 @@ from app.core.dependencies import get_current_user, get_current_admin_user
 from datetime import datetime, timedelta
 from jose import jwt
 from app.core.config import settings
+from app.core.ratelimit import enforce_rate_limit, username_limit
+from app.core.etag import if_match, set_etag
 
 
 router = APIRouter()
@@ -24,6 +26,9 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/users/getToken")
 
 @router.post("/getToken")
 def login_for_access_token(user: UserLogin, db: Session = Depends(get_db)):
+    # Bir foydalanuvchi nomiga parol tanlash urinishlari bcrypt dan oldin to'xtatiladi. Endpoint
+    # sinxron (threadpoolda), shuning uchun Redis so'rovi event loopni to'smaydi
+    enforce_rate_limit(f"login:{user.username.lower()}", username_limit)
     user_in_db = user_crud.get_user_by_username(db=db, username=user.username)
     if not user_in_db or not verify_password(user.password, user_in_db.password):
         raise HTTPException(
@@ -31,8 +36,9 @@ def login_for_access_token(user: UserLogin, db: Session = Depends(get_db)):
             detail="Invalid username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token = create_access_token(data={"sub": user_in_db.email})
-    refresh_token = create_refresh_token(data={"sub": user_in_db.email})
+    token_data = {"sub": user_in_db.email, "uid": user_in_db.id, "clinic_id": user_in_db.clinic_id}
+    access_token = create_access_token(data=token_data)
+    refresh_token = create_refresh_token(data=token_data)
 
     return {
         "access_token": access_token,
@@ -84,10 +90,11 @@ def create_user(user: UserCreate, db: Session = Depends(get_db)):
 
 # Foydalanuvchini ID orqali olish
 @router.get("/{id}", response_model=UserResponse)
-def get_user(id: int, db: Session = Depends(get_db)):
+def get_user(id: int, response: Response, db: Session = Depends(get_db)):
     user = user_crud.get(db=db, id=id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
+    set_etag(response, user)
     return user
 
 
@@ -98,7 +105,7 @@ def get_users(
     db: Session = Depends(get_db),
     # current_user: User = Depends(get_current_admin_user)
 ):
-    return db.query(User).offset(skip).limit(limit).all()
+    return user_crud.get_multi(db=db, skip=skip, limit=limit)
 
 
 @router.put("/{id}", response_model=UserResponse)
@@ -107,30 +114,23 @@ def update_user(
     id: int,
     user: UserUpdate,  # PATCH uchun UserUpdate ishlatiladi
     request: Request,
+    response: Response,
+    version: Optional[int] = Depends(if_match),
     db: Session = Depends(get_db)
 ):
-    db_user = user_crud.get(db=db, id=id)
+    # PUT barcha maydonlarni, PATCH faqat yuborilganlarini yozadi
+    db_user = user_crud.update_by_id(
+        db=db, id=id, obj_in=user, version=version, exclude_unset=request.method == "PATCH"
+    )
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
-    
-    if request.method == "PUT":
-        updated_data = user.dict()
-        for key, value in updated_data.items():
-            setattr(db_user, key, value)
-    elif request.method == "PATCH":
-        updated_data = user.dict(exclude_unset=True)
-        for key, value in updated_data.items():
-            setattr(db_user, key, value)
-
-    db.commit()
-    db.refresh(db_user)
+    set_etag(response, db_user)
     return db_user
 
 # Foydalanuvchini o'chirish
 @router.delete("/{id}", response_model=UserResponse)
 def delete_user(id: int, db: Session = Depends(get_db)):
-    user = user_crud.get(db=db, id=id)
+    user = user_crud.remove(db=db, id=id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    user_crud.delete(db=db, id=id)
     return user
@@ -0,0 +1,16 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+
+class AuditLogResponse(BaseModel):
+    id: int
+    occurred_at: datetime
+    entity: str
+    entity_id: int
+    action: str
+    actor_id: Optional[int] = None
+    changes: Dict[str, Any]
+
+    class Config:
+        orm_mode = True
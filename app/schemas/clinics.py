@@ -1,8 +1,19 @@
 from pydantic import BaseModel, EmailStr, Field
 from datetime import date
-from typing import Optional
+from typing import Dict, List, Optional
 from app.schemas.user import UserResponse
 
+# Clinic Schemas
+class ClinicCreate(BaseModel):
+    name: str = Field(..., max_length=100)
+
+class ClinicResponse(ClinicCreate):
+    id: int
+
+    class Config:
+        orm_mode = True
+
+
 # Doctor Schemas
 class DoctorBase(BaseModel):
     specialization: str = Field(..., max_length=100)
@@ -36,6 +47,12 @@ class DoctorResponse(DoctorBase):
 
 
 # DoctorService Schemas
+# Katalog (mutaxassisliklar, xizmat turlari)
+class CatalogItemResponse(BaseModel):
+    id: int
+    name: str
+
+
 class DoctorServiceBase(BaseModel):
     service_name: str
     price: float
@@ -129,22 +146,85 @@ class PatientHistoryResponse(PatientHistoryBase):
 
 
 # Billing Schemas
+class BillingItemCreate(BaseModel):
+    # Narx berilmasa service_id bo'yicha DoctorService.price olinadi
+    service_id: Optional[int] = None
+    description: Optional[str] = None
+    quantity: int = Field(1, ge=1)
+    unit_price: Optional[float] = Field(None, ge=0)
+    discount: float = Field(0, ge=0)
+
+class BillingItemResponse(BaseModel):
+    id: int
+    service_id: Optional[int] = None
+    description: Optional[str] = None
+    quantity: int
+    unit_price: float
+    discount: float
+    amount: float
+
+    class Config:
+        orm_mode = True
+
 class BillingBase(BaseModel):
-    total_amount: float
-    paid: bool
+    paid: bool = False
     payment_date: Optional[date] = None
 
 class BillingCreate(BillingBase):
+    # Summa mijozdan olinmaydi: qatorlar berilmasa qabul xizmatining narxidan hisoblanadi
     appointment_id: int
+    items: Optional[List[BillingItemCreate]] = None
+    discount: float = Field(0, ge=0)
 
 class BillingUpdate(BaseModel):
-    total_amount: Optional[float] = None
     paid: Optional[bool] = None
     payment_date: Optional[date] = None
 
 class BillingResponse(BillingBase):
     id: int
     appointment_id: int
+    subtotal: Optional[float] = None
+    discount: float = 0
+    total_amount: float
 
     class Config:
         orm_mode = True
+
+class BillingDetailResponse(BillingResponse):
+    items: List[BillingItemResponse] = []
+
+class RevenueResponse(BaseModel):
+    billings: int
+    billed: float
+    paid: float
+
+
+# Patient timeline Schemas
+class PatientTimelineHistory(BaseModel):
+    id: int
+    medical_history: Optional[str] = None
+
+    class Config:
+        orm_mode = True
+
+class PatientTimelineAppointment(AppointmentResponse):
+    doctor: Optional[DoctorResponse] = None
+    service: Optional[DoctorServiceResponse] = None
+    billing: Optional[BillingResponse] = None
+
+class PatientTimelineResponse(BaseModel):
+    patient: PatientResponse
+    history: Optional[PatientTimelineHistory] = None
+    appointments: List[PatientTimelineAppointment]
+    skip: int
+    limit: int
+
+
+# Incremental sync (delta) Schemas
+class ChangesResponse(BaseModel):
+    doctors: List[DoctorResponse]
+    services: List[DoctorServiceResponse]
+    patients: List[PatientResponse]
+    deleted: Dict[str, List[int]]  # O'chirilganlar (tombstone): {"patients": [id, ...], ...}
+    next: str  # Keyingi so'rovda since sifatida yuboriladi
+    has_more: bool
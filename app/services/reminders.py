@@ -0,0 +1,171 @@
+import asyncio
+import importlib
+import json
+import logging
+import threading
+from abc import ABC, abstractmethod
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.clinics import Appointment, Patient
+from app.models.reminders import ReminderDelivery
+
+logger = logging.getLogger(__name__)
+
+
+class ReminderSender(ABC):
+    """
+    Eslatma yuboruvchi (SMS/email provayder) uchun asos. `send` muvaffaqiyatsiz bo'lsa xato ko'taradi;
+    uni yozmagan sender yaratilayotganda (yuborish paytida emas) yiqiladi.
+    """
+    @abstractmethod
+    async def send(self, message: dict):
+        ...
+
+
+class FileSender(ReminderSender):
+    """
+    Xabarlarni JSON qatorlar sifatida faylga yozadi (testlar va lokal ishga tushirish uchun).
+    """
+    def __init__(self, path: str = None):
+        self.path = path or settings.REMINDER_OUTPUT_FILE
+        self._lock = threading.Lock()
+
+    async def send(self, message: dict):
+        with self._lock, open(self.path, "a", encoding="utf-8") as output:
+            output.write(json.dumps(message, ensure_ascii=False, default=str) + "\n")
+
+
+def load_sender(path: str = None) -> ReminderSender:
+    """
+    "package.module:ClassName" ko'rinishidagi yo'ldan sender yaratadi.
+    """
+    module_name, _, class_name = (path or settings.REMINDER_SENDER).partition(":")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+def reminder_messages(db: Session, day: date, batch_size: int):
+    """
+    Berilgan kundagi qabullar uchun xabarlar. Bitta so'rov appointment_date indeksi bo'yicha
+    o'qiladi va bemorning telefon/email bilan JOIN qilinadi; natija partiyalab oqib keladi.
+    """
+    rows = db.execute(
+        select(
+            Appointment.id, Appointment.appointment_date,
+            Patient.first_name, Patient.phone, Patient.email,
+        )
+        .join(Patient, Patient.id == Appointment.patient_id)
+        .where(
+            Appointment.appointment_date == day,
+            # Bekor qilingan (soft delete) qabullar va o'chirilgan bemorlarga eslatma yuborilmaydi
+            Appointment.deleted_at.is_(None),
+            Patient.deleted_at.is_(None),
+        )
+        .order_by(Appointment.id)
+        .execution_options(yield_per=batch_size)
+    )
+    for appointment_id, appointment_date, first_name, phone, email in rows:
+        text = f"Hurmatli {first_name}, {appointment_date:%d.%m.%Y} kuni qabulingiz bor."
+        channels = (("sms", phone), ("email", email))
+        for channel, recipient in channels:
+            if recipient:
+                yield {
+                    "idempotency_key": f"appointment:{appointment_id}:{appointment_date}:{channel}",
+                    "appointment_id": appointment_id,
+                    "channel": channel,
+                    "to": recipient,
+                    "text": text,
+                }
+
+
+def claim(db: Session, messages: list) -> list:
+    """
+    Xabarlarni idempotency kaliti bo'yicha band qiladi (INSERT ... ON CONFLICT). Avval yuborilgan
+    yoki boshqa jarayon band qilgan xabarlar qaytarilmaydi; band qilinganiga
+    REMINDER_CLAIM_TIMEOUT_SECONDS dan oshgan, yuborilmagan (sent_at IS NULL) kalit - yiqilgan
+    jarayondan qolgan, u qayta band qilinadi (created_at band qilingan vaqt sifatida yangilanadi).
+    """
+    dialect_insert = postgresql.insert if db.bind.dialect.name == "postgresql" else sqlite.insert
+    stale = datetime.now(timezone.utc) - timedelta(seconds=settings.REMINDER_CLAIM_TIMEOUT_SECONDS)
+    claimed = db.execute(
+        dialect_insert(ReminderDelivery)
+        .values([
+            {"idempotency_key": m["idempotency_key"], "appointment_id": m["appointment_id"], "channel": m["channel"]}
+            for m in messages
+        ])
+        .on_conflict_do_update(
+            index_elements=["idempotency_key"],
+            set_={"created_at": func.now()},
+            where=ReminderDelivery.sent_at.is_(None) & (ReminderDelivery.created_at < stale),
+        )
+        .returning(ReminderDelivery.idempotency_key)
+    ).scalars().all()
+    db.commit()
+    claimed = set(claimed)
+    return [m for m in messages if m["idempotency_key"] in claimed]
+
+
+async def _send_all(sender: ReminderSender, messages: list, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send_one(message):
+        async with semaphore:
+            try:
+                await sender.send(message)
+                return message["idempotency_key"], None
+            except Exception as exc:
+                return message["idempotency_key"], exc
+
+    return await asyncio.gather(*(send_one(message) for message in messages))
+
+
+def dispatch_reminders(db: Session, day: date = None, sender: ReminderSender = None,
+                       concurrency: int = None, batch_size: int = None) -> dict:
+    """
+    Kun (standart: ertaga) uchun eslatmalarni yuboradi. Har bir partiya band qilinadi,
+    parallel (concurrency chegarasi bilan) yuboriladi, keyin bitta UPDATE/DELETE bilan belgilanadi:
+    yuborilmaganlarning kaliti bo'shatiladi va keyingi ishga tushishda qayta uriniladi.
+    """
+    day = day or date.today() + timedelta(days=1)
+    sender = sender or load_sender()
+    concurrency = concurrency or settings.REMINDER_CONCURRENCY
+    batch_size = batch_size or settings.REMINDER_BATCH_SIZE
+    stats = {"sent": 0, "skipped": 0, "failed": 0}
+
+    for batch in _chunks(reminder_messages(db, day, batch_size), batch_size):
+        with Session(db.bind) as claim_db:
+            claimed = claim(claim_db, batch)
+            results = asyncio.run(_send_all(sender, claimed, concurrency))
+            sent = [key for key, error in results if error is None]
+            failed = [key for key, error in results if error is not None]
+            for key, error in results:
+                if error is not None:
+                    logger.warning("Reminder %s failed: %r", key, error)
+            if sent:
+                claim_db.execute(
+                    update(ReminderDelivery)
+                    .where(ReminderDelivery.idempotency_key.in_(sent))
+                    .values(sent_at=datetime.now(timezone.utc))
+                )
+            if failed:
+                claim_db.execute(delete(ReminderDelivery).where(ReminderDelivery.idempotency_key.in_(failed)))
+            claim_db.commit()
+        stats["skipped"] += len(batch) - len(claimed)
+        stats["sent"] += len(sent)
+        stats["failed"] += len(failed)
+    return stats
+
+
+def _chunks(items, size: int):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
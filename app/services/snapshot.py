@@ -0,0 +1,199 @@
+import io
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer, Numeric, func, select, tuple_
+
+from app.core.config import settings
+from app.database import engine, replicas
+from app.models.clinics import Appointment, Billing, DoctorService, Patient
+
+# Eksport qilinadigan jadvallar
+SNAPSHOT_TABLES = {model.__tablename__: model for model in (Appointment, Billing, DoctorService, Patient)}
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+MANIFEST = "manifest.json"
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def load_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Snapshot export requires the 'pyarrow' package")
+    return pyarrow
+
+
+def arrow_type(pa, column_type):
+    # Float ham Numeric dan meros oladi, shuning uchun avval tekshiriladi
+    if isinstance(column_type, Boolean):
+        return pa.bool_()
+    if isinstance(column_type, Integer):
+        return pa.int64()
+    if isinstance(column_type, Float):
+        return pa.float64()
+    if isinstance(column_type, Numeric):
+        return pa.decimal128(column_type.precision or 38, column_type.scale or 0)
+    if isinstance(column_type, DateTime):
+        return pa.timestamp("us", tz="UTC" if column_type.timezone else None)
+    if isinstance(column_type, Date):
+        return pa.date32()
+    return pa.string()
+
+
+def arrow_schema(pa, model):
+    return pa.schema([pa.field(column.name, arrow_type(pa, column.type)) for column in model.__table__.columns])
+
+
+def record_batch(pa, schema, rows):
+    columns = list(zip(*rows))
+    return pa.RecordBatch.from_arrays(
+        [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema
+    )
+
+
+@contextmanager
+def snapshot_connection():
+    """
+    Barcha jadvallar bitta REPEATABLE READ tranzaksiyada o'qiladi (izchil holat).
+    Sog'lom replika bo'lsa o'sha ishlatiladi, primary yuklanmaydi.
+    """
+    bind = replicas.choose() or engine
+    with bind.connect() as conn:
+        if conn.dialect.name == "postgresql":
+            conn.execution_options(isolation_level="REPEATABLE READ")
+        with conn.begin():
+            yield conn
+
+
+def iter_batches(conn, model, since_id: int = 0, clinic_id: int = None, batch_size: int = None,
+                 since_updated_at: datetime = None, until: datetime = None):
+    """
+    Jadval qatorlarini partiyalab oqizadi (server-side cursor, xotira cheklangan). `since_updated_at`
+    berilsa (updated_at, id) tartibida shu nuqtadan keyin o'zgargan qatorlar, aks holda id tartibida.
+    """
+    batch_size = batch_size or settings.SNAPSHOT_BATCH_SIZE
+    if since_updated_at is None:
+        stmt = select(model.__table__).where(model.id > since_id).order_by(model.id)
+    else:
+        stmt = (
+            select(model.__table__)
+            .where(tuple_(model.updated_at, model.id) > tuple_(since_updated_at, since_id))
+            .order_by(model.updated_at, model.id)
+        )
+    if until is not None:
+        stmt = stmt.where(model.updated_at <= until)
+    if clinic_id is not None:
+        stmt = stmt.where(model.clinic_id == clinic_id)
+    result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(stmt)
+    yield from result.partitions(batch_size)
+
+
+def _open_writer(pa, path: str, schema, fmt: str):
+    if fmt == "parquet":
+        return pa.parquet.ParquetWriter(path, schema, compression="zstd")
+    return pa.ipc.new_file(path, schema)
+
+
+def write_table(pa, conn, model, path: str, fmt: str, since: tuple = (EPOCH, 0), until: datetime = None,
+                batch_size: int = None):
+    """
+    `since` = (updated_at, id) dan keyin o'zgargan qatorlarni faylga yozadi (yangilangan qatorlar
+    qayta yoziladi, o'qiydigan tomon id bo'yicha oxirgisini oladi). (yozilgan qatorlar soni,
+    oxirgi (updated_at, id)); qator bo'lmasa fayl yaratilmaydi.
+    """
+    schema = arrow_schema(pa, model)
+    writer = None
+    count, position = 0, since
+    try:
+        for rows in iter_batches(conn, model, since_id=since[1], since_updated_at=since[0], until=until,
+                                 batch_size=batch_size):
+            if writer is None:
+                writer = _open_writer(pa, path, schema, fmt)
+            writer.write_batch(record_batch(pa, schema, rows))
+            count += len(rows)
+            position = (rows[-1].updated_at, rows[-1].id)
+    finally:
+        if writer is not None:
+            writer.close()
+    return count, position
+
+
+def load_manifest(output_dir: str) -> dict:
+    path = os.path.join(output_dir, MANIFEST)
+    if not os.path.exists(path):
+        return {"tables": {}}
+    with open(path, encoding="utf-8") as manifest:
+        return json.load(manifest)
+
+
+def save_manifest(output_dir: str, manifest: dict):
+    path = os.path.join(output_dir, MANIFEST)
+    with open(path + ".tmp", "w", encoding="utf-8") as output:
+        json.dump(manifest, output, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def export_snapshot(output_dir: str = None, fmt: str = "parquet", tables: list = None,
+                    incremental: bool = False, batch_size: int = None) -> dict:
+    """
+    Jadvallarni Parquet yoki Arrow IPC fayllarga yozadi va manifestni yangilaydi.
+    `incremental` bo'lsa har bir jadval oldingi snapshotdagi (updated_at, id) belgisidan davom
+    ettiriladi: yangi qatorlar bilan birga o'zgargan va soft delete qilinganlari ham olinadi.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown snapshot format: {fmt}")
+    pa = load_pyarrow()
+    output_dir = output_dir or settings.SNAPSHOT_OUTPUT_DIR
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = load_manifest(output_dir) if incremental else {"tables": {}}
+    taken_at = datetime.now(timezone.utc)
+    stamp = taken_at.strftime("%Y%m%dT%H%M%SZ")
+
+    with snapshot_connection() as conn:
+        # Hali commit qilinmagan tranzaksiyalar yozgan vaqtlar keyingi snapshotda o'qiladi (sync.py dagidek)
+        until = conn.execute(select(func.now())).scalar() - timedelta(seconds=settings.SYNC_LAG_SECONDS)
+        for name in tables or SNAPSHOT_TABLES:
+            state = manifest["tables"].setdefault(name, {"last_id": 0, "files": []})
+            # Eski manifestlarda faqat last_id bo'lgan: bunday jadval boshidan qayta yoziladi
+            if "last_updated_at" in state:
+                since = (datetime.fromisoformat(state["last_updated_at"]), state["last_id"])
+            else:
+                since = (EPOCH, 0)
+            path = os.path.join(output_dir, f"{name}-{stamp}{FORMATS[fmt]}")
+            count, (updated_at, last_id) = write_table(pa, conn, SNAPSHOT_TABLES[name], path, fmt,
+                                                       since=since, until=until, batch_size=batch_size)
+            if count:
+                state["files"].append({"path": os.path.basename(path), "rows": count})
+                state["last_updated_at"] = updated_at.isoformat()
+                state["last_id"] = last_id
+
+    manifest["taken_at"] = taken_at.isoformat()
+    save_manifest(output_dir, manifest)
+    return manifest
+
+
+def arrow_stream(model, clinic_id: int, since_id: int = 0, batch_size: int = None):
+    """
+    Bitta jadvalni Arrow IPC stream ko'rinishida bayt bo'laklari bilan qaytaradi (HTTP javob uchun).
+    """
+    pa = load_pyarrow()
+    schema = arrow_schema(pa, model)
+    buffer = io.BytesIO()
+    with snapshot_connection() as conn:
+        writer = pa.ipc.new_stream(buffer, schema)
+        for rows in iter_batches(conn, model, since_id=since_id, clinic_id=clinic_id, batch_size=batch_size):
+            writer.write_batch(record_batch(pa, schema, rows))
+            yield _drain(buffer)
+        writer.close()
+    yield _drain(buffer)
+
+
+def _drain(buffer: io.BytesIO) -> bytes:
+    data = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return data
@@ -0,0 +1,81 @@
+import base64
+import json
+from datetime import datetime, timedelta, timezone
+
+from fastapi import HTTPException
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.orm import Session, joinedload
+
+from app.core.config import settings
+from app.models.clinics import Doctor, DoctorService, Patient
+
+# Delta lentasidagi obyekt turlari va ularni yuklash opsiyalari
+SYNC_ENTITIES = {
+    "doctors": (Doctor, [joinedload(Doctor.user)]),
+    "services": (DoctorService, []),
+    "patients": (Patient, []),
+}
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def encode_cursor(positions: dict) -> str:
+    data = {name: [updated_at.isoformat(), id] for name, (updated_at, id) in positions.items()}
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip("=")
+
+
+def decode_cursor(since: str = None) -> dict:
+    """
+    `since` - ISO vaqt (birinchi sinxronizatsiya) yoki oldingi javobdagi `next` kursori.
+    Natija: {obyekt turi: (updated_at, id)}.
+    """
+    if not since:
+        return {name: (EPOCH, 0) for name in SYNC_ENTITIES}
+    try:
+        moment = datetime.fromisoformat(since)
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        return {name: (moment, 0) for name in SYNC_ENTITIES}
+    except ValueError:
+        pass
+    try:
+        data = json.loads(base64.urlsafe_b64decode(since + "=" * (-len(since) % 4)))
+        return {
+            name: (datetime.fromisoformat(data[name][0]), int(data[name][1])) if name in data else (EPOCH, 0)
+            for name in SYNC_ENTITIES
+        }
+    except (ValueError, TypeError, KeyError, IndexError):
+        raise HTTPException(status_code=400, detail="Invalid since cursor")
+
+
+def get_changes(db: Session, since: str = None, limit: int = None) -> dict:
+    """
+    `since` dan keyin o'zgargan doktorlar, xizmatlar va bemorlar. Har bir tur (updated_at, id)
+    indeksi bo'yicha kursor bilan o'qiladi; o'chirilganlar faqat id sifatida (tombstone) qaytadi.
+    """
+    limit = limit or settings.SYNC_PAGE_SIZE
+    positions = decode_cursor(since)
+    # Hali commit qilinmagan tranzaksiyalar yozgan vaqtlar keyingi so'rovda o'qiladi
+    until = db.execute(select(func.now())).scalar() - timedelta(seconds=settings.SYNC_LAG_SECONDS)
+    clinic_id = db.info.get("clinic_id")
+
+    result = {"deleted": {}, "has_more": False}
+    for name, (model, options) in SYNC_ENTITIES.items():
+        updated_at, last_id = positions[name]
+        query = db.query(model).options(*options).filter(
+            tuple_(model.updated_at, model.id) > tuple_(updated_at, last_id),
+            model.updated_at <= until,
+        )
+        if clinic_id is not None:
+            query = query.filter(model.clinic_id == clinic_id)
+        rows = query.order_by(model.updated_at, model.id).limit(limit + 1).all()
+        if len(rows) > limit:
+            rows = rows[:limit]
+            result["has_more"] = True
+        if rows:
+            positions[name] = (rows[-1].updated_at, rows[-1].id)
+        result[name] = [row for row in rows if row.deleted_at is None]
+        result["deleted"][name] = [row.id for row in rows if row.deleted_at is not None]
+
+    result["next"] = encode_cursor(positions)
+    return result
@@ -1,15 +1,40 @@
 # main.py
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import Base, engine
-from app.routers import clinics, user
+from app.database import Base, engine, SessionLocal
+from app.core import outbox as outbox_handlers
+from app.core.catalog import cache as catalog_cache
+from app.core.config import settings
+from app.core.listing import LIST_HEADERS
+from app.core.partitions import ensure_month_partitions
+from app.crud.clinics import clinic_crud
+from app.models.clinics import Clinic
+from app.routers import audit, clinics, export, user
+from app.models import idempotency, outbox, reminders  # noqa: F401  (create_all jadvallarni ko'rishi uchun)
 import asyncio
 from starlette.middleware.base import BaseHTTPMiddleware
+from app.core.middleware import CompressionMiddleware, ReadYourWritesMiddleware, SingleFlightMiddleware, TenantMiddleware
+from app.core.ratelimit import RateLimitMiddleware
+from app.core.idempotency import IdempotencyMiddleware
 
 Base.metadata.create_all(bind=engine)
+# Handleri yo'q topiclar outboxga yozilmaydi, shuning uchun API ham handlerlarni biladi
+outbox_handlers.load_handlers()
+
+with SessionLocal() as db:
+    db.info["use_primary"] = True
+    clinic_crud.ensure_clinic(db, settings.DEFAULT_CLINIC_ID)
+    # Kelgusi oylar uchun appointments/billings partitsiyalari
+    ensure_month_partitions(db.connection())
+    db.commit()
+    # Katalog ishga tushishda xotiraga yuklanadi, o'zgarishlar NOTIFY orqali keladi
+    catalog_cache.warm([clinic_id for (clinic_id,) in db.query(Clinic.id)])
+
+if engine.dialect.name == "postgresql":
+    catalog_cache.start_listener()
 
 class TimeoutMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app, timeout: int):
+    def __init__(self, app, timeout: float):
         super().__init__(app)
         self.timeout = timeout
 
@@ -19,13 +44,21 @@ class TimeoutMiddleware(BaseHTTPMiddleware):
         except asyncio.TimeoutError:
             raise HTTPException(status_code=504, detail="Request timed out")
 app = FastAPI() 
-app.add_middleware(TimeoutMiddleware, timeout=10)
+# Eng ichkarida: tenant va foydalanuvchi aniqlangandan keyin ishlaydi
+app.add_middleware(IdempotencyMiddleware)
+app.add_middleware(SingleFlightMiddleware)
+app.add_middleware(TimeoutMiddleware, timeout=settings.REQUEST_TIMEOUT_SECONDS)
+app.add_middleware(ReadYourWritesMiddleware)
+app.add_middleware(TenantMiddleware)
+app.add_middleware(RateLimitMiddleware)
+app.add_middleware(CompressionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"], 
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", *LIST_HEADERS],
 )
 
 
@@ -34,4 +67,14 @@ app.include_router(user.router, prefix="/users", tags=["users"])
 
 app.include_router(clinics.router, prefix="/clinic", tags=["clinic"])
 
+app.include_router(audit.router, prefix="/audit", tags=["audit"])
+
+
+
+app.include_router(export.router, prefix="/export", tags=["export"])
+
+
+if __name__ == "__main__":
+    import uvicorn
 
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=settings.WEB_CONCURRENCY)
@@ -0,0 +1,245 @@
+"""
+Integratsion testlar uchun baza.
+
+Sessiya boshida bir marta: TEST_DATABASE_URL berilgan bo'lsa shu baza, aks holda mashinada
+`initdb`/`pg_ctl` bo'lsa vaqtinchalik Postgres (fsync o'chirilgan), bo'lmasa SQLite fayl.
+Postgresda sxema Alembic migratsiyalari bilan, SQLiteda `create_all` bilan quriladi.
+
+Har bir test bitta ulanishdagi tashqi tranzaksiyada ishlaydi: sessiya `commit()` qilsa ham
+faqat SAVEPOINT bo'shatiladi, test oxirida hammasi rollback. Fon oqimlari va alohida
+ulanishlar bilan ishlaydigan qismlar (katalog keshi, idempotency, audit) ham shu ulanishga
+yo'naltiriladi, aks holda ular testning commit qilinmagan ma'lumotlarini ko'rmaydi.
+"""
+import glob
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+from pathlib import Path
+
+import pytest
+from sqlalchemy import event
+
+ROOT = Path(__file__).resolve().parent.parent
+_tmpdir = tempfile.mkdtemp(prefix="clinic-tests-")
+_postgres_data = None
+
+
+def _binary(name: str):
+    found = shutil.which(name) or sorted(glob.glob(f"/usr/lib/postgresql/*/bin/{name}"))
+    if isinstance(found, list):
+        return found[-1] if found else None
+    return found
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_postgres():
+    """
+    Vaqtinchalik Postgres klasteri (unix socket orqali). Ishga tushmasa None.
+    """
+    global _postgres_data
+    initdb, pg_ctl = _binary("initdb"), _binary("pg_ctl")
+    if not initdb or not pg_ctl:
+        return None
+    data = os.path.join(_tmpdir, "pgdata")
+    port = _free_port()
+    try:
+        subprocess.run([initdb, "-D", data, "-U", "postgres", "-A", "trust", "--no-sync"],
+                       check=True, capture_output=True)
+        options = f"-p {port} -k {_tmpdir} -c listen_addresses='' -c fsync=off " \
+                  f"-c synchronous_commit=off -c full_page_writes=off"
+        subprocess.run([pg_ctl, "-D", data, "-o", options, "-l", os.path.join(_tmpdir, "postgres.log"), "-w", "start"],
+                       check=True, capture_output=True)
+    except (OSError, subprocess.CalledProcessError):
+        # Masalan, root foydalanuvchi ostida initdb ishlamaydi
+        return None
+    _postgres_data = data
+    return f"postgresql://postgres@/postgres?host={_tmpdir}&port={port}"
+
+
+def _database_url() -> str:
+    return (
+        os.getenv("TEST_DATABASE_URL")
+        or _start_postgres()
+        # Test ulanishi TestClient threadpool oqimlarida ham ishlatiladi
+        or f"sqlite:///{os.path.join(_tmpdir, 'test.db')}?check_same_thread=false"
+    )
+
+
+# Sozlamalar ilova modullari import qilinishidan oldin o'rnatiladi
+os.environ["APP_ENV"] = "test"
+os.environ["DATABASE_URL"] = _database_url()
+os.environ["REPLICA_DATABASE_URLS"] = ""
+os.environ["OUTBOX_MODE"] = "worker"
+# Audit fon oqimda yozilmaydi: yozuvlar faqat aniq flush() da (test ulanishiga) tushadi
+os.environ["AUDIT_FLUSH_INTERVAL_SECONDS"] = "3600"
+os.environ["AUDIT_BATCH_SIZE"] = "1000000"
+
+
+def _sqlite_savepoints(engine):
+    # pysqlite tranzaksiyani o'zi boshqaradi va SAVEPOINT ni buzadi: BEGIN ni SQLAlchemy beradi
+    @event.listens_for(engine, "connect")
+    def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+
+def _migrate():
+    from app.database import Base, engine
+
+    if engine.dialect.name == "sqlite":
+        _sqlite_savepoints(engine)
+    if engine.dialect.name == "postgresql":
+        from alembic import command
+        from alembic.config import Config
+
+        command.upgrade(Config(str(ROOT / "alembic.ini")), "head")
+    else:
+        # Migratsiyalar Postgresga xos (partitsiyalar, triggerlar)
+        from app.models import clinics, idempotency, outbox, reminders, user  # noqa: F401
+
+        Base.metadata.create_all(bind=engine)
+
+
+_migrate()
+
+import main  # noqa: E402  (sozlamalar va sxema tayyor bo'lgandan keyin)
+from fastapi import Request  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app.core import audit, catalog, idempotency, ratelimit  # noqa: E402
+from app.core.auth import create_access_token  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.database import engine, get_db  # noqa: E402
+from app.models.audit import AuditLog  # noqa: E402
+
+
+def pytest_unconfigure(config):
+    engine.dispose()
+    if _postgres_data is not None:
+        subprocess.run([_binary("pg_ctl"), "-D", _postgres_data, "-m", "immediate", "stop"], capture_output=True)
+    shutil.rmtree(_tmpdir, ignore_errors=True)
+
+
+def _middleware(app, cls):
+    # Qurilgan ASGI zanjiridan kerakli middleware nusxasi
+    layer = app.middleware_stack
+    while layer is not None and not isinstance(layer, cls):
+        layer = getattr(layer, "app", None)
+    return layer
+
+
+@pytest.fixture
+def connection():
+    with engine.connect() as conn:
+        transaction = conn.begin()
+        try:
+            yield conn
+        finally:
+            transaction.rollback()
+
+
+@pytest.fixture
+def session_factory(connection):
+    """
+    Test ulanishidagi sessiyalar: commit SAVEPOINT ni bo'shatadi, tashqi tranzaksiya qoladi.
+    """
+    sessions = []
+
+    def factory(clinic_id: int = settings.DEFAULT_CLINIC_ID, actor_id: int = None) -> Session:
+        db = Session(bind=connection, autoflush=False, join_transaction_mode="create_savepoint")
+        db.info["clinic_id"] = clinic_id
+        db.info["actor_id"] = actor_id
+        sessions.append(db)
+        return db
+
+    yield factory
+    for db in sessions:
+        db.close()
+
+
+@pytest.fixture
+def db(session_factory) -> Session:
+    return session_factory()
+
+
+@pytest.fixture(autouse=True)
+def isolated_services(request, monkeypatch):
+    """
+    Jarayon ichidagi keshlar testlar orasida tozalanadi; bazaga alohida ulanish ochadigan
+    qismlar test ulanishidan foydalanadi (faqat baza ishlatadigan testlarda).
+    """
+    catalog.cache.invalidate()
+    for buckets, lock in getattr(ratelimit.store, "_shards", ()):
+        with lock:
+            buckets.clear()
+    if "connection" in request.fixturenames:
+        connection = request.getfixturevalue("connection")
+        factory = request.getfixturevalue("session_factory")
+
+        def use_primary():
+            session = factory()
+            session.info["use_primary"] = True
+            return session
+
+        def flush_audit():
+            with audit.buffer._lock:
+                records, audit.buffer._records = audit.buffer._records, []
+            if records:
+                connection.execute(insert(AuditLog), records)
+
+        monkeypatch.setattr(catalog.cache, "get", lambda table, clinic_id: catalog._load(connection, table, clinic_id))
+        monkeypatch.setattr(idempotency, "_session", use_primary)
+        monkeypatch.setattr(audit.buffer, "flush", flush_audit)
+    yield
+    with audit.buffer._lock:
+        audit.buffer._records.clear()
+
+
+@pytest.fixture
+def client(session_factory):
+    """
+    Router testlari uchun: har bir so'rovning sessiyasi test ulanishida, filial va foydalanuvchi
+    TenantMiddleware aniqlagan qiymatlardan.
+    """
+    def override_get_db(request: Request):
+        db = session_factory(
+            getattr(request.state, "clinic_id", settings.DEFAULT_CLINIC_ID),
+            getattr(request.state, "user_id", None),
+        )
+        try:
+            yield db
+        finally:
+            db.close()
+
+    main.app.dependency_overrides[get_db] = override_get_db
+    with TestClient(main.app) as test_client:
+        yield test_client
+    main.app.dependency_overrides.pop(get_db, None)
+    # Saqlangan idempotent javoblar rollback qilingan testga tegishli
+    layer = _middleware(main.app, idempotency.IdempotencyMiddleware)
+    if layer is not None:
+        layer.cache = idempotency.ResponseCache(settings.IDEMPOTENCY_CACHE_SIZE)
+
+
+@pytest.fixture
+def auth_headers():
+    """
+    Foydalanuvchi uchun Bearer sarlavha: `auth_headers(user)`.
+    """
+    def make(user) -> dict:
+        token = create_access_token({"sub": user.email, "uid": user.id, "clinic_id": user.clinic_id})
+        return {"Authorization": f"Bearer {token}"}
+
+    return make
@@ -0,0 +1,150 @@
+"""
+Test ma'lumotlari uchun fabrikalar. Obyektlar berilgan sessiyaga qo'shilib flush qilinadi
+(commit qilinmaydi): test oxirida SAVEPOINT rollback bilan yo'qoladi.
+
+    doctor = make_doctor(db, specialization="Kardiolog")
+    billing = make_billing(db, make_appointment(db, doctor=doctor))
+"""
+import itertools
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy.orm import Session
+
+from app.core import catalog
+from app.core.auth import hash_password
+from app.core.partitions import create_clinic_partitions
+from app.models.clinics import Appointment, Billing, BillingItem, Clinic, Doctor, DoctorService, Patient
+from app.models.user import RoleEnum, User
+
+_sequence = itertools.count(1)
+# bcrypt sekin: barcha foydalanuvchilar uchun bitta hash
+PASSWORD = "secret123"
+_password_hash = None
+
+
+def _next() -> int:
+    return next(_sequence)
+
+
+def _phone(number: int) -> str:
+    return f"{number:09d}"[-9:]
+
+
+def _clinic_id(db: Session, clinic_id=None) -> int:
+    return clinic_id if clinic_id is not None else db.info["clinic_id"]
+
+
+def make_clinic(db: Session, **values) -> Clinic:
+    clinic = Clinic(name=values.pop("name", f"Clinic {_next()}"), **values)
+    db.add(clinic)
+    db.flush()
+    create_clinic_partitions(db.connection(), clinic.id)
+    return clinic
+
+
+def make_user(db: Session, role: RoleEnum = RoleEnum.reception, clinic_id: int = None, **values) -> User:
+    global _password_hash
+    if _password_hash is None:
+        _password_hash = hash_password(PASSWORD)
+    number = _next()
+    user = User(
+        username=values.pop("username", f"user{number}"),
+        email=values.pop("email", f"user{number}@example.com"),
+        phone=values.pop("phone", _phone(900000000 + number)),
+        first_name=values.pop("first_name", "Test"),
+        last_name=values.pop("last_name", f"User{number}"),
+        password=values.pop("password", _password_hash),
+        role=role,
+        clinic_id=_clinic_id(db, clinic_id),
+        **values,
+    )
+    db.add(user)
+    db.flush()
+    return user
+
+
+def make_doctor(db: Session, specialization: str = "Terapevt", clinic_id: int = None, user: User = None,
+                **values) -> Doctor:
+    clinic_id = _clinic_id(db, clinic_id)
+    user = user or make_user(db, role=RoleEnum.doctor, clinic_id=clinic_id)
+    specialization_id, specialization = catalog.cache.resolve(db, "specializations", clinic_id, specialization)
+    doctor = Doctor(id=user.id, clinic_id=clinic_id, specialization=specialization,
+                    specialization_id=specialization_id, **values)
+    db.add(doctor)
+    db.flush()
+    return doctor
+
+
+def make_service(db: Session, doctor: Doctor = None, service_name: str = None, price=Decimal("100.00"),
+                 **values) -> DoctorService:
+    doctor = doctor or make_doctor(db)
+    service_type_id, service_name = catalog.cache.resolve(
+        db, "service_types", doctor.clinic_id, service_name or f"Xizmat {_next()}")
+    service = DoctorService(clinic_id=doctor.clinic_id, doctor_id=doctor.id, service_name=service_name,
+                            service_type_id=service_type_id, price=price, **values)
+    db.add(service)
+    db.flush()
+    return service
+
+
+def make_patient(db: Session, clinic_id: int = None, **values) -> Patient:
+    number = _next()
+    patient = Patient(
+        clinic_id=_clinic_id(db, clinic_id),
+        first_name=values.pop("first_name", "Bemor"),
+        last_name=values.pop("last_name", f"Patient{number}"),
+        phone=values.pop("phone", _phone(800000000 + number)),
+        **values,
+    )
+    db.add(patient)
+    db.flush()
+    return patient
+
+
+def make_appointment(db: Session, doctor: Doctor = None, patient: Patient = None, service: DoctorService = None,
+                     appointment_date: date = None, **values) -> Appointment:
+    service = service or make_service(db, doctor)
+    doctor = doctor or service.doctor
+    patient = patient or make_patient(db, clinic_id=doctor.clinic_id)
+    appointment = Appointment(
+        clinic_id=doctor.clinic_id,
+        doctor_id=doctor.id,
+        patient_id=patient.id,
+        service_id=service.id,
+        appointment_date=appointment_date or date.today(),
+        **values,
+    )
+    db.add(appointment)
+    db.flush()
+    return appointment
+
+
+def make_billing(db: Session, appointment: Appointment = None, quantity: int = 1, unit_price=None,
+                 discount=Decimal("0"), paid: bool = False, payment_date: date = None, **values) -> Billing:
+    """
+    Bitta qatorli hisob-kitob; appointment jamlari ham yangilanadi (CRUD dagidek).
+    """
+    appointment = appointment or make_appointment(db)
+    unit_price = Decimal(unit_price if unit_price is not None else appointment.service.price)
+    subtotal = unit_price * quantity
+    total = subtotal - discount
+    billing = Billing(
+        clinic_id=appointment.clinic_id,
+        appointment_id=appointment.id,
+        subtotal=subtotal,
+        discount=discount,
+        total_amount=total,
+        paid=paid,
+        payment_date=payment_date or date.today(),
+        **values,
+    )
+    billing.items = [BillingItem(clinic_id=appointment.clinic_id, service_id=appointment.service_id,
+                                 description=appointment.service.service_name, quantity=quantity,
+                                 unit_price=unit_price, amount=subtotal)]
+    db.add(billing)
+    appointment.billed_total = (appointment.billed_total or 0) + total
+    if paid:
+        appointment.paid_total = (appointment.paid_total or 0) + total
+    db.flush()
+    return billing
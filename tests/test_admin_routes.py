@@ -0,0 +1,39 @@
+"""
+Faqat admin uchun endpointlar: filial yaratish va audit jurnali.
+"""
+from app.core import audit
+from app.models.user import RoleEnum
+from tests.factories import make_user
+
+
+def test_create_clinic_requires_admin(client, db, auth_headers):
+    anonymous = client.post("/clinic/clinics/", json={"name": "Yangi filial"})
+    reception = client.post("/clinic/clinics/", headers=auth_headers(make_user(db)), json={"name": "Yangi filial"})
+    admin = client.post("/clinic/clinics/", headers=auth_headers(make_user(db, role=RoleEnum.admin)),
+                        json={"name": "Yangi filial"})
+
+    assert anonymous.status_code == reception.status_code == 403
+    assert admin.status_code == 201
+    assert admin.json()["name"] == "Yangi filial"
+
+
+def test_audit_log_requires_admin(client, db, auth_headers):
+    response = client.get("/audit/", headers=auth_headers(make_user(db)))
+
+    assert response.status_code == 403
+
+
+def test_audit_log_lists_patient_changes(client, db, auth_headers):
+    admin = make_user(db, role=RoleEnum.admin)
+    headers = auth_headers(admin)
+
+    created = client.post("/clinic/patients/", headers=headers, json={"first_name": "Ali", "phone": "901234567"})
+    # O'qish buferni yozmaydi: fon oqimi o'rniga shu yerda yoziladi
+    audit.buffer.flush()
+    response = client.get("/audit/", headers=headers, params={"entity": "patients", "entity_id": created.json()["id"]})
+
+    assert response.status_code == 200
+    [entry] = response.json()
+    assert entry["action"] == "create"
+    assert entry["actor_id"] == admin.id
+    assert entry["changes"]["first_name"] == [None, "Ali"]
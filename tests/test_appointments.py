@@ -0,0 +1,37 @@
+"""
+/clinic/appointments endpointlari: If-Match bilan atomar yangilash.
+"""
+from datetime import date, timedelta
+
+from app.models.clinics import Appointment
+from tests.factories import make_appointment, make_billing, make_user
+
+
+def test_update_appointment_checks_if_match(client, db, auth_headers):
+    headers = auth_headers(make_user(db))
+    appointment = make_appointment(db)
+
+    stale = client.patch(f"/clinic/appointments/{appointment.id}", headers={**headers, "If-Match": '"7"'},
+                         json={"notes": "eskirgan"})
+    updated = client.patch(f"/clinic/appointments/{appointment.id}", headers={**headers, "If-Match": '"1"'},
+                           json={"notes": "Nahordan keyin"})
+
+    assert stale.status_code == 412
+    assert updated.status_code == 200
+    assert updated.headers["ETag"] == '"2"'
+    assert updated.json()["notes"] == "Nahordan keyin"
+    db.expire_all()
+    assert db.get(Appointment, appointment.id).version == 2
+
+
+def test_appointment_cannot_move_after_its_payment(client, db, auth_headers):
+    headers = auth_headers(make_user(db))
+    today = date.today()
+    billing = make_billing(db, make_appointment(db, appointment_date=today), payment_date=today)
+
+    response = client.patch(f"/clinic/appointments/{billing.appointment_id}", headers=headers,
+                            json={"appointment_date": (today + timedelta(days=2)).isoformat()})
+
+    assert response.status_code == 400
+    db.expire_all()
+    assert db.get(Appointment, billing.appointment_id).appointment_date == today
@@ -0,0 +1,105 @@
+"""
+/clinic/billings endpointlari: serverda hisoblash, bitta qabulga bitta billing, ro'yxat.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+from app.crud.clinics import billing_crud
+from app.models.clinics import Appointment, Billing
+from tests.factories import make_appointment, make_billing, make_service, make_user
+
+
+def test_create_billing_uses_service_price(client, db, auth_headers):
+    headers = auth_headers(make_user(db))
+    appointment = make_appointment(db, service=make_service(db, price=Decimal("250.00")))
+
+    response = client.post("/clinic/billings/", headers=headers,
+                           json={"appointment_id": appointment.id, "paid": True, "discount": 50})
+
+    assert response.status_code == 201
+    body = response.json()
+    assert (body["subtotal"], body["discount"], body["total_amount"]) == (250, 50, 200)
+    assert len(body["items"]) == 1
+    db.expire_all()
+    stored = db.get(Appointment, appointment.id)
+    assert (stored.billed_total, stored.paid_total) == (Decimal("200.00"), Decimal("200.00"))
+
+
+def test_second_billing_for_appointment_is_rejected(client, db, auth_headers):
+    headers = auth_headers(make_user(db))
+    billing = make_billing(db)
+
+    response = client.post("/clinic/billings/", headers=headers, json={"appointment_id": billing.appointment_id})
+
+    assert response.status_code == 400
+    assert db.query(Billing).filter(Billing.appointment_id == billing.appointment_id).count() == 1
+
+
+def test_existing_billing_before_appointment_date_is_found(client, db, auth_headers):
+    # Tekshiruvdan oldin yozilgan, qabul sanasidan oldingi to'lov ham dublikat hisoblanadi
+    headers = auth_headers(make_user(db))
+    appointment = make_appointment(db, appointment_date=date.today())
+    make_billing(db, appointment, payment_date=date.today() - timedelta(days=3))
+
+    response = client.post("/clinic/billings/", headers=headers, json={"appointment_id": appointment.id})
+
+    assert response.status_code == 400
+    assert db.query(Billing).filter(Billing.appointment_id == appointment.id).count() == 1
+
+
+def test_payment_date_before_appointment_is_rejected(client, db, auth_headers):
+    headers = auth_headers(make_user(db))
+    appointment = make_appointment(db, appointment_date=date.today())
+
+    response = client.post("/clinic/billings/", headers=headers, json={
+        "appointment_id": appointment.id, "payment_date": (date.today() - timedelta(days=1)).isoformat()})
+
+    assert response.status_code == 400
+    assert db.query(Billing).filter(Billing.appointment_id == appointment.id).count() == 0
+
+
+def test_list_billings_by_date(client, db, auth_headers):
+    headers = auth_headers(make_user(db))
+    today = date.today()
+    recent = make_billing(db, make_appointment(db, appointment_date=today), payment_date=today)
+    make_billing(db, make_appointment(db, appointment_date=today - timedelta(days=40)),
+                 payment_date=today - timedelta(days=40))
+
+    response = client.get("/clinic/billings/", headers=headers,
+                          params={"date_from": (today - timedelta(days=7)).isoformat()})
+
+    assert response.status_code == 200
+    assert [billing["id"] for billing in response.json()] == [recent.id]
+
+
+def test_cancelled_appointment_removes_billing(client, db, auth_headers):
+    headers = auth_headers(make_user(db))
+    billing = make_billing(db)
+
+    response = client.delete(f"/clinic/appointments/{billing.appointment_id}", headers=headers)
+
+    assert response.status_code == 200
+    assert client.get("/clinic/billings/", headers=headers).json() == []
+
+
+def test_paying_billing_updates_appointment_total(client, db, auth_headers):
+    headers = auth_headers(make_user(db))
+    billing = make_billing(db, unit_price=Decimal("120.00"))
+
+    response = client.patch(f"/clinic/billings/{billing.id}", headers=headers, json={"paid": True})
+
+    assert response.status_code == 200
+    assert response.json()["paid"] is True
+    db.expire_all()
+    stored = db.get(Appointment, billing.appointment_id)
+    assert (stored.billed_total, stored.paid_total) == (Decimal("120.00"), Decimal("120.00"))
+
+
+def test_removed_billing_leaves_appointment_totals(db):
+    billing = make_billing(db, unit_price=Decimal("80.00"), paid=True)
+
+    assert billing_crud.remove(db, billing.id) is not None
+
+    db.expire_all()
+    stored = db.get(Appointment, billing.appointment_id)
+    assert (stored.billed_total, stored.paid_total) == (Decimal("0.00"), Decimal("0.00"))
@@ -0,0 +1,35 @@
+"""
+Replikalarga yo'naltirish: sessiya bitta replikada qoladi, lag tekshiruvi so'rovni kutdirmaydi.
+"""
+import itertools
+import threading
+
+from app import database
+from app.database import ReplicaSet, RoutingSession
+
+
+def test_session_keeps_one_replica(monkeypatch):
+    chosen = itertools.cycle(["replica-1", "replica-2"])
+    monkeypatch.setattr(database.replicas, "choose", lambda: next(chosen))
+    session = RoutingSession()
+
+    assert session.get_bind() == session.get_bind() == "replica-1"
+    session.close()
+    assert session.get_bind() == "replica-2"
+
+
+def test_lag_probe_runs_in_background():
+    release = threading.Event()
+    replica_set = ReplicaSet(["slow", "lagging"], max_lag=5, check_interval=0)
+    lags = {"slow": 0, "lagging": 60}
+
+    def lag(replica_engine):
+        release.wait(5)
+        return lags[replica_engine]
+
+    replica_set._lag = lag
+    # Tekshiruv tugamaguncha eski (dastlabki) natija qaytadi
+    assert replica_set.choose() in {"slow", "lagging"}
+    release.set()
+    with replica_set._lock:
+        assert replica_set._healthy == ["slow"]
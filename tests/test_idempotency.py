@@ -0,0 +1,51 @@
+"""
+Idempotency-Key: takroriy so'rov endpointga tegmasdan saqlangan javobni oladi.
+"""
+from app.models.clinics import Patient
+from tests.factories import make_user
+
+PATIENT = {"first_name": "Ali", "phone": "901234567"}
+
+
+def test_replay_returns_stored_response_without_second_insert(client, db, auth_headers):
+    headers = {**auth_headers(make_user(db)), "Idempotency-Key": "create-ali"}
+
+    first = client.post("/clinic/patients/", headers=headers, json=PATIENT)
+    second = client.post("/clinic/patients/", headers=headers, json=PATIENT)
+
+    assert first.status_code == second.status_code == 201
+    assert second.json() == first.json()
+    assert second.headers["idempotent-replayed"] == "true"
+    assert "idempotent-replayed" not in first.headers
+    assert db.query(Patient).filter(Patient.phone == PATIENT["phone"]).count() == 1
+
+
+def test_key_reused_with_different_body_is_rejected(client, db, auth_headers):
+    headers = {**auth_headers(make_user(db)), "Idempotency-Key": "create-ali"}
+
+    client.post("/clinic/patients/", headers=headers, json=PATIENT)
+    response = client.post("/clinic/patients/", headers=headers, json={**PATIENT, "first_name": "Vali"})
+
+    assert response.status_code == 422
+
+
+def test_keys_are_scoped_to_user(client, db, auth_headers):
+    key = {"Idempotency-Key": "create"}
+
+    first = client.post("/clinic/patients/", headers={**auth_headers(make_user(db)), **key}, json=PATIENT)
+    second = client.post("/clinic/patients/", headers={**auth_headers(make_user(db)), **key},
+                         json={**PATIENT, "phone": "907654321"})
+
+    assert first.status_code == second.status_code == 201
+    assert second.json()["id"] != first.json()["id"]
+
+
+def test_client_error_is_replayed(client, db, auth_headers):
+    headers = {**auth_headers(make_user(db)), "Idempotency-Key": "create-ali"}
+
+    invalid = client.post("/clinic/patients/", headers=headers, json={**PATIENT, "phone": "1"})
+    # 4xx javob ham saqlanadi: xuddi shu so'rov takrorlansa o'sha javob qaytadi
+    replay = client.post("/clinic/patients/", headers=headers, json={**PATIENT, "phone": "1"})
+
+    assert invalid.status_code == replay.status_code == 422
+    assert replay.headers["idempotent-replayed"] == "true"
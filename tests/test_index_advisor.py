@@ -0,0 +1,12 @@
+"""
+Ro'yxatlarda ruxsat etilgan har bir filtr/saralash maydoni indeks bilan qo'llab-quvvatlanadi.
+"""
+import pytest
+
+from app.commands.index_advisor import CRUDS
+from app.crud.filters import index_advisor
+
+
+@pytest.mark.parametrize("crud", CRUDS, ids=lambda crud: crud.model.__tablename__)
+def test_filterable_and_sortable_fields_are_indexed(crud):
+    assert index_advisor(crud) == []
@@ -0,0 +1,46 @@
+"""
+Outbox: faqat handleri bor topiclar yoziladi, eski bajarilgan va o'lik hodisalar tozalanadi.
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.core import outbox
+from app.core.config import settings
+from app.models.outbox import OutboxEvent
+
+
+@pytest.fixture
+def registered(monkeypatch):
+    monkeypatch.setattr(outbox, "handlers", {"patient.created": [lambda payload: None]})
+
+
+def test_topic_without_handler_is_not_enqueued(db):
+    outbox.enqueue(db, "patient.created", {"id": 1})
+    db.flush()
+
+    assert db.query(OutboxEvent).count() == 0
+
+
+def test_topic_with_handler_is_enqueued(db, registered):
+    outbox.enqueue(db, "patient.created", {"id": 1})
+    db.flush()
+
+    assert [event.topic for event in db.query(OutboxEvent)] == ["patient.created"]
+
+
+def test_purge_keeps_pending_and_recent_events(db):
+    old = datetime.now(timezone.utc) - timedelta(seconds=settings.OUTBOX_RETENTION_SECONDS + 60)
+    recent = datetime.now(timezone.utc)
+    events = {
+        "processed_old": OutboxEvent(topic="t", payload={}, processed_at=old),
+        "processed_recent": OutboxEvent(topic="t", payload={}, processed_at=recent),
+        "dead_old": OutboxEvent(topic="t", payload={}, attempts=settings.OUTBOX_MAX_ATTEMPTS, available_at=old),
+        "pending_old": OutboxEvent(topic="t", payload={}, attempts=1, available_at=old),
+    }
+    db.add_all(events.values())
+    db.flush()
+
+    assert outbox.purge_finished(db) == 2
+    remaining = {event.id for event in db.query(OutboxEvent)}
+    assert remaining == {events["processed_recent"].id, events["pending_old"].id}
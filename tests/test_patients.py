@@ -0,0 +1,121 @@
+"""
+/clinic/patients endpointlari: yaratish, ro'yxat, If-Match bilan yangilash, soft delete.
+"""
+from datetime import datetime, timedelta, timezone
+
+from app.core.auth import create_access_token
+from app.models.clinics import Appointment, Patient, PatientHistory
+from tests.factories import make_appointment, make_billing, make_clinic, make_patient, make_user
+
+
+def test_create_patient(client, db, auth_headers):
+    user = make_user(db)
+    response = client.post("/clinic/patients/", headers=auth_headers(user),
+                           json={"first_name": "Ali", "last_name": "Valiyev", "phone": "901234567"})
+
+    assert response.status_code == 201
+    body = response.json()
+    assert body["first_name"] == "Ali"
+    patient = db.get(Patient, body["id"])
+    assert patient.clinic_id == user.clinic_id
+
+
+def test_create_patient_rejects_duplicate_phone(client, db, auth_headers):
+    user = make_user(db)
+    make_patient(db, phone="901234567")
+
+    response = client.post("/clinic/patients/", headers=auth_headers(user),
+                           json={"first_name": "Ali", "phone": "901234567"})
+
+    assert response.status_code == 400
+
+
+def test_list_patients_is_scoped_to_clinic(client, db, auth_headers):
+    user = make_user(db)
+    own = make_patient(db)
+    other_clinic = make_clinic(db)
+    make_patient(db, clinic_id=other_clinic.id)
+
+    response = client.get("/clinic/patients/", headers=auth_headers(user), params={"limit": 100})
+
+    assert response.status_code == 200
+    assert [patient["id"] for patient in response.json()] == [own.id]
+
+
+def test_list_patients_with_filter_and_exact_total(client, db, auth_headers):
+    user = make_user(db)
+    make_patient(db, first_name="Ali")
+    make_patient(db, first_name="Vali")
+
+    response = client.get("/clinic/patients/", headers=auth_headers(user),
+                          params={"first_name": "Ali", "total": "exact"})
+
+    assert response.status_code == 200
+    assert [patient["first_name"] for patient in response.json()] == ["Ali"]
+    assert response.headers["x-total-count"] == "1"
+
+
+def test_update_patient_checks_if_match(client, db, auth_headers):
+    user = make_user(db)
+    patient = make_patient(db)
+    headers = auth_headers(user)
+
+    stale = client.patch(f"/clinic/patients/{patient.id}", json={"first_name": "Yangi"},
+                         headers={**headers, "If-Match": '"99"'})
+    malformed = client.patch(f"/clinic/patients/{patient.id}", json={"first_name": "Yangi"},
+                             headers={**headers, "If-Match": "abc"})
+    updated = client.patch(f"/clinic/patients/{patient.id}", json={"first_name": "Yangi"},
+                           headers={**headers, "If-Match": '"1"'})
+
+    assert stale.status_code == 412
+    assert malformed.status_code == 400
+    assert updated.status_code == 200
+    assert updated.headers["etag"] == '"2"'
+
+
+def test_delete_patient_is_soft_and_cascades(client, db, auth_headers):
+    user = make_user(db)
+    appointment = make_appointment(db)
+    patient_id = appointment.patient_id
+    headers = auth_headers(user)
+
+    response = client.delete(f"/clinic/patient/{patient_id}", headers=headers)
+
+    assert response.status_code == 200
+    assert client.get(f"/clinic/patient/{patient_id}", headers=headers).status_code == 404
+    assert client.delete(f"/clinic/patient/{patient_id}", headers=headers).status_code == 404
+    db.expire_all()
+    # Qator o'chirilmaydi, faqat deleted_at qo'yiladi; qabullari ham bekor qilinadi
+    assert db.get(Patient, patient_id).deleted_at is not None
+    assert db.get(Appointment, appointment.id).deleted_at is not None
+
+
+def test_timeline_skips_deleted_history_and_billing(client, db, auth_headers):
+    headers = auth_headers(make_user(db))
+    patient = make_patient(db)
+    db.add_all([
+        PatientHistory(clinic_id=patient.clinic_id, patient_id=patient.id, medical_history="old",
+                       deleted_at=datetime.now(timezone.utc)),
+        PatientHistory(clinic_id=patient.clinic_id, patient_id=patient.id, medical_history="current"),
+    ])
+    billing = make_billing(db, make_appointment(db, patient=patient), deleted_at=datetime.now(timezone.utc))
+    db.flush()
+
+    response = client.get(f"/clinic/patient/{patient.id}/timeline", headers=headers)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["history"]["medical_history"] == "current"
+    assert [appointment["id"] for appointment in body["appointments"]] == [billing.appointment_id]
+    assert body["appointments"][0]["billing"] is None
+
+
+def test_invalid_token_gets_no_clinic_scope(client, db):
+    user = make_user(db)
+    make_patient(db)
+    expired = create_access_token({"sub": user.email, "uid": user.id, "clinic_id": user.clinic_id},
+                                  expires_delta=timedelta(minutes=-1))
+
+    for token in (expired, "not-a-token"):
+        response = client.get("/clinic/patients/", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 401
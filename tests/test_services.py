@@ -0,0 +1,79 @@
+"""
+/clinic/services endpointlari: yaratish, ro'yxat, dublikat xizmat, soft delete.
+"""
+import time
+
+from app.crud.clinics import doctor_service_crud
+from app.models.clinics import DoctorService
+from app.schemas.clinics import DoctorServiceCreate
+from tests.factories import make_doctor, make_service, make_user
+
+
+def test_create_and_list_services(client, db, auth_headers):
+    headers = auth_headers(make_user(db))
+    doctor = make_doctor(db)
+
+    created = client.post("/clinic/services/", headers=headers,
+                          json={"doctor_id": doctor.id, "service_name": "Ko'rik", "price": 150})
+    listed = client.get("/clinic/services/", headers=headers, params={"doctor_id": doctor.id})
+
+    assert created.status_code == 201
+    assert created.json()["service_name"] == "Ko'rik"
+    assert [service["id"] for service in listed.json()] == [created.json()["id"]]
+
+
+def test_duplicate_service_for_doctor_is_rejected(client, db, auth_headers):
+    headers = auth_headers(make_user(db))
+    doctor = make_doctor(db)
+    make_service(db, doctor, service_name="Ko'rik")
+
+    response = client.post("/clinic/services/", headers=headers,
+                           json={"doctor_id": doctor.id, "service_name": "ko'rik", "price": 150})
+
+    assert response.status_code == 400
+
+
+def test_duplicate_missed_by_catalog_cache_is_rejected(client, db, auth_headers, monkeypatch):
+    # Eskirgan kesh (boshqa worker) tekshiruvni o'tkazib yuborsa ham unikal indeks ushlaydi
+    from app.core import catalog
+
+    headers = auth_headers(make_user(db))
+    doctor = make_doctor(db)
+    make_service(db, doctor, service_name="Ko'rik")
+    monkeypatch.setattr(catalog.cache, "find_service", lambda *args: None)
+
+    response = client.post("/clinic/services/", headers=headers,
+                           json={"doctor_id": doctor.id, "service_name": "Ko'rik", "price": 150})
+
+    assert response.status_code == 400
+    assert db.query(DoctorService).filter(DoctorService.doctor_id == doctor.id).count() == 1
+
+
+def test_deleted_service_can_be_added_again(client, db, auth_headers):
+    headers = auth_headers(make_user(db))
+    service = make_service(db, service_name="Ko'rik")
+
+    deleted = client.delete(f"/clinic/service/{service.id}", headers=headers)
+    created = client.post("/clinic/services/", headers=headers,
+                          json={"doctor_id": service.doctor_id, "service_name": "Ko'rik", "price": 150})
+
+    assert deleted.status_code == 200
+    assert client.get(f"/clinic/service/{service.id}", headers=headers).status_code == 404
+    assert created.status_code == 201
+
+
+def test_service_writes_patch_cached_key(db):
+    from app.core import catalog
+
+    doctor = make_doctor(db)
+    key = ("doctor_services", doctor.clinic_id)
+    catalog.cache._entries[key] = (time.monotonic(), catalog._load(db.connection(), *key))
+    entry = catalog.cache._entries[key][1]
+
+    service = doctor_service_crud.create(db, DoctorServiceCreate(doctor_id=doctor.id, service_name="Ko'rik", price=100))
+    assert entry["keys"][(doctor.id, service.service_type_id)] == service.id
+    assert catalog.cache._entries[key][1] is entry  # butun filial qayta o'qilmadi
+
+    doctor_service_crud.remove(db, service.id)
+    assert (doctor.id, service.service_type_id) not in entry["keys"]
+    assert service.id not in entry["services"]